@@ -0,0 +1,72 @@
+"""
+Agrégation vectorisée des indicateurs des points (quartiers, îlots) vers les communes.
+Repose sur l'affectation point -> commune de la jointure spatiale (spatial.py) et
+sur np.bincount : un seul passage sur les données par colonne agrégée.
+"""
+import numpy as np
+import pandas as pd
+
+from scoring import SCORE_COLUMN
+
+GREEN_SPACE_COLUMN = "Surface Espaces Verts (m²)"
+GREEN_PER_CAPITA_COLUMN = "Espaces Verts par habitant (m²/hab)"
+UNIT_COUNT_COLUMN = "Nombre d'unités"
+
+
+class CommuneAggregator:
+    """
+    Agrège des valeurs par commune pour une affectation point -> commune fixée.
+    `feature_index` donne pour chaque point l'indice de sa commune (-1 : hors communes).
+    Les sommes qui ne dépendent pas des poids (population, espaces verts) sont
+    précalculées une fois.
+    """
+
+    def __init__(self, feature_index, feature_names, population, green_space=None):
+        self.feature_names = list(feature_names)
+        n_features = len(self.feature_names)
+        matched = np.asarray(feature_index) >= 0
+        self.matched = matched
+        self.index = np.asarray(feature_index)[matched]
+        self.population = np.asarray(population, dtype=np.float64)[matched]
+        self.n_features = n_features
+
+        self.unit_count = np.bincount(self.index, minlength=n_features)
+        self.total_population = np.bincount(self.index, weights=self.population, minlength=n_features)
+        self.total_green = None
+        if green_space is not None:
+            green = np.asarray(green_space, dtype=np.float64)[matched]
+            self.total_green = np.bincount(self.index, weights=green, minlength=n_features)
+
+    def weighted_mean(self, values):
+        """Moyenne pondérée par la population de `values` (un par point) pour chaque commune."""
+        values = np.asarray(values, dtype=np.float64)[self.matched]
+        weighted = np.bincount(self.index, weights=values * self.population, minlength=self.n_features)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.total_population > 0, weighted / self.total_population, np.nan)
+
+    def aggregate(self, columns):
+        """
+        Retourne un DataFrame indexé par commune (toutes les communes, NaN sans données) :
+        moyennes pondérées par la population des colonnes de `columns` ({nom: valeurs}),
+        population totale, espaces verts par habitant et nombre d'unités.
+        """
+        result = pd.DataFrame(index=pd.Index(self.feature_names, name="Commune"))
+        for name, values in columns.items():
+            result[name] = self.weighted_mean(values)
+        has_data = self.unit_count > 0
+        result["Population"] = np.where(has_data, self.total_population, np.nan)
+        if self.total_green is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result[GREEN_PER_CAPITA_COLUMN] = np.where(
+                    self.total_population > 0, self.total_green / self.total_population, np.nan
+                )
+        result[UNIT_COUNT_COLUMN] = self.unit_count
+        return result
+
+
+def aggregate_scores(aggregator, scores, indicator=None, indicator_values=None):
+    """Agrégats par commune du score de vulnérabilité et, si fourni, d'un autre indicateur."""
+    columns = {SCORE_COLUMN: scores}
+    if indicator is not None and indicator != SCORE_COLUMN:
+        columns[indicator] = indicator_values
+    return aggregator.aggregate(columns)
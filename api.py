@@ -0,0 +1,323 @@
+"""
+API HTTP/JSON locale des scores UrbanLifeAI (bibliothèque standard uniquement).
+
+Même modèle de scoring que les pages Streamlit (utils.get_scoring_model). Les
+requêtes de score concurrentes sont regroupées en micro-lots : un seul produit
+matriciel évalue tous les jeux de poids distincts reçus pendant quelques
+millisecondes. Les réponses sont mises en cache par (chemin, poids, paramètres).
+
+    python api.py --port 8502
+
+Points d'entrée (poids en paramètres w_social=...&w_infra=..., weights=3,2.5,... ou en
+JSON {"weights": ...}, poids absents : valeurs par défaut de la sidebar) :
+    GET  /health
+    GET  /metrics            (format texte Prometheus)
+    GET  /score              ?names=Agdal,Souissi
+    GET  /topk               ?k=5
+    POST /simulate           {"weights": ..., "actions": [noms], "custom_actions": [...]}
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from cache import ResultCache
+from instrumentation import METRICS, timed
+from ranking import top_k
+from scoring import DEFAULT_WEIGHTS, WEIGHT_NAMES
+from simulation import as_actions, simulate_portfolio
+
+# Attente maximale (s) pour compléter un micro-lot, et taille maximale d'un lot
+MAX_WAIT = 0.002
+MAX_BATCH = 256
+
+# Taille du cache des réponses sérialisées (octets)
+RESPONSE_CACHE_BYTES = 64 * 2**20
+
+
+# --- Micro-lots ---
+class ScoreBatcher:
+    """
+    Regroupe les demandes de scores concurrentes. Un fil dédié attend la première
+    demande, collecte les suivantes pendant au plus `max_wait` secondes, puis score
+    tous les jeux de poids distincts du lot en un seul appel à model.score_batch.
+    """
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.scored = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, weights):
+        """Retourne un Future des scores (n,) arrondis à 0.1 pour un jeu de 6 poids."""
+        future = Future()
+        self.requests.put((tuple(weights), future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.requests.get(timeout=max(deadline - time.perf_counter(), 0)))
+                except queue.Empty:
+                    break
+
+            distinct = list(dict.fromkeys(weights for weights, _ in batch))
+            try:
+                scores = self.model.score_batch(np.array(distinct), decimals=1)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            rows = {weights: scores[i] for i, weights in enumerate(distinct)}
+            for weights, future in batch:
+                future.set_result(rows[weights])
+            self.batches += 1
+            self.scored += len(distinct)
+
+
+# --- Service ---
+def parse_weights(params):
+    """
+    Jeu de 6 poids depuis un dict {w_social: ...}, une liste ou une chaîne
+    "3,2.5,..." (paramètre de requête) ; poids absents : défaut.
+    """
+    weights = params.get("weights", params)
+    if isinstance(weights, str):
+        weights = weights.split(",")
+    if isinstance(weights, (list, tuple)):
+        if len(weights) != len(WEIGHT_NAMES):
+            raise ValueError(f"Les poids doivent être une liste de {len(WEIGHT_NAMES)} valeurs")
+        weights = tuple(float(w) for w in weights)
+    elif isinstance(weights, dict):
+        weights = tuple(float(weights.get(name, default)) for name, default in zip(WEIGHT_NAMES, DEFAULT_WEIGHTS))
+    else:
+        raise TypeError("Les poids doivent être un objet {w_social: ...}, une liste ou une chaîne séparée par des virgules")
+    # NaN et infinis produiraient un JSON invalide, mis en cache ensuite
+    if not all(np.isfinite(w) and w >= 0 for w in weights):
+        raise ValueError("Les poids doivent être des nombres finis et positifs")
+    return weights
+
+
+def list_param(params, key, item_type):
+    """Paramètre `key` de type liste d'éléments `item_type` (liste vide s'il est absent)."""
+    values = params.get(key, [])
+    if not isinstance(values, list) or not all(isinstance(v, item_type) for v in values):
+        raise TypeError(f"Le paramètre {key} doit être une liste de {item_type.__name__}")
+    return values
+
+
+class ScoringService:
+    """Logique des points d'entrée, indépendante du transport HTTP."""
+
+    def __init__(self, model, actions, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.model = model
+        # Actions prédéfinies validées et normalisées une seule fois
+        self.actions = as_actions(actions)
+        self.batcher = ScoreBatcher(model, max_batch, max_wait)
+        self.cache = ResultCache(max_bytes=RESPONSE_CACHE_BYTES)
+
+    def scores(self, weights):
+        return self.batcher.submit(weights).result()
+
+    def health(self, params):
+        return {
+            "status": "ok",
+            "dataset_version": self.model.version,
+            "units": len(self.model),
+            "batches": self.batcher.batches,
+            "cache": self.cache.stats(),
+        }
+
+    def score(self, params):
+        weights = parse_weights(params)
+        scores = self.scores(weights)
+        units = np.arange(len(self.model))
+        names = params.get("names")
+        if names:
+            names = names.split(",") if isinstance(names, str) else list_param(params, "names", str)
+            unknown = [name for name in names if name not in self.model.index]
+            if unknown:
+                raise ValueError(f"Quartiers inconnus : {', '.join(unknown)}")
+            units = np.array([self.model.index[name] for name in names], dtype=np.int64)
+        return {
+            "weights": dict(zip(WEIGHT_NAMES, weights)),
+            "scores": [
+                {"name": self.model.names[u], "score": float(scores[u])} for u in units
+            ],
+        }
+
+    def topk(self, params):
+        weights = parse_weights(params)
+        k = int(params.get("k", 5))
+        if k <= 0:
+            raise ValueError("k doit être strictement positif")
+        scores = self.scores(weights)
+        top = top_k(scores, k)
+        return {
+            "weights": dict(zip(WEIGHT_NAMES, weights)),
+            "top": [
+                {"rank": r + 1, "name": self.model.names[u], "score": float(scores[u])}
+                for r, u in enumerate(top)
+            ],
+        }
+
+    def simulate(self, params):
+        weights = parse_weights(params)
+        actions = self.actions + as_actions(list_param(params, "custom_actions", dict))
+        selected = list_param(params, "actions", str)
+        known = {a.name for a in actions}
+        unknown = [name for name in selected if name not in known]
+        if unknown:
+            raise ValueError(f"Actions inconnues : {', '.join(unknown)}")
+        result = simulate_portfolio(self.model, actions, selected, weights)
+        return {
+            "weights": dict(zip(WEIGHT_NAMES, weights)),
+            "actions": selected,
+            "unknown_targets": sorted(set(result["unknown_targets"])),
+            "units": [
+                {
+                    "name": self.model.names[unit],
+                    "score_before": round(float(result["score_before"][u]), 1),
+                    "score_after": round(float(result["score_after"][u]), 1),
+                }
+                for u, unit in enumerate(result["units"])
+            ],
+        }
+
+    def _cache_key(self, path, params):
+        """Clé de cache : poids normalisés et autres paramètres, pour la version des données."""
+        others = {k: v for k, v in params.items() if k != "weights" and k not in WEIGHT_NAMES}
+        return path, self.model.version, parse_weights(params), json.dumps(others, sort_keys=True)
+
+    def handle(self, method, path, params):
+        """Retourne (statut HTTP, corps JSON encodé) ; les réponses de lecture sont mises en cache."""
+        routes = {
+            ("GET", "/health"): (self.health, False),
+            ("GET", "/score"): (self.score, True),
+            ("POST", "/score"): (self.score, True),
+            ("GET", "/topk"): (self.topk, True),
+            ("POST", "/topk"): (self.topk, True),
+            ("POST", "/simulate"): (self.simulate, True),
+        }
+        if (method, path) not in routes:
+            return 404, _encode({"error": f"Point d'entrée inconnu : {method} {path}"})
+        if not isinstance(params, dict):
+            return 400, _encode({"error": "Le corps de la requête doit être un objet JSON"})
+        endpoint, cacheable = routes[(method, path)]
+
+        try:
+            key = self._cache_key(path, params) if cacheable else None
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    METRICS.increment(f"api_cache_hit:{path}")
+                    return 200, cached
+            with timed(f"api:{path}"):
+                body = _encode(endpoint(params))
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, _encode({"error": str(e)})
+        if key is not None:
+            self.cache.put(key, body)
+        return 200, body
+
+
+def _encode(payload):
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+# --- Transport HTTP ---
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, method, params):
+            self._send(*service.handle(method, urlparse(self.path).path, params))
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urlparse(self.path).path == "/metrics":
+                body = METRICS.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            query = parse_qs(urlparse(self.path).query)
+            self._reply("GET", {key: values[-1] for key, values in query.items()})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                # Corps illisible : la connexion ne peut pas être réutilisée
+                self.close_connection = True
+                self._send(400, _encode({"error": "En-tête Content-Length invalide"}))
+                return
+            try:
+                params = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                self._send(400, _encode({"error": f"JSON invalide : {e}"}))
+                return
+            self._reply("POST", params)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def create_server(host="127.0.0.1", port=8502, model=None, actions=None, **batch_options):
+    """Serveur HTTP multi-fils sur le modèle de scoring partagé de utils (par défaut)."""
+    if model is None or actions is None:
+        from utils import DEFAULT_ACTIONS, get_scoring_model
+        model = get_scoring_model() if model is None else model
+        actions = DEFAULT_ACTIONS if actions is None else actions
+    service = ScoringService(model, actions, **batch_options)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sert les scores de vulnérabilité en HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    print(f"API UrbanLifeAI sur http://{args.host}:{args.port} ({len(server.service.model):,} unités)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import streamlit as st
-from utils import generate_rabat_data, calculate_vulnerability_score
+from utils import load_dataset, get_scoring_model, score_for_session, warm_start, begin_page, end_page
 
 # --- Configuration de la Page ---
 st.set_page_config(
@@ -9,6 +9,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Démarrage à chaud : instantané des données et imports lourds en arrière-plan
+warm_start()
+begin_page("Accueil")
+
 # --- CSS Personnalisé ---
 st.markdown("""
 <style>
@@ -61,8 +65,10 @@ st.sidebar.markdown("---")
 st.sidebar.info("💡 Ajustez les poids pour prioriser certains critères dans le calcul du score de vulnérabilité.")
 
 # --- Chargement des Données ---
-df = generate_rabat_data()
-df_scored = calculate_vulnerability_score(df, w_social, w_infra, w_env, w_sante, w_educ, w_secu)
+df = load_dataset()
+model = get_scoring_model()
+weights = (w_social, w_infra, w_env, w_sante, w_educ, w_secu)
+df_scored = model.attach_scores(df, score_for_session(model, weights))
 
 # --- En-tête Principal ---
 st.markdown('<div class="main-header"> UrbanLifeAI - Tableau de Bord Rabat</div>', unsafe_allow_html=True)
@@ -145,6 +151,4 @@ st.markdown("""
 st.markdown("---")
 st.markdown("© 2025 Center of Urban Systems (CUS) - UM6P | Developed for UrbanLifeAI")
 
-
-
-
+end_page()
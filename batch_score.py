@@ -0,0 +1,244 @@
+"""
+Scoring en lot, sans interface, de fichiers d'unités spatiales (CSV, Parquet, Arrow).
+
+Le fichier d'entrée est lu par blocs et chaque bloc est scoré pour un ou plusieurs
+profils de poids en un seul produit matriciel, avec la même sémantique que
+calculate_vulnerability_score (normalisation, poids total nul = 1, arrondi à 0.1).
+Les résultats sont écrits au fil de l'eau : la mémoire reste bornée à quelques blocs.
+
+    python batch_score.py Data/rabat_1M.parquet scores.parquet
+    python batch_score.py unites.csv scores.csv --weights 3,2.5,1.5,2,2,1.5 --weights egal=1,1,1,1,1,1
+    python batch_score.py unites.parquet scores.parquet --profiles profils.json --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from datastore import FORMATS, dataset_format, read_table, write_dataset
+from scoring import (
+    DEFAULT_WEIGHTS, INDICATOR_COLUMNS, SCORE_COLUMN, WEIGHT_NAMES, batch_vulnerability_scores,
+    normalize_indicators,
+)
+
+DEFAULT_PROFILE = "defaut"
+
+CSV_EXTENSIONS = (".csv", ".csv.gz", ".csv.bz2", ".csv.zst")
+
+
+# --- Profils de Poids ---
+def parse_weights(text):
+    """Lit un profil "nom=w1,...,w6" ou "w1,...,w6" ; retourne (nom ou None, poids)."""
+    name, _, values = text.rpartition("=")
+    weights = tuple(float(w) for w in values.split(","))
+    if len(weights) != len(WEIGHT_NAMES):
+        raise ValueError(f"Un profil doit contenir {len(WEIGHT_NAMES)} poids, reçu {len(weights)} : {text}")
+    return name or None, weights
+
+
+def load_profiles(path):
+    """
+    Profils d'un fichier JSON {nom: [6 poids]} ou {nom: {"w_social": ..., ...}}
+    (poids absents : 0).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    profiles = {}
+    for name, weights in raw.items():
+        if isinstance(weights, dict):
+            weights = [weights.get(w, 0.0) for w in WEIGHT_NAMES]
+        if len(weights) != len(WEIGHT_NAMES):
+            raise ValueError(f"Le profil {name} doit contenir {len(WEIGHT_NAMES)} poids")
+        profiles[name] = tuple(float(w) for w in weights)
+    return profiles
+
+
+def score_columns(profiles):
+    """Nom de la colonne de score de chaque profil : "Score Vulnérabilité" s'il n'y en a qu'un."""
+    if len(profiles) == 1:
+        return [SCORE_COLUMN]
+    return [f"{SCORE_COLUMN} [{name}]" for name in profiles]
+
+
+# --- Lecture par Blocs ---
+def is_csv(path):
+    return path.lower().endswith(CSV_EXTENSIONS)
+
+
+def count_rows(path):
+    """Nombre de lignes du fichier s'il est connu sans le lire (Parquet, Arrow), sinon None."""
+    if is_csv(path):
+        return None
+    if dataset_format(path) == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    return read_table(path, []).num_rows
+
+
+def input_columns(path):
+    """Colonnes disponibles dans le fichier d'entrée."""
+    if is_csv(path):
+        return list(pd.read_csv(path, nrows=0).columns)
+    from datastore import dataset_columns
+    return dataset_columns(path)
+
+
+def iter_chunks(path, columns, chunk_size):
+    """
+    Tâches de lecture du fichier : des DataFrames (CSV, Arrow), ou pour le Parquet des
+    couples (chemin, groupes de lignes) que le processus qui score lit lui-même.
+    """
+    if is_csv(path):
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+    elif dataset_format(path) == "parquet":
+        metadata = pq.ParquetFile(path).metadata
+        group, rows = [], 0
+        for i in range(metadata.num_row_groups):
+            group.append(i)
+            rows += metadata.row_group(i).num_rows
+            if rows >= chunk_size:
+                yield (path, group)
+                group, rows = [], 0
+        if group:
+            yield (path, group)
+    else:
+        # Arrow IPC en memory-map : les tranches ne copient pas les données
+        table = read_table(path, columns)
+        for start in range(0, table.num_rows, chunk_size):
+            yield table.slice(start, chunk_size).to_pandas()
+
+
+# --- Scoring ---
+def score_chunk(task, columns, keep_columns, weights, names, decimals):
+    """Score un bloc (DataFrame ou groupes de lignes Parquet) pour tous les profils."""
+    if isinstance(task, tuple):
+        path, row_groups = task
+        task = pq.ParquetFile(path).read_row_groups(row_groups, columns=columns).to_pandas()
+    scores = batch_vulnerability_scores(normalize_indicators(task), weights, decimals=decimals)
+    result = task[keep_columns].reset_index(drop=True)
+    for name, column in zip(names, scores.astype(np.float32)):
+        result[name] = column
+    return result
+
+
+def score_file(source, output, profiles, keep_columns=None, chunk_size=200_000, workers=1,
+               decimals=1, progress=None):
+    """
+    Score `source` bloc par bloc pour chaque profil de `profiles` ({nom: 6 poids}) et
+    écrit `output` (CSV, Parquet ou Arrow selon l'extension), avec les colonnes
+    `keep_columns` de l'entrée (par défaut "Nom du quartier" si elle existe).
+    Avec `workers` > 1, les blocs sont scorés sur un pool de processus, au plus deux
+    blocs en attente par processus. `progress(lignes, total)` est appelé après chaque
+    bloc écrit (total : None s'il est inconnu). Retourne le nombre de lignes scorées.
+    """
+    available = input_columns(source)
+    missing = [c for c in INDICATOR_COLUMNS if c not in available]
+    if missing:
+        raise ValueError(f"Colonnes d'indicateurs absentes de {source} : {', '.join(missing)}")
+    if keep_columns is None:
+        keep_columns = [c for c in ["Nom du quartier"] if c in available]
+    columns = list(dict.fromkeys([*keep_columns, *INDICATOR_COLUMNS]))
+
+    weights = np.array(list(profiles.values()), dtype=np.float64)
+    names = score_columns(profiles)
+    total = count_rows(source)
+    args = (columns, keep_columns, weights, names, decimals)
+
+    def scored_chunks():
+        tasks = iter_chunks(source, columns, chunk_size)
+        if workers <= 1:
+            for task in tasks:
+                yield score_chunk(task, *args)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(score_chunk, task, *args))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def reported(chunks):
+        done = 0
+        for chunk in chunks:
+            done += len(chunk)
+            yield chunk
+            if progress is not None:
+                progress(done, total)
+
+    if is_csv(output):
+        n_rows = 0
+        for i, chunk in enumerate(reported(scored_chunks())):
+            chunk.to_csv(output, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            n_rows += len(chunk)
+        return n_rows
+    return write_dataset(reported(scored_chunks()), output)
+
+
+def _progress_printer():
+    start = time.perf_counter()
+
+    def report(done, total):
+        rate = done / max(time.perf_counter() - start, 1e-9)
+        share = f" ({done / total:.0%})" if total else ""
+        print(f"\r{done:,}{f'/{total:,}' if total else ''} lignes{share} - {rate:,.0f} lignes/s",
+              end="", file=sys.stderr, flush=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcule les scores de vulnérabilité d'un fichier d'unités spatiales.")
+    parser.add_argument("source", help="Fichier d'entrée (.csv, .parquet ou .arrow)")
+    parser.add_argument("output", help="Fichier de sortie (.csv, .parquet ou .arrow)")
+    parser.add_argument("--weights", action="append", default=[],
+                        help="Profil de poids \"nom=w_social,w_infra,w_env,w_sante,w_educ,w_secu\" (répétable)")
+    parser.add_argument("--profiles", help="Fichier JSON de profils {nom: [6 poids]}")
+    parser.add_argument("--keep", action="append", default=None,
+                        help="Colonne d'entrée recopiée dans la sortie (répétable, défaut : Nom du quartier)")
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=1, help="Nombre de processus de scoring")
+    parser.add_argument("--decimals", type=int, default=1)
+    parser.add_argument("--quiet", action="store_true", help="Sans rapport de progression")
+    args = parser.parse_args()
+
+    for path in (args.source, args.output):
+        if not is_csv(path) and os.path.splitext(path)[1].lower() not in FORMATS:
+            parser.error(f"Format non supporté : {path}")
+
+    profiles = load_profiles(args.profiles) if args.profiles else {}
+    try:
+        for i, text in enumerate(args.weights):
+            name, weights = parse_weights(text)
+            profiles[name or f"profil_{i + 1}"] = weights
+    except ValueError as e:
+        parser.error(str(e))
+    if not profiles:
+        profiles = {DEFAULT_PROFILE: DEFAULT_WEIGHTS}
+
+    start = time.perf_counter()
+    try:
+        n_rows = score_file(
+            args.source, args.output, profiles,
+            keep_columns=args.keep,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            decimals=args.decimals,
+            progress=None if args.quiet else _progress_printer(),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.quiet:
+        print(file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f"{n_rows:,} lignes x {len(profiles)} profil(s) écrites dans {args.output} en {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Suite de benchmarks reproductibles, hors Streamlit : scoring, simulation,
+chargement et stylage du GeoJSON, préparation des données des graphiques.
+
+Chaque cas est mesuré pour plusieurs tailles de jeu (7 quartiers réels, puis des
+unités synthétiques générées avec une graine fixe) : temps d'exécution (meilleur
+de `repeat` passages) et pic de mémoire alloué (tracemalloc, passage séparé).
+Les résultats peuvent être enregistrés comme référence, puis comparés à celle-ci :
+un cas plus lent ou plus gourmand que la référence au-delà de la tolérance est
+signalé comme régression (code de sortie 1).
+
+    python benchmarks.py
+    python benchmarks.py --sizes 7,1000,100000,1000000 --save-baseline benchmarks_baseline.json
+    python benchmarks.py --baseline benchmarks_baseline.json --tolerance 0.25
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = (7, 1_000, 100_000, 1_000_000)
+
+# Tolérance relative avant de signaler une régression (temps et mémoire)
+DEFAULT_TOLERANCE = 0.25
+# En dessous de ces seuils, les écarts relèvent du bruit de mesure
+MIN_SECONDS = 0.005
+MIN_BYTES = 1 * 2**20
+
+# Part des unités ciblées par les actions du simulateur sur les jeux synthétiques
+SIMULATION_TARGET_SHARE = 0.001
+
+
+# --- Données ---
+def benchmark_dataset(n_units, seed=42):
+    """Les 7 quartiers de generate_rabat_data, ou `n_units` unités synthétiques."""
+    from utils import generate_rabat_data, generate_synthetic_units
+    if n_units == 7:
+        return generate_rabat_data(seed=seed)
+    return pd.concat(list(generate_synthetic_units(n_units, seed=seed)), ignore_index=True)
+
+
+def benchmark_actions(df):
+    """
+    Actions prédéfinies du simulateur (DEFAULT_ACTIONS) reportées sur les unités :
+    chaque quartier cible est remplacé par une part des unités qui s'y rattachent.
+    """
+    from utils import DEFAULT_ACTIONS
+    if "Quartier de référence" not in df.columns:
+        return DEFAULT_ACTIONS
+    names_by_quartier = df.groupby("Quartier de référence")["Nom du quartier"].agg(list)
+    per_quartier = max(1, int(len(df) * SIMULATION_TARGET_SHARE))
+    actions = []
+    for action in DEFAULT_ACTIONS:
+        targets = action["target"]
+        if targets is None:
+            actions.append(action)
+            continue
+        targets = [targets] if isinstance(targets, str) else targets
+        units = {q: names_by_quartier.get(q, [])[:per_quartier] for q in targets}
+        val = action["val"]
+        actions.append({
+            **action,
+            "target": [u for q in targets for u in units[q]],
+            "val": {u: (val[q] if isinstance(val, dict) else val) for q in targets for u in units[q]},
+        })
+    return actions
+
+
+# --- Cas ---
+class Case:
+    """
+    Un cas de benchmark : `setup(df)` prépare ses entrées (non mesuré) et retourne
+    la fonction mesurée. `max_units` borne la taille des jeux pour lesquels le cas
+    a un sens (None : toutes les tailles).
+    """
+
+    def __init__(self, name, setup, max_units=None):
+        self.name = name
+        self.setup = setup
+        self.max_units = max_units
+
+
+def _score_dataframe(df):
+    from scoring import DEFAULT_WEIGHTS
+    from utils import calculate_vulnerability_score
+    return lambda: calculate_vulnerability_score(df, *DEFAULT_WEIGHTS)
+
+
+def _scoring_model(df):
+    from scoring import DEFAULT_WEIGHTS, ScoringModel
+
+    def run():
+        ScoringModel.from_dataframe(df).score(DEFAULT_WEIGHTS)
+    return run
+
+
+def _simulation(df):
+    from scoring import DEFAULT_WEIGHTS, ScoringModel
+    from simulation import simulate_portfolio
+    model = ScoringModel.from_dataframe(df)
+    actions = benchmark_actions(df)
+    selected = [a["name"] for a in actions if a["target"] is not None]
+    return lambda: simulate_portfolio(model, actions, selected, DEFAULT_WEIGHTS)
+
+
+def _geojson_loading(df):
+    def run():
+        with open("Data/Rabat.geojson", "r", encoding="utf-8") as f:
+            return json.load(f)
+    return run
+
+
+def _map_styling(df):
+    from maps import build_base_map, build_data_layer
+    from scoring import DEFAULT_WEIGHTS, SCORE_COLUMN, ScoringModel
+    from colors import get_color_for_score
+    with open("Data/Rabat.geojson", "r", encoding="utf-8") as f:
+        geojson_data = json.load(f)
+    scores = ScoringModel.from_dataframe(df).score(DEFAULT_WEIGHTS)
+    df_scored = df[["Nom du quartier", "Population", "lat", "lon"]].assign(**{SCORE_COLUMN: scores})
+    communes = [f["properties"]["commune"] for f in geojson_data["features"]]
+    commune_colors = {c: get_color_for_score(s) for c, s in zip(communes, np.linspace(20, 80, len(communes)))}
+
+    def run():
+        build_base_map(geojson_data)
+        build_data_layer(commune_colors, df_scored, SCORE_COLUMN)
+    return run
+
+
+def _chart_data(df):
+    from charts import ACCESS_COLUMNS, prepare_dashboard_charts
+    from scoring import DEFAULT_WEIGHTS, ScoringModel
+    from ranking import RankingIndex
+    model = ScoringModel.from_dataframe(df)
+    # Affectation aux communes tirée au hasard : la jointure spatiale n'est pas mesurée ici
+    n_communes = 16
+    commune_index = np.random.default_rng(0).integers(-1, n_communes, len(df))
+    communes = np.array([f"Commune {i}" for i in range(n_communes)], dtype=object)
+    provinces = np.array([f"Province {i % 3}" for i in range(n_communes)], dtype=object)
+    columns = {c: model.raw[:, model.column_index[c]] for c in ACCESS_COLUMNS}
+
+    def run():
+        ranking = RankingIndex(model.score(DEFAULT_WEIGHTS))
+        prepare_dashboard_charts(
+            model.names, ranking.scores, ranking.order, model.population, columns,
+            commune_index, communes, provinces,
+        )
+    return run
+
+
+CASES = [
+    Case("calculate_vulnerability_score", _score_dataframe),
+    Case("scoring_model", _scoring_model),
+    Case("simulation", _simulation),
+    Case("geojson_loading", _geojson_loading),
+    # Un marqueur Folium par unité : au-delà, la carte n'est pas utilisable
+    Case("map_styling", _map_styling, max_units=10_000),
+    Case("chart_data", _chart_data),
+]
+
+
+# --- Mesure ---
+def measure(function, repeat=3):
+    """(meilleur temps en s sur `repeat` passages, pic de mémoire alloué en octets)."""
+    function()  # Échauffement : imports paresseux, caches
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, cases=None, repeat=3, progress=None):
+    """
+    Mesure chaque cas (noms de `cases`, par défaut tous) pour chaque taille.
+    Retourne {"cas@taille": {"case", "units", "seconds", "peak_bytes"}}.
+    """
+    selected = [case for case in CASES if cases is None or case.name in cases]
+    results = {}
+    for n_units in sizes:
+        df = benchmark_dataset(n_units)
+        for case in selected:
+            if case.max_units is not None and n_units > case.max_units:
+                continue
+            seconds, peak = measure(case.setup(df), repeat)
+            key = f"{case.name}@{n_units}"
+            results[key] = {"case": case.name, "units": n_units, "seconds": seconds, "peak_bytes": peak}
+            if progress is not None:
+                progress(key, results[key])
+        del df
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare `results` à `baseline` (mêmes clés). Retourne la liste des régressions
+    (clé, mesure, valeur, référence) au-delà de `tolerance` et des seuils de bruit.
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, floor in (("seconds", MIN_SECONDS), ("peak_bytes", MIN_BYTES)):
+            value, ref = result[metric], reference[metric]
+            if value > max(ref, floor) * (1 + tolerance):
+                regressions.append((key, metric, value, ref))
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def _format_row(key, result, reference=None):
+    line = f"  {key:<40} {result['seconds'] * 1000:12.2f} ms {result['peak_bytes'] / 2**20:10.1f} Mo"
+    if reference is not None:
+        line += (f"   ({result['seconds'] / max(reference['seconds'], 1e-9):.2f}x temps, "
+                 f"{result['peak_bytes'] / max(reference['peak_bytes'], 1):.2f}x mémoire)")
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du scoring, de la simulation, de la carte et des graphiques.")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                        help="Tailles des jeux de données, séparées par des virgules (7 : quartiers réels)")
+    parser.add_argument("--cases", help=f"Cas à exécuter, séparés par des virgules ({', '.join(c.name for c in CASES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Passages mesurés par cas (meilleur temps retenu)")
+    parser.add_argument("--baseline", help="Fichier de référence JSON à comparer")
+    parser.add_argument("--save-baseline", help="Enregistre les résultats comme référence JSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Écart relatif toléré avant de signaler une régression")
+    args = parser.parse_args()
+    # Avertissement des tuiles Folium sans clé d'API, répété à chaque carte
+    warnings.filterwarnings("ignore", category=UserWarning, module="folium")
+
+    sizes = [int(n) for n in args.sizes.split(",")]
+    cases = args.cases.split(",") if args.cases else None
+    unknown = set(cases or []) - {c.name for c in CASES}
+    if unknown:
+        parser.error(f"Cas inconnus : {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    print(f"{'cas@unités':<42} {'temps':>15} {'pic mémoire':>13}")
+    results = run_benchmarks(
+        sizes, cases, args.repeat,
+        progress=lambda key, result: print(_format_row(key, result, (baseline or {}).get(key)), flush=True),
+    )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\nRéférence enregistrée dans {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.tolerance:.0%} :")
+            for key, metric, value, reference in regressions:
+                print(f"  {key} {metric} : {value:.4g} (référence {reference:.4g})")
+            sys.exit(1)
+        print(f"\nAucune régression au-delà de {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Cache de résultats partagé par toutes les sessions d'un même processus.
+
+Contrairement à st.cache_data, qui sérialise la valeur et en renvoie une copie à
+chaque accès, les valeurs sont conservées telles quelles et rendues en lecture
+seule : tableaux NumPy non modifiables (vues), DataFrames en copie superficielle
+(copy-on-write, toujours actif à partir de pandas 3.0, version minimale requise),
+dictionnaires recopiés en surface. L'éviction est LRU,
+bornée en octets, avec compteurs de succès/échecs.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Taille maximale par défaut du cache (octets)
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+
+def freeze(value):
+    """Rend `value` non modifiable sur place (tableaux NumPy, y compris dans un dict)."""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    return value
+
+
+def read_only_view(value):
+    """Vue sans copie des données d'une valeur gelée par freeze."""
+    if isinstance(value, np.ndarray):
+        return value.view()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return {key: read_only_view(item) for key, item in value.items()}
+    return value
+
+
+def size_of(value):
+    """Taille approximative (octets) d'une valeur mise en cache."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sum(size_of(item) for item in value.values()) + sys.getsizeof(value)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sum(size_of(item) for item in value) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Cache LRU thread-safe borné à `max_bytes`. Les clés sont des tuples hachables,
+    typiquement (espace, version des données, poids, ensemble d'actions, ...).
+    Quand plusieurs sessions demandent en même temps une clé absente, une seule
+    la calcule et les autres attendent son résultat.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """Vue en lecture seule de la valeur de `key`, ou `default`."""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            value = self.entries[key]
+        return read_only_view(value)
+
+    def put(self, key, value):
+        """Met `value` en cache (gelée) et retourne une vue en lecture seule."""
+        value = freeze(value)
+        size = size_of(value)
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.sizes.pop(key)
+                del self.entries[key]
+            # Une valeur plus grande que le cache entier n'est pas conservée
+            if size <= self.max_bytes:
+                self.entries[key] = value
+                self.sizes[key] = size
+                self.total_bytes += size
+                while self.total_bytes > self.max_bytes:
+                    evicted, _ = self.entries.popitem(last=False)
+                    self.total_bytes -= self.sizes.pop(evicted)
+                    self.evictions += 1
+        return read_only_view(value)
+
+    def get_or_compute(self, key, compute):
+        """Valeur de `key`, calculée par `compute()` (une seule fois) si elle est absente."""
+        while True:
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return read_only_view(self.entries[key])
+                event = self.pending.get(key)
+                if event is None:
+                    self.misses += 1
+                    event = self.pending[key] = threading.Event()
+                    break
+            # Calcul en cours dans une autre session : attendre puis relire
+            event.wait()
+
+        try:
+            return self.put(key, compute())
+        finally:
+            with self.lock:
+                del self.pending[key]
+            event.set()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """Compteurs du cache : succès, échecs, évictions, taux de succès, entrées et octets."""
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
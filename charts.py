@@ -0,0 +1,135 @@
+"""
+Préparation des données des graphiques du Dashboard, quelle que soit la taille du jeu.
+
+Les figures Plotly embarquent toutes leurs données dans la page : au-delà de
+quelques dizaines de quartiers, un graphique par quartier devient illisible et
+son poids rend le navigateur inutilisable. Les données sont donc réduites avant
+d'être tracées :
+- jusqu'à MAX_CATEGORIES unités, une catégorie par quartier ;
+- au-delà, moyennes pondérées par la population par commune, ou par province
+  s'il y a trop de communes, complétées par un histogramme des scores ;
+- les séries de points passent en rendu WebGL (scattergl) au-delà de WEBGL_THRESHOLD.
+Les tableaux retournés ont au plus quelques dizaines de lignes.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregation import UNIT_COUNT_COLUMN
+from scoring import SCORE_COLUMN
+
+# Nombre maximal de catégories (barres, secteurs) d'un graphique
+MAX_CATEGORIES = int(os.environ.get("URBANLIFE_CHART_MAX_CATEGORIES", 40))
+# Nombre de points au-delà duquel les nuages et courbes sont rendus en WebGL
+WEBGL_THRESHOLD = int(os.environ.get("URBANLIFE_CHART_WEBGL_THRESHOLD", 5000))
+# Classes de l'histogramme des scores (largeur 2 points sur 0-100)
+SCORE_BINS = 50
+
+LEVEL_LABELS = {"quartier": "Nom du quartier", "commune": "Commune", "province": "Province"}
+
+ACCESS_COLUMNS = [
+    "Accessibilité Transports (0-10)", "Accessibilité Santé (0-10)",
+    "Accessibilité Education (0-10)", "Sécurité (0-10)",
+]
+CORRELATION_COLUMNS = [
+    "Taux de chômage (%)", "Indice de Vétusté (0-10)", *ACCESS_COLUMNS, SCORE_COLUMN,
+]
+
+
+def render_mode(n_points):
+    """Mode de rendu Plotly Express ("webgl" ou "svg") d'une série de `n_points` points."""
+    return "webgl" if n_points > WEBGL_THRESHOLD else "svg"
+
+
+def chart_level(n_units, n_communes):
+    """Niveau de détail des graphiques : quartier, commune ou province."""
+    if n_units <= MAX_CATEGORIES:
+        return "quartier"
+    if n_communes <= MAX_CATEGORIES:
+        return "commune"
+    return "province"
+
+
+def grouped_means(group, labels, population, columns):
+    """
+    Moyennes pondérées par la population de `columns` ({nom: valeurs par unité}) pour
+    chaque groupe (`group` : indice du groupe de chaque unité, -1 : hors groupe).
+    Seuls les groupes contenant au moins une unité sont retournés.
+    """
+    matched = group >= 0
+    group = group[matched]
+    population = np.asarray(population, dtype=np.float64)[matched]
+    n_groups = len(labels)
+    counts = np.bincount(group, minlength=n_groups)
+    total = np.bincount(group, weights=population, minlength=n_groups)
+
+    result = pd.DataFrame({"label": labels})
+    for name, values in columns.items():
+        weighted = np.bincount(group, weights=np.asarray(values, dtype=np.float64)[matched] * population,
+                               minlength=n_groups)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[name] = np.where(total > 0, weighted / total, np.nan)
+    result["Population"] = total
+    result[UNIT_COUNT_COLUMN] = counts
+    return result[counts > 0].reset_index(drop=True)
+
+
+def score_histogram(scores, population, bins=SCORE_BINS):
+    """Nombre d'unités et population par classe de score (0-100)."""
+    edges = np.linspace(0, 100, bins + 1)
+    bin_index = np.clip(np.searchsorted(edges, scores, side="right") - 1, 0, bins - 1)
+    return pd.DataFrame({
+        "Score (classe)": (edges[:-1] + edges[1:]) / 2,
+        UNIT_COUNT_COLUMN: np.bincount(bin_index, minlength=bins),
+        "Population": np.bincount(bin_index, weights=population, minlength=bins),
+    })
+
+
+def prepare_dashboard_charts(names, scores, order, population, columns, commune_index, communes,
+                             provinces):
+    """
+    Données réduites des graphiques du Dashboard pour un jeu de poids.
+
+    `scores` et `order` (unités par score décroissant) viennent du modèle et de
+    l'index de classement, `columns` ({indicateur: valeurs par unité}) contient les
+    colonnes de ACCESS_COLUMNS, `commune_index` la commune de chaque unité
+    (-1 : hors communes) dans `communes`, et `provinces` la province de chaque
+    commune. Retourne un dict : level, label (colonne des catégories), scores
+    (triés par score décroissant), population, indicators (format long),
+    histogram (None au niveau quartier) et units.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    population = np.asarray(population, dtype=np.float64)
+    level = chart_level(len(scores), len(communes))
+    label = LEVEL_LABELS[level]
+    values = {SCORE_COLUMN: scores, **{c: columns[c] for c in ACCESS_COLUMNS}}
+
+    if level == "quartier":
+        grouped = pd.DataFrame({"label": np.asarray(names, dtype=object), **values, "Population": population})
+    else:
+        if level == "province":
+            province_names, province_codes = np.unique(np.asarray(provinces, dtype=object), return_inverse=True)
+            group = np.where(commune_index >= 0, province_codes[np.maximum(commune_index, 0)], -1)
+            labels = province_names
+        else:
+            group, labels = np.asarray(commune_index), np.asarray(communes, dtype=object)
+        grouped = grouped_means(group, labels, population, values)
+    grouped = grouped.rename(columns={"label": label})
+
+    if level == "quartier":
+        by_score = grouped.iloc[order].reset_index(drop=True)
+    else:
+        by_score = grouped.sort_values(SCORE_COLUMN, ascending=False, ignore_index=True)
+
+    return {
+        "level": level,
+        "label": label,
+        "scores": by_score[[label, SCORE_COLUMN]],
+        "population": grouped[[label, "Population"]],
+        "indicators": grouped[[label, *ACCESS_COLUMNS]].melt(
+            id_vars=label, var_name="Indicateur", value_name="Score"
+        ),
+        "histogram": None if level == "quartier" else score_histogram(scores, population),
+        "units": len(scores),
+    }
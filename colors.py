@@ -0,0 +1,37 @@
+"""
+Couleurs de la carte selon le score de vulnérabilité ou la valeur d'un indicateur.
+
+Module sans dépendance vers utils : maps.py (Folium) et les pages l'importent
+directement, utils le réexporte.
+"""
+from ranking import HIGH_PRIORITY, MEDIUM_PRIORITY
+from scoring import SCORE_COLUMN
+
+# Seuils des indicateurs notés de 0 à 10 (valeur strictement supérieure)
+INDICATOR_HIGH = 7
+INDICATOR_MEDIUM = 4
+
+
+def get_color_for_score(score):
+    """Retourne une couleur en fonction du score de vulnérabilité."""
+    if score > HIGH_PRIORITY:
+        return "#e74c3c"  # Rouge (priorité haute)
+    elif score > MEDIUM_PRIORITY:
+        return "#f39c12"  # Orange (priorité moyenne)
+    else:
+        return "#27ae60"  # Vert (priorité basse)
+
+
+def get_color_for_indicator(indicator, value):
+    """Retourne une couleur pour la valeur d'un indicateur affiché sur la carte."""
+    if indicator == SCORE_COLUMN:
+        return get_color_for_score(value)
+    if "Accessibilité" in indicator or "Sécurité" in indicator:
+        # Plus c'est élevé, mieux c'est (vert)
+        if value > INDICATOR_HIGH: return "#27ae60"
+        elif value > INDICATOR_MEDIUM: return "#f39c12"
+        else: return "#e74c3c"
+    # Plus c'est élevé, pire c'est (rouge)
+    if value > INDICATOR_HIGH: return "#e74c3c"
+    elif value > INDICATOR_MEDIUM: return "#f39c12"
+    else: return "#27ae60"
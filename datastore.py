@@ -0,0 +1,134 @@
+"""
+Stockage colonnaire sur disque (Parquet / Arrow IPC) des indicateurs par unité spatiale.
+Les fichiers sont lus en memory-map et seules les colonnes demandées sont chargées.
+
+Conversion des données synthétiques :
+    python datastore.py Data/rabat.parquet
+    python datastore.py Data/rabat_1M.arrow --units 1000000
+"""
+import argparse
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+# Format déduit de l'extension du fichier
+FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+
+def dataset_format(path):
+    """Retourne "parquet" ou "arrow" selon l'extension de `path`."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Format de fichier non supporté : {ext} (attendu : {', '.join(FORMATS)})")
+    return FORMATS[ext]
+
+
+def dataset_version(path):
+    """
+    Identifiant de version d'un fichier (chemin, date de modification, taille),
+    utilisé comme clé de cache : il change dès que le fichier est réécrit.
+    """
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}@{stat.st_mtime_ns}-{stat.st_size}"
+
+
+# --- Écriture ---
+def write_dataset(data, path, compression=None):
+    """
+    Écrit un DataFrame, ou un itérable de DataFrames (par ex. generate_synthetic_units),
+    au format Parquet ou Arrow IPC. Les blocs sont écrits au fil de l'eau : la mémoire
+    reste bornée à la taille d'un bloc. Retourne le nombre de lignes écrites.
+
+    Par défaut le Parquet est compressé en zstd et l'Arrow IPC n'est pas compressé,
+    pour pouvoir être lu sans copie depuis le fichier mappé.
+    """
+    fmt = dataset_format(path)
+    if compression is None and fmt == "parquet":
+        compression = "zstd"
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    tmp_path = f"{path}.tmp"
+
+    writer = None
+    n_rows = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(tmp_path, table.schema, compression=compression)
+                else:
+                    options = ipc.IpcWriteOptions(compression=compression)
+                    writer = ipc.new_file(tmp_path, table.schema, options=options)
+            writer.write_table(table)
+            n_rows += table.num_rows
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_path)
+        raise
+
+    if writer is None:
+        raise ValueError("Aucune donnée à écrire")
+    writer.close()
+    # Remplacement atomique : un lecteur ne voit jamais un fichier à moitié écrit
+    os.replace(tmp_path, path)
+    return n_rows
+
+
+# --- Lecture ---
+def read_table(path, columns=None):
+    """
+    Lit `path` en memory-map et retourne une pyarrow.Table limitée à `columns`.
+    Pour Arrow IPC non compressé, les colonnes restent adossées au fichier mappé.
+    """
+    if dataset_format(path) == "parquet":
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    with pa.memory_map(path, "r") as source:
+        table = ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def read_dataset(path, columns=None):
+    """Lit `path` et retourne un DataFrame avec uniquement les colonnes demandées."""
+    return read_table(path, columns).to_pandas()
+
+
+def dataset_columns(path):
+    """Liste des colonnes disponibles, lue dans le schéma sans charger les données."""
+    if dataset_format(path) == "parquet":
+        return pq.read_schema(path).names
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).schema.names
+
+
+def main():
+    from utils import generate_rabat_data, generate_synthetic_units
+
+    parser = argparse.ArgumentParser(description="Exporte les données synthétiques au format Parquet ou Arrow.")
+    parser.add_argument("path", help="Fichier de sortie (.parquet ou .arrow)")
+    parser.add_argument("--units", type=int, default=None,
+                        help="Nombre d'unités synthétiques (par défaut : les 7 quartiers)")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.units is None:
+        data = generate_rabat_data(seed=args.seed)
+    else:
+        data = generate_synthetic_units(args.units, chunk_size=args.chunk_size, seed=args.seed)
+    n_rows = write_dataset(data, args.path)
+    print(f"{n_rows:,} lignes écrites dans {args.path}")
+
+
+if __name__ == "__main__":
+    main()
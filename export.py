@@ -0,0 +1,217 @@
+"""
+Export des données scorées par blocs, sans construire le fichier entier en mémoire.
+
+Les lignes sont écrites bloc par bloc dans un fichier temporaire (CSV compressé
+gzip/zstd côté serveur, ou Parquet), puis renommé : la mémoire reste bornée à un
+bloc quelle que soit la taille du jeu. L'export GeoJSON joint les agrégats par
+commune à la géométrie des communes. Les exports sont préparés dans un fil de
+fond (ExportManager) : la session n'est pas bloquée et les profils de poids
+courants peuvent être précalculés.
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from datastore import write_dataset
+from scoring import SCORE_COLUMN
+
+# Formats d'export : extension du fichier, libellé et type MIME
+EXPORT_FORMATS = {
+    "csv.gz": ("CSV compressé (gzip)", "application/gzip"),
+    "csv.zst": ("CSV compressé (zstd)", "application/zstd"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+    "geojson": ("GeoJSON (agrégats par commune)", "application/geo+json"),
+}
+CSV_CODECS = {"csv.gz": "gzip", "csv.zst": "zstd"}
+
+# Niveau de compression gzip (6 : défaut de l'outil gzip, bon compromis taille/temps)
+GZIP_LEVEL = 6
+
+# Nombre de lignes écrites par bloc
+EXPORT_CHUNK = 100_000
+
+# Nombre de fichiers d'export conservés sur disque
+MAX_EXPORT_FILES = 32
+
+# Délai (s) pendant lequel un export terminé n'est pas supprimé : une session qui
+# vient de le voir prêt a le temps de l'ouvrir
+EVICTION_GRACE = 300
+
+
+# --- Écriture ---
+def scored_chunks(df, scores, columns=None, chunk_size=EXPORT_CHUNK):
+    """
+    Blocs de `df` (colonnes `columns`, par défaut toutes) avec la colonne de score.
+    Les blocs sont des tranches de `df` : seules les colonnes exportées sont copiées.
+    """
+    columns = [c for c in (columns or df.columns) if c != SCORE_COLUMN]
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes inconnues : {', '.join(missing)}")
+    for start in range(0, max(len(df), 1), chunk_size):
+        chunk = df.iloc[start:start + chunk_size][columns]
+        chunk[SCORE_COLUMN] = scores[start:start + chunk_size]
+        yield chunk
+
+
+def write_csv(chunks, path, codec):
+    """Écrit les blocs en CSV compressé (`codec` : "gzip" ou "zstd"). Retourne le nombre de lignes."""
+    tmp_path = f"{path}.tmp"
+    n_rows = 0
+    writer = None
+    try:
+        if codec == "gzip":
+            sink = gzip.open(tmp_path, "wb", compresslevel=GZIP_LEVEL)
+        else:
+            sink = pa.CompressedOutputStream(tmp_path, codec)
+        with sink:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pa_csv.CSVWriter(sink, table.schema)
+                writer.write_table(table)
+                n_rows += table.num_rows
+            if writer is not None:
+                writer.close()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return n_rows
+
+
+def export_rows(df, scores, path, fmt, columns=None, chunk_size=EXPORT_CHUNK):
+    """Exporte les lignes de `df` scorées au format `fmt` ("csv.gz", "csv.zst" ou "parquet")."""
+    chunks = scored_chunks(df, scores, columns, chunk_size)
+    if fmt in CSV_CODECS:
+        return write_csv(chunks, path, CSV_CODECS[fmt])
+    if fmt == "parquet":
+        return write_dataset(chunks, path)
+    raise ValueError(f"Format d'export par lignes non supporté : {fmt}")
+
+
+def write_commune_geojson(path, geojson, aggregates, key="commune"):
+    """
+    Écrit les communes de `geojson` avec, dans leurs propriétés, les agrégats de
+    `aggregates` (DataFrame indexé par commune). Les entités sont écrites une à une.
+    Retourne le nombre de communes.
+    """
+    tmp_path = f"{path}.tmp"
+    rows = aggregates.to_dict(orient="index")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        for i, feature in enumerate(geojson["features"]):
+            properties = dict(feature["properties"])
+            for name, value in rows.get(properties.get(key), {}).items():
+                properties[name] = None if isinstance(value, float) and math.isnan(value) else value
+            if i:
+                f.write(",\n")
+            json.dump({"type": "Feature", "properties": properties, "geometry": feature["geometry"]},
+                      f, ensure_ascii=False, default=float)
+        f.write("\n]}\n")
+    os.replace(tmp_path, path)
+    return len(geojson["features"])
+
+
+# --- Préparation en Arrière-Plan ---
+class ExportManager:
+    """
+    Prépare les exports dans un fil de fond et les conserve sur disque dans
+    `directory`, identifiés par une clé (version des données, poids, format, colonnes).
+    Les fichiers les plus anciens sont supprimés au-delà de `max_files`, sauf
+    ceux terminés depuis moins de `grace` secondes.
+    """
+
+    def __init__(self, directory, max_workers=1, max_files=MAX_EXPORT_FILES, grace=EVICTION_GRACE):
+        self.directory = directory
+        self.max_files = max_files
+        self.grace = grace
+        self.finished = {}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self.jobs = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key, fmt):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"urbanlife_{digest}.{fmt}")
+
+    def submit(self, key, fmt, build):
+        """
+        Lance `build(path)` en arrière-plan si l'export `key` n'existe pas encore
+        (ou a échoué). Retourne le chemin du fichier.
+        """
+        with self.lock:
+            if self._status(key) in ("pending", "ready"):
+                return self.jobs[key][1]
+            path = self.path_for(key, fmt)
+            future = self.pool.submit(build, path)
+            self.jobs[key] = (future, path)
+            self.finished.pop(key, None)
+            self._evict()
+        # Hors du verrou : un futur déjà terminé appelle le rappel immédiatement
+        future.add_done_callback(lambda _: self._finished(key))
+        return path
+
+    def _finished(self, key):
+        with self.lock:
+            self.finished[key] = time.monotonic()
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [
+            k for k, (future, _) in self.jobs.items()
+            if future.done() and now - self.finished.get(k, now) >= self.grace
+        ]
+        for k in expired[:max(len(self.jobs) - self.max_files, 0)]:
+            _, path = self.jobs.pop(k)
+            self.finished.pop(k, None)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _status(self, key):
+        job = self.jobs.get(key)
+        if job is None:
+            return None
+        if not job[0].done():
+            return "pending"
+        if job[0].exception() is not None:
+            return "error"
+        # Fichier supprimé hors du gestionnaire : l'export est à refaire
+        return "ready" if os.path.exists(job[1]) else None
+
+    def status(self, key):
+        """None (jamais demandé, ou fichier disparu), "pending", "ready" ou "error"."""
+        with self.lock:
+            return self._status(key)
+
+    def wait(self, key, timeout=None):
+        """Attend au plus `timeout` secondes la fin de l'export ; retourne son statut."""
+        with self.lock:
+            job = self.jobs.get(key)
+        # L'attente se fait hors du verrou, pour ne pas bloquer les autres sessions
+        if job is not None:
+            try:
+                job[0].result(timeout=timeout)
+            except Exception:
+                pass
+        return self.status(key)
+
+    def path(self, key):
+        """Chemin du fichier de l'export `key` ; KeyError s'il a été supprimé."""
+        with self.lock:
+            return self.jobs[key][1]
+
+    def error(self, key):
+        with self.lock:
+            job = self.jobs.get(key)
+        return None if job is None else job[0].exception()
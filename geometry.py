@@ -0,0 +1,255 @@
+"""
+Cache de géométrie multi-résolution pour la carte.
+
+Le GeoJSON des communes est converti hors ligne en une topologie à arcs partagés
+(type TopoJSON) aux coordonnées quantifiées. Chaque point d'arc porte son importance
+Douglas-Peucker : une résolution correspond simplement à un seuil, et une frontière
+commune à deux communes est simplifiée une seule fois (pas de trous entre polygones).
+
+Prétraitement :
+    python geometry.py                      # Data/Rabat.geojson -> Data/Rabat.topo.json
+"""
+import argparse
+import json
+
+import numpy as np
+
+GEOJSON_PATH = "Data/Rabat.geojson"
+TOPOLOGY_PATH = "Data/Rabat.topo.json"
+
+# Nombre de pas de la grille de quantification sur la plus grande dimension de l'emprise
+QUANTIZATION = 100_000
+
+# Niveaux de résolution : (nom, zoom maximal servi, tolérance en pixels à ce zoom).
+# Le dernier niveau conserve tous les points.
+DEFAULT_LEVELS = [
+    ("z10", 10, 0.5),
+    ("z12", 12, 0.5),
+    ("z14", 14, 0.5),
+    ("full", None, 0.0),
+]
+
+# Importance des points toujours conservés (extrémités d'arcs, points minimaux)
+ALWAYS_KEEP = 2**31 - 1
+
+
+def pixel_size_degrees(zoom):
+    """Taille d'un pixel (en degrés de longitude) pour un niveau de zoom Web Mercator."""
+    return 360.0 / (256 * 2**zoom)
+
+
+# --- Douglas-Peucker ---
+def douglas_peucker_importance(points):
+    """
+    Calcule pour chaque point d'un arc (m x 2) la tolérance Douglas-Peucker jusqu'à
+    laquelle il est conservé. L'importance d'un point est bornée par celle du point
+    qui l'a découpé, si bien que simplifier à une tolérance t revient à garder les
+    points d'importance > t. Les extrémités valent ALWAYS_KEEP.
+    """
+    m = len(points)
+    importance = np.zeros(m, dtype=np.float64)
+    importance[0] = importance[-1] = ALWAYS_KEEP
+
+    stack = [(0, m - 1, float(ALWAYS_KEEP))]
+    while stack:
+        first, last, parent = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        inner = points[first + 1:last]
+        dx, dy = end - start
+        length = np.hypot(dx, dy)
+        if length == 0:
+            # Arc fermé : distance au point de départ
+            dist = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            dist = np.abs(dx * (inner[:, 1] - start[1]) - dy * (inner[:, 0] - start[0])) / length
+        k = int(np.argmax(dist))
+        split = first + 1 + k
+        importance[split] = min(dist[k], parent)
+        stack.append((first, split, importance[split]))
+        stack.append((split, last, importance[split]))
+
+    # Un arc garde toujours au moins un point intérieur (deux s'il est fermé),
+    # pour qu'aucun anneau ne dégénère aux résolutions grossières.
+    n_keep = min(m - 2, 2 if _is_closed(points) else 1)
+    if n_keep > 0:
+        top = np.argsort(importance[1:-1])[-n_keep:] + 1
+        importance[top] = ALWAYS_KEEP
+    return importance
+
+
+def _is_closed(points):
+    return bool(np.all(points[0] == points[-1]))
+
+
+# --- Topologie ---
+def _rings(geometry):
+    """Anneaux d'une géométrie Polygon / MultiPolygon, groupés par polygone."""
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    raise ValueError(f"Type de géométrie non supporté : {geometry['type']}")
+
+
+def _find_junctions(rings):
+    """Points partagés où les anneaux voisins divergent (début/fin des frontières communes)."""
+    neighbors = {}
+    for ring in rings:
+        n = len(ring)
+        for i, point in enumerate(ring):
+            pair = frozenset((ring[i - 1], ring[(i + 1) % n]))
+            neighbors.setdefault(point, set()).add(pair)
+    return {point for point, pairs in neighbors.items() if len(pairs) > 1}
+
+
+def _cut_ring(ring, junctions):
+    """Découpe un anneau ouvert en arcs aux jonctions (un seul arc fermé sans jonction)."""
+    cuts = [i for i, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        return [ring + [ring[0]]]
+    rotated = ring[cuts[0]:] + ring[:cuts[0]]
+    cuts = [c - cuts[0] for c in cuts] + [len(ring)]
+    rotated.append(rotated[0])
+    return [rotated[a:b + 1] for a, b in zip(cuts[:-1], cuts[1:])]
+
+
+def build_topology(geojson, quantization=QUANTIZATION, levels=DEFAULT_LEVELS):
+    """
+    Construit la topologie multi-résolution d'un GeoJSON de polygones.
+    Retourne un dictionnaire sérialisable au format TopoJSON (arcs delta-encodés),
+    complété des importances Douglas-Peucker par point et des niveaux de résolution.
+    """
+    features = geojson["features"]
+    all_coords = np.array([
+        point for f in features for polygon in _rings(f["geometry"]) for ring in polygon for point in ring
+    ], dtype=np.float64)[:, :2]
+    translate = all_coords.min(axis=0)
+    # Même pas sur les deux axes : les distances Douglas-Peucker restent isotropes
+    scale = float((all_coords.max(axis=0) - translate).max() / (quantization - 1))
+
+    def quantize(ring):
+        q = np.round((np.asarray(ring, dtype=np.float64)[:, :2] - translate) / scale).astype(np.int64)
+        points = [tuple(p) for p in q.tolist()]
+        # Anneau ouvert, sans doublons consécutifs créés par la quantification
+        deduped = [p for i, p in enumerate(points) if i == 0 or p != points[i - 1]]
+        if deduped[-1] == deduped[0]:
+            deduped.pop()
+        return deduped
+
+    quantized = [[[quantize(ring) for ring in polygon] for polygon in _rings(f["geometry"])] for f in features]
+    junctions = _find_junctions([ring for polys in quantized for polygon in polys for ring in polygon])
+
+    arcs, arc_index = [], {}
+
+    def arc_id(points):
+        key = tuple(points)
+        if key in arc_index:
+            return arc_index[key]
+        reverse = tuple(reversed(points))
+        if reverse in arc_index:
+            return ~arc_index[reverse]
+        arc_index[key] = len(arcs)
+        arcs.append(np.array(points, dtype=np.int64))
+        return arc_index[key]
+
+    geometries = []
+    for feature, polys in zip(features, quantized):
+        geometries.append({
+            "type": "MultiPolygon",
+            "arcs": [[[arc_id(arc) for arc in _cut_ring(ring, junctions)] for ring in polygon] for polygon in polys],
+            "properties": feature["properties"],
+        })
+
+    importance = [douglas_peucker_importance(arc.astype(np.float64)) for arc in arcs]
+    topology = {
+        "type": "Topology",
+        "transform": {"scale": [scale, scale], "translate": translate.tolist()},
+        "arcs": [np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist() for arc in arcs],
+        "importance": [np.ceil(imp).astype(np.int64).tolist() for imp in importance],
+        "levels": [
+            {
+                "name": name,
+                "max_zoom": max_zoom,
+                # -1 : tous les points, y compris ceux d'importance nulle (alignés)
+                "tolerance": -1 if max_zoom is None else pixels * pixel_size_degrees(max_zoom) / scale,
+            }
+            for name, max_zoom, pixels in levels
+        ],
+        "objects": {"communes": {"type": "GeometryCollection", "geometries": geometries}},
+    }
+    if "crs" in geojson:
+        topology["crs"] = geojson["crs"]
+    return topology
+
+
+# --- Décodage ---
+def level_for_zoom(topology, zoom):
+    """Niveau le plus léger dont la résolution suffit au zoom demandé."""
+    for level in topology["levels"]:
+        if level["max_zoom"] is None or zoom is None or zoom <= level["max_zoom"]:
+            return level
+    return topology["levels"][-1]
+
+
+def decode_geojson(topology, level="full", precision=6):
+    """
+    Reconstruit un GeoJSON FeatureCollection au niveau de résolution `level`
+    (nom ou dictionnaire de niveau). Les coordonnées sont arrondies à `precision`
+    décimales pour réduire la taille du JSON envoyé au navigateur.
+    """
+    if isinstance(level, str):
+        level = next(lv for lv in topology["levels"] if lv["name"] == level)
+    scale = np.array(topology["transform"]["scale"])
+    translate = np.array(topology["transform"]["translate"])
+
+    arcs = []
+    for deltas, importance in zip(topology["arcs"], topology["importance"]):
+        points = np.cumsum(np.array(deltas, dtype=np.int64), axis=0)
+        keep = np.array(importance) > level["tolerance"]
+        arcs.append(np.round(points[keep] * scale + translate, precision).tolist())
+
+    def ring_coords(arc_ids):
+        coords = []
+        for arc_id in arc_ids:
+            arc = arcs[arc_id] if arc_id >= 0 else arcs[~arc_id][::-1]
+            coords.extend(arc if not coords else arc[1:])
+        return coords
+
+    features = [
+        {
+            "type": "Feature",
+            "properties": geometry["properties"],
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [[ring_coords(ring) for ring in polygon] for polygon in geometry["arcs"]],
+            },
+        }
+        for geometry in topology["objects"]["communes"]["geometries"]
+    ]
+    geojson = {"type": "FeatureCollection", "features": features}
+    if "crs" in topology:
+        geojson["crs"] = topology["crs"]
+    return geojson
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prétraite le GeoJSON en topologie multi-résolution.")
+    parser.add_argument("source", nargs="?", default=GEOJSON_PATH)
+    parser.add_argument("output", nargs="?", default=TOPOLOGY_PATH)
+    parser.add_argument("--quantization", type=int, default=QUANTIZATION)
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        topology = build_topology(json.load(f), quantization=args.quantization)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(topology, f, ensure_ascii=False, separators=(",", ":"))
+
+    for level in topology["levels"]:
+        payload = json.dumps(decode_geojson(topology, level), separators=(",", ":"))
+        print(f"{level['name']:>5} : {len(payload) / 1024:.0f} Ko")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Instrumentation légère des chemins critiques : durées par étape et compteurs.
+
+`timed("étape")` s'utilise comme gestionnaire de contexte ou comme décorateur.
+Chaque mesure alimente l'histogramme de l'étape dans METRICS (tout le processus)
+et, si une exécution de page est en cours dans le fil courant (begin_rerun),
+le détail de cette exécution. Les métriques s'exportent au format texte de
+Prometheus (prometheus_text, start_metrics_server) ; le détail de chaque
+exécution peut être ajouté à un fichier JSON Lines.
+"""
+import functools
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bornes des classes des histogrammes de durée (secondes)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+METRIC_PREFIX = "urbanlife"
+
+
+class Metrics:
+    """Histogrammes de durée par étape et compteurs, partagés par les fils du processus."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = {
+                    "buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0, "max": 0.0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+
+    def increment(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def summary(self):
+        """{étape: {count, mean, max, p95}} ; p95 est la borne de la classe qui le contient."""
+        with self.lock:
+            summary = {}
+            for stage, h in self.histograms.items():
+                target, seen, p95 = 0.95 * h["count"], 0, math.inf
+                for bound, count in zip(self.buckets, h["buckets"]):
+                    seen += count
+                    if seen >= target:
+                        p95 = bound
+                        break
+                summary[stage] = {
+                    "count": h["count"], "mean": h["sum"] / h["count"], "max": h["max"],
+                    "p95": min(p95, h["max"]),
+                }
+            return summary
+
+    def prometheus_text(self):
+        """Métriques au format texte d'exposition de Prometheus."""
+        with self.lock:
+            name = f"{METRIC_PREFIX}_stage_seconds"
+            lines = [f"# HELP {name} Durée des étapes instrumentées.", f"# TYPE {name} histogram"]
+            for stage, h in sorted(self.histograms.items()):
+                label = _label(stage)
+                cumulative = 0
+                for bound, count in zip(self.buckets, h["buckets"]):
+                    cumulative += count
+                    le = "+Inf" if math.isinf(bound) else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{label}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{label}"}} {h["sum"]!r}')
+                lines.append(f'{name}_count{{stage="{label}"}} {h["count"]}')
+            name = f"{METRIC_PREFIX}_events_total"
+            lines += [f"# HELP {name} Compteurs d'événements.", f"# TYPE {name} counter"]
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f'{name}{{event="{_label(counter)}"}} {value}')
+            return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+METRICS = Metrics()
+
+
+# --- Détail par Exécution ---
+_current = threading.local()
+
+
+class RerunRecorder:
+    """Durées des étapes d'une exécution de page, dans l'ordre de leur fin."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.total = None
+
+    def record(self, stage, seconds):
+        self.stages.append((stage, seconds))
+
+    def to_dict(self):
+        return {
+            "page": self.page,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "total": self.total,
+            "stages": [{"stage": stage, "seconds": seconds} for stage, seconds in self.stages],
+        }
+
+
+def begin_rerun(page):
+    """Démarre l'enregistrement du détail de l'exécution de `page` dans le fil courant."""
+    _current.recorder = RerunRecorder(page)
+    METRICS.increment(f"rerun:{page}")
+    return _current.recorder
+
+
+def end_rerun(log_path=None):
+    """
+    Termine l'exécution en cours du fil courant et retourne son RerunRecorder
+    (None si aucune). Le détail est ajouté à `log_path` (JSON Lines) s'il est fourni.
+    """
+    recorder = getattr(_current, "recorder", None)
+    if recorder is None:
+        return None
+    _current.recorder = None
+    recorder.total = time.perf_counter() - recorder.start
+    METRICS.observe(f"rerun:{recorder.page}", recorder.total)
+    if log_path:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(recorder.to_dict(), ensure_ascii=False) + "\n")
+    return recorder
+
+
+class timed:
+    """
+    Mesure la durée d'une étape : `with timed("étape"):` ou `@timed("étape")`.
+    Une exception est comptée dans le compteur "erreur:<étape>".
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        METRICS.observe(self.stage, seconds)
+        if exc_type is not None:
+            METRICS.increment(f"erreur:{self.stage}")
+        recorder = getattr(_current, "recorder", None)
+        if recorder is not None:
+            recorder.record(self.stage, seconds)
+        return False
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+# --- Exposition Prometheus ---
+def start_metrics_server(port, host="127.0.0.1", metrics=METRICS):
+    """Sert `metrics` au format Prometheus sur http://host:port/metrics (fil de fond)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
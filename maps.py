@@ -0,0 +1,132 @@
+"""
+Construction de la carte Folium en deux parties :
+- une carte de base statique (fond de carte + géométrie des communes), construite
+  une fois par niveau de géométrie et réutilisée d'un rerun à l'autre ;
+- une couche dynamique légère (table de couleurs par commune + marqueurs),
+  envoyée via `feature_group_to_add` de st_folium quand l'indicateur ou les poids changent.
+
+Tant que la carte de base ne change pas, st_folium conserve la carte Leaflet
+déjà affichée et n'exécute que le script de la couche dynamique.
+"""
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+from colors import get_color_for_score
+
+MAP_CENTER = {"lat": 34.00, "lng": -6.85}
+MAP_ZOOM = 12
+
+BASE_STYLE = {
+    "fillColor": "#bdc3c7",
+    "color": "black",
+    "weight": 2,
+    "fillOpacity": 0.6,
+}
+HIGHLIGHT_STYLE = {
+    "fillColor": "#ffff00",
+    "color": "black",
+    "weight": 3,
+    "fillOpacity": 0.8,
+}
+TOOLTIP_STYLE = "background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;"
+
+
+class FeatureColorTable(MacroElement):
+    """
+    Recolore les polygones de la carte de base à partir d'une table compacte
+    {valeur de `key`: couleur}, sans renvoyer la géométrie. Le style est aussi
+    installé comme style par défaut de la couche, pour que le survol le restaure.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var colors = {{ this.colors|tojson }};
+            var baseStyle = {{ this.base_style|tojson }};
+            var styler = function(feature) {
+                var color = colors[feature.properties[{{ this.key|tojson }}]];
+                return Object.assign({}, baseStyle, color ? {fillColor: color} : {});
+            };
+            {{ this._parent._parent.get_name() }}.eachLayer(function(layer) {
+                if (layer instanceof L.GeoJSON) {
+                    layer.options.style = styler;
+                    layer.setStyle(styler);
+                }
+            });
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, colors, key="commune", base_style=BASE_STYLE):
+        super().__init__()
+        self._name = "FeatureColorTable"
+        self.colors = colors
+        self.key = key
+        self.base_style = base_style
+
+
+# --- Carte de Base ---
+def build_base_map(geojson_data, center=MAP_CENTER, zoom=MAP_ZOOM):
+    """Carte statique : fond de carte et communes avec infobulles, sans données."""
+    m = folium.Map(location=[center["lat"], center["lng"]], zoom_start=zoom, tiles="CartoDB positron")
+    folium.GeoJson(
+        geojson_data,
+        name="communes",
+        style_function=lambda feature: BASE_STYLE,
+        highlight_function=lambda feature: HIGHLIGHT_STYLE,
+        tooltip=folium.GeoJsonTooltip(
+            fields=['commune', 'province_1'],
+            aliases=['Commune:', 'Province:'],
+            style=TOOLTIP_STYLE
+        ),
+        popup=folium.GeoJsonPopup(
+            fields=['commune', 'province_1', 'region'],
+            aliases=['Commune:', 'Province:', 'Région:'],
+            style=TOOLTIP_STYLE
+        )
+    ).add_to(m)
+    return m
+
+
+def detach_data_layers(m):
+    """
+    Retire de la carte de base les couches dynamiques rattachées par st_folium au
+    rerun précédent, pour que le script de la carte de base reste identique.
+    """
+    for name, child in list(m._children.items()):
+        if getattr(child, "is_data_layer", False):
+            del m._children[name]
+
+
+# --- Couche Dynamique ---
+def build_data_layer(commune_colors, df_scored, indicator):
+    """Couche dynamique : table de couleurs des communes et un marqueur par quartier."""
+    layer = folium.FeatureGroup(name="donnees")
+    layer.is_data_layer = True
+    layer.add_child(FeatureColorTable(commune_colors))
+
+    for row in df_scored.to_dict("records"):
+        score = row[indicator]
+        color = get_color_for_score(row["Score Vulnérabilité"])
+
+        popup_html = f"""
+        <div style="font-family: Arial; width: 200px;">
+            <h4 style="margin-bottom: 10px;">{row['Nom du quartier']}</h4>
+            <p><b>{indicator}:</b> {score}</p>
+            <p><b>Population:</b> {row['Population']:,}</p>
+            <p><b>Score Vulnérabilité:</b> {row['Score Vulnérabilité']:.1f}/100</p>
+        </div>
+        """
+
+        folium.CircleMarker(
+            location=[row["lat"], row["lon"]],
+            radius=8,
+            popup=folium.Popup(popup_html, max_width=250),
+            color=color,
+            fill=True,
+            fillColor=color,
+            fillOpacity=0.7,
+            weight=2
+        ).add_to(layer)
+    return layer
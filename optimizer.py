@@ -0,0 +1,156 @@
+"""
+Optimisation d'un portefeuille d'interventions sous contrainte budgétaire.
+
+Objectif : minimiser la vulnérabilité moyenne pondérée par la population de toute
+la ville. Les bornes du simulateur (0-10, valeurs positives) rendent l'impact d'un
+portefeuille non additif : les portefeuilles candidats sont donc toujours évalués
+exactement, par lots, avec ActionMatrix.
+
+- Petits ensembles d'actions : énumération exhaustive des portefeuilles qui
+  respectent le budget, évalués par lots vectorisés (solution exacte).
+- Grands ensembles : heuristique gloutonne au meilleur gain marginal par dirham,
+  suivie d'une passe d'échanges 1-pour-1, chaque étape évaluant tous les
+  candidats en un seul lot.
+"""
+import time
+
+import numpy as np
+
+from scoring import as_weight_matrix
+from simulation import ActionMatrix, action_cost, as_actions
+
+# Au-delà, l'énumération exhaustive (2^A portefeuilles) laisse la place à l'heuristique
+EXACT_MAX_ACTIONS = 16
+
+
+class PortfolioEvaluator:
+    """Évalue par lots l'impact pondéré par la population de portefeuilles d'actions."""
+
+    def __init__(self, model, actions, weights):
+        self.matrix = ActionMatrix(model, actions)
+        self.weights = as_weight_matrix(weights)[:1]
+        self.costs = np.array([action_cost(a) for a in actions], dtype=np.float64)
+        self.unit_population = model.population[self.matrix.units]
+        self.total_population = model.population.sum()
+        self.evaluated = 0
+
+    def impacts(self, selections):
+        """
+        Variation de la somme population x score (P,) de chaque portefeuille (P x A) :
+        négative quand le portefeuille réduit la vulnérabilité.
+        """
+        selections = np.atleast_2d(selections)
+        self.evaluated += len(selections)
+        if len(self.matrix.units) == 0:
+            return np.zeros(len(selections))
+        before, after = self.matrix.score(selections, self.weights)
+        return (after - before) @ self.unit_population
+
+
+def _subsets(candidates, n_actions, batch_size):
+    """Toutes les sélections (lots de matrices 0/1) sur les actions `candidates`."""
+    n = len(candidates)
+    bits = 1 << np.arange(n)
+    for start in range(0, 1 << n, batch_size):
+        codes = np.arange(start, min(start + batch_size, 1 << n))
+        selections = np.zeros((len(codes), n_actions))
+        selections[:, candidates] = (codes[:, None] & bits) > 0
+        yield selections
+
+
+def solve_exact(evaluator, candidates, budget, batch_size=65536):
+    """Meilleur portefeuille par énumération exhaustive des sous-ensembles dans le budget."""
+    best_selection = np.zeros(len(evaluator.costs))
+    best_impact = 0.0
+    for selections in _subsets(candidates, len(evaluator.costs), batch_size):
+        selections = selections[selections @ evaluator.costs <= budget]
+        if len(selections) == 0:
+            continue
+        impacts = evaluator.impacts(selections)
+        i = int(np.argmin(impacts))
+        if impacts[i] < best_impact:
+            best_impact, best_selection = impacts[i], selections[i]
+    return best_selection, best_impact
+
+
+def solve_greedy(evaluator, candidates, budget):
+    """
+    Heuristique : ajoute à chaque étape l'action au meilleur gain marginal par dirham
+    (toutes les additions possibles évaluées en un lot), puis tente des échanges
+    1-pour-1 tant qu'ils améliorent le portefeuille.
+    """
+    n_actions = len(evaluator.costs)
+    selection = np.zeros(n_actions)
+    current = 0.0
+
+    while True:
+        remaining = budget - selection @ evaluator.costs
+        options = [a for a in candidates if selection[a] == 0 and evaluator.costs[a] <= remaining]
+        if not options:
+            break
+        trials = np.repeat(selection[None, :], len(options), axis=0)
+        trials[np.arange(len(options)), options] = 1
+        gains = evaluator.impacts(trials) - current
+        ratio = gains / np.maximum(evaluator.costs[options], 1)
+        k = int(np.argmin(ratio))
+        if gains[k] >= 0:
+            break
+        selection, current = trials[k], current + gains[k]
+
+    improved = True
+    while improved:
+        improved = False
+        inside = [a for a in candidates if selection[a] == 1]
+        outside = [a for a in candidates if selection[a] == 0]
+        pairs = [(i, o) for i in inside for o in outside]
+        if not pairs:
+            break
+        trials = np.repeat(selection[None, :], len(pairs), axis=0)
+        rows = np.arange(len(pairs))
+        trials[rows, [i for i, _ in pairs]] = 0
+        trials[rows, [o for _, o in pairs]] = 1
+        feasible = trials @ evaluator.costs <= budget
+        if not feasible.any():
+            break
+        trials = trials[feasible]
+        impacts = evaluator.impacts(trials)
+        k = int(np.argmin(impacts))
+        if impacts[k] < current - 1e-9:
+            selection, current = trials[k], impacts[k]
+            improved = True
+    return selection, current
+
+
+def optimize_portfolio(model, actions, budget, weights, exact_max_actions=EXACT_MAX_ACTIONS):
+    """
+    Choisit le sous-ensemble d'actions qui minimise la vulnérabilité moyenne pondérée
+    par la population sous le budget (MAD). Retourne un dictionnaire décrivant le
+    portefeuille retenu, son coût, la vulnérabilité moyenne avant/après et la méthode.
+    """
+    start = time.perf_counter()
+    actions = as_actions(actions)
+    evaluator = PortfolioEvaluator(model, actions, weights)
+    # Seules les actions qui touchent au moins un quartier et tiennent dans le budget sont candidates
+    candidates = [
+        a for a in range(len(actions))
+        if evaluator.matrix.touches[a].any() and evaluator.costs[a] <= budget
+    ]
+
+    if len(candidates) <= exact_max_actions:
+        method = "exacte"
+        selection, impact = solve_exact(evaluator, candidates, budget)
+    else:
+        method = "heuristique"
+        selection, impact = solve_greedy(evaluator, candidates, budget)
+
+    scores = model.score_batch(weights)[0]
+    mean_before = float(scores @ model.population / evaluator.total_population)
+    return {
+        "actions": [actions[a].name for a in np.flatnonzero(selection)],
+        "cost": float(selection @ evaluator.costs),
+        "mean_before": mean_before,
+        "mean_after": float(mean_before + impact / evaluator.total_population),
+        "method": method,
+        "evaluated": evaluator.evaluated,
+        "seconds": time.perf_counter() - start,
+    }
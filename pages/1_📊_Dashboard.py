@@ -2,7 +2,15 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import generate_rabat_data, calculate_vulnerability_score, INDICATOR_EXPLANATIONS
+from charts import render_mode
+from export import EXPORT_FORMATS
+from instrumentation import timed
+from sensitivity import stability_margin, top_regions
+from utils import (
+    load_dataset, get_scoring_model, score_for_session, ranking_for_session, get_weight_sensitivity,
+    get_indicator_panel, dashboard_chart_data, indicator_correlation, get_export_manager, export_key,
+    request_export, precompute_exports, warm_start, begin_page, end_page, INDICATOR_EXPLANATIONS
+)
 
 # --- Configuration de la Page ---
 st.set_page_config(
@@ -11,6 +19,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Démarrage à chaud : instantané des données et imports lourds en arrière-plan
+warm_start()
+begin_page("Dashboard")
+
 # --- CSS Personnalisé ---
 st.markdown("""
 <style>
@@ -45,8 +57,12 @@ with st.sidebar.expander("ℹ️ Comprendre les métriques"):
         st.markdown(f"**{indicator}** : {explanation}")
 
 # --- Chargement des Données ---
-df = generate_rabat_data()
-df_scored = calculate_vulnerability_score(df, w_social, w_infra, w_env, w_sante, w_educ, w_secu)
+df = load_dataset()
+model = get_scoring_model()
+weights = (w_social, w_infra, w_env, w_sante, w_educ, w_secu)
+df_scored = model.attach_scores(df, score_for_session(model, weights))
+# Classement unique des scores, partagé par les KPIs, le top 5 et les graphiques
+ranking = ranking_for_session(model, weights)
 
 # --- En-tête ---
 st.title("📊 Tableau de Bord Analytique")
@@ -58,7 +74,7 @@ col1, col2, col3 = st.columns(3)
 
 score_moyen = df_scored["Score Vulnérabilité"].mean()
 pop_totale = df_scored["Population"].sum()
-quartier_prioritaire = df_scored.loc[df_scored["Score Vulnérabilité"].idxmax(), "Nom du quartier"]
+quartier_prioritaire = df_scored["Nom du quartier"].iloc[ranking.best()]
 
 with col1:
     st.metric("Score Moyen de Vulnérabilité", f"{score_moyen:.1f}/100")
@@ -69,11 +85,82 @@ with col2:
 with col3:
     st.metric("Quartier le Plus Vulnérable", quartier_prioritaire)
 
+# --- Robustesse du Classement ---
+WEIGHT_LABELS = ["Social", "Infrastructure", "Environnement", "Santé", "Éducation", "Sécurité"]
+
+@st.fragment
+def rank_stability_section():
+    """Section recalculée seule (fragment) : changer d'échantillonnage ne relance pas la page."""
+    st.markdown("---")
+    st.subheader(" Robustesse du Classement aux Poids")
+    st.caption("Le simplexe des poids est balayé pour mesurer dans quelle mesure le classement dépend des curseurs.")
+
+    method = st.radio(
+        "Échantillonnage des poids",
+        ["Grille régulière", "Suite de Halton"],
+        horizontal=True,
+        key="sensitivity_method"
+    )
+    if method == "Grille régulière":
+        sensitivity = get_weight_sensitivity("grid", 12)
+    else:
+        sensitivity = get_weight_sensitivity("halton", 20000)
+
+    current, margin, challenger = stability_margin(sensitivity, model, weights)
+    if margin is None:
+        st.success(f"**{model.names[current]}** reste le quartier le plus vulnérable quels que soient les poids.")
+    else:
+        st.info(
+            f"Il suffit de déplacer **{margin:.0%}** du poids total pour que "
+            f"**{model.names[challenger]}** remplace **{model.names[current]}** en tête du classement."
+        )
+
+    col_sens1, col_sens2 = st.columns(2)
+    with col_sens1:
+        st.markdown("##### Part des Poids où chaque Quartier est en Tête")
+        regions = top_regions(sensitivity, model.names)
+        with timed("figure:regions"):
+            fig_regions = px.bar(
+                regions,
+                x="Quartier",
+                y="Part du simplexe",
+                color="Part du simplexe",
+                color_continuous_scale="RdYlGn_r",
+                height=350
+            )
+            fig_regions.update_layout(showlegend=False, xaxis_title="", yaxis_tickformat=".0%")
+            st.plotly_chart(fig_regions, use_container_width=True)
+
+    with col_sens2:
+        st.markdown("##### Indices de Sensibilité du Premier Ordre")
+        if sensitivity["first_order"] is not None:
+            first_order = pd.DataFrame(sensitivity["first_order"], index=model.names, columns=WEIGHT_LABELS)
+            first_order.loc["Score moyen (ville)"] = sensitivity["first_order_mean"]
+        else:
+            first_order = pd.DataFrame([sensitivity["first_order_mean"]], index=["Score moyen (ville)"], columns=WEIGHT_LABELS)
+        with timed("figure:sobol"):
+            fig_sobol = px.imshow(first_order, text_auto=".2f", color_continuous_scale="Blues", aspect="auto", height=350)
+            st.plotly_chart(fig_sobol, use_container_width=True)
+
+    if sensitivity["rank_probabilities"] is not None:
+        with st.expander("Distribution des rangs par quartier"):
+            ranks = pd.DataFrame(
+                sensitivity["rank_probabilities"],
+                index=model.names,
+                columns=[f"Rang {r + 1}" for r in range(len(model))]
+            )
+            ranks.insert(0, "Rang moyen", sensitivity["mean_rank"] + 1)
+            st.dataframe(ranks.style.format("{:.0%}").format({"Rang moyen": "{:.2f}"}), use_container_width=True)
+        with st.expander("Régions des poids par quartier en tête"):
+            st.dataframe(regions.style.format({"Part du simplexe": "{:.1%}"}, precision=1), use_container_width=True)
+
+rank_stability_section()
+
 # --- Tableau des Quartiers Prioritaires ---
 st.markdown("---")
 st.subheader(" Quartiers Prioritaires (Top 5)")
 
-top_5 = df_scored.nlargest(5, "Score Vulnérabilité")[["Nom du quartier", "Score Vulnérabilité", "Population", "Taux de chômage (%)", "Indice de Vétusté (0-10)"]]
+top_5 = df_scored.iloc[ranking.top(5)][["Nom du quartier", "Score Vulnérabilité", "Population", "Taux de chômage (%)", "Indice de Vétusté (0-10)"]]
 top_5 = top_5.reset_index(drop=True)
 top_5.index = top_5.index + 1
 
@@ -83,72 +170,130 @@ st.dataframe(top_5, use_container_width=True)
 st.markdown("---")
 st.subheader(" Tableau de Bord Analytique")
 
+# Données des graphiques réduites à quelques dizaines de catégories (quartiers,
+# communes ou provinces selon la taille du jeu), en cache par jeu de poids
+charts = dashboard_chart_data(weights)
+label = charts["label"]
+level_name = {"quartier": "Quartier", "commune": "Commune", "province": "Province"}[charts["level"]]
+if charts["level"] != "quartier":
+    st.caption(
+        f"{charts['units']:,} unités : moyennes pondérées par la population, agrégées par {charts['level']}."
+    )
+
 # 1. Scores de Vulnérabilité par Quartier
 col_viz1, col_viz2 = st.columns(2)
 
 with col_viz1:
-    st.markdown("##### Scores de Vulnérabilité par Quartier")
-    df_sorted = df_scored.sort_values("Score Vulnérabilité", ascending=False)
-    fig_bar = px.bar(
-        df_sorted,
-        x="Nom du quartier",
-        y="Score Vulnérabilité",
-        color="Score Vulnérabilité",
-        color_continuous_scale="RdYlGn_r",
-        text="Score Vulnérabilité",
-        height=400
-    )
-    fig_bar.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-    fig_bar.update_layout(showlegend=False, xaxis_title="", yaxis_title="Score de Vulnérabilité")
-    st.plotly_chart(fig_bar, use_container_width=True)
+    st.markdown(f"##### Scores de Vulnérabilité par {level_name}")
+    with timed("figure:bar"):
+        fig_bar = px.bar(
+            charts["scores"],
+            x=label,
+            y="Score Vulnérabilité",
+            color="Score Vulnérabilité",
+            color_continuous_scale="RdYlGn_r",
+            text="Score Vulnérabilité",
+            height=400
+        )
+        fig_bar.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+        fig_bar.update_layout(showlegend=False, xaxis_title="", yaxis_title="Score de Vulnérabilité")
+        st.plotly_chart(fig_bar, use_container_width=True)
+    
+    if charts["histogram"] is not None:
+        with timed("figure:hist"):
+            fig_hist = px.bar(
+                charts["histogram"],
+                x="Score (classe)",
+                y="Nombre d'unités",
+                height=250
+            )
+            fig_hist.update_layout(bargap=0, xaxis_title="Score de Vulnérabilité", yaxis_title="Unités")
+            st.plotly_chart(fig_hist, use_container_width=True)
 
 with col_viz2:
     st.markdown("##### Distribution de la Population")
-    fig_pie = px.pie(
-        df_scored,
-        values="Population",
-        names="Nom du quartier",
-        hole=0.4,
-        height=400
-    )
-    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-    st.plotly_chart(fig_pie, use_container_width=True)
+    with timed("figure:pie"):
+        fig_pie = px.pie(
+            charts["population"],
+            values="Population",
+            names=label,
+            hole=0.4,
+            height=400
+        )
+        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+        st.plotly_chart(fig_pie, use_container_width=True)
 
 # 2. Comparaison Multi-Indicateurs
 st.markdown("##### Comparaison Multi-Indicateurs")
-df_indicators = df_scored[["Nom du quartier", "Accessibilité Transports (0-10)", "Accessibilité Santé (0-10)", "Accessibilité Education (0-10)", "Sécurité (0-10)"]]
-df_melted = df_indicators.melt(id_vars="Nom du quartier", var_name="Indicateur", value_name="Score")
-
-fig_grouped = px.bar(
-    df_melted,
-    x="Nom du quartier",
-    y="Score",
-    color="Indicateur",
-    barmode="group",
-    height=400
-)
-fig_grouped.update_layout(xaxis_title="", yaxis_title="Score (0-10)")
-st.plotly_chart(fig_grouped, use_container_width=True)
+with timed("figure:grouped"):
+    fig_grouped = px.bar(
+        charts["indicators"],
+        x=label,
+        y="Score",
+        color="Indicateur",
+        barmode="group",
+        height=400
+    )
+    fig_grouped.update_layout(xaxis_title="", yaxis_title="Score (0-10)")
+    st.plotly_chart(fig_grouped, use_container_width=True)
 
 # 3. Matrice de Corrélation
 st.markdown("##### Matrice de Corrélation des Indicateurs")
-corr_cols = ["Taux de chômage (%)", "Indice de Vétusté (0-10)", "Accessibilité Transports (0-10)", 
-             "Accessibilité Santé (0-10)", "Accessibilité Education (0-10)", "Sécurité (0-10)", "Score Vulnérabilité"]
-corr_matrix = df_scored[corr_cols].corr()
-
-fig_heatmap = px.imshow(
-    corr_matrix,
-    text_auto=".2f",
-    color_continuous_scale="RdBu_r",
-    aspect="auto",
-    height=500
-)
-fig_heatmap.update_layout(
-    xaxis_title="",
-    yaxis_title="",
-    xaxis={'side': 'bottom'}
-)
-st.plotly_chart(fig_heatmap, use_container_width=True)
+with timed("figure:heatmap"):
+    fig_heatmap = px.imshow(
+        indicator_correlation(weights),
+        text_auto=".2f",
+        color_continuous_scale="RdBu_r",
+        aspect="auto",
+        height=500
+    )
+    fig_heatmap.update_layout(
+        xaxis_title="",
+        yaxis_title="",
+        xaxis={'side': 'bottom'}
+    )
+    st.plotly_chart(fig_heatmap, use_container_width=True)
+
+# --- Évolution Temporelle ---
+st.markdown("---")
+st.subheader(" Évolution Temporelle des Scores")
+
+panel = get_indicator_panel()
+history_df = panel.to_frame(weights)
+# Au-delà de 10 quartiers, seuls les plus vulnérables à la dernière période sont tracés
+if len(panel.names) > 10:
+    latest_top = panel.names[panel.scores(weights)[-1].argsort()[-10:]]
+    history_df = history_df[history_df["Nom du quartier"].isin(latest_top)]
+col_ts1, col_ts2 = st.columns([2, 1])
+
+with col_ts1:
+    with timed("figure:history"):
+        fig_history = px.line(
+            history_df,
+            x="Période",
+            y="Score Vulnérabilité",
+            color="Nom du quartier",
+            render_mode=render_mode(len(history_df)),
+            height=400
+        )
+        fig_history.update_layout(xaxis_title="", yaxis_title="Score de Vulnérabilité")
+        st.plotly_chart(fig_history, use_container_width=True)
+
+with col_ts2:
+    st.markdown(f"##### Tendances ({panel.window} dernières périodes)")
+    trends_df = pd.DataFrame({
+        "Quartier": panel.names,
+        "Score": panel.scores(weights)[-1],
+        "Δ 1 mois": panel.score_delta(weights, 1),
+        "Δ 12 mois": panel.score_delta(weights, 12),
+        "Tendance / mois": panel.score_trend(weights),
+    }).sort_values("Tendance / mois", ascending=False)
+    st.dataframe(
+        trends_df.style.format({"Score": "{:.1f}", "Δ 1 mois": "{:+.1f}", "Δ 12 mois": "{:+.1f}", "Tendance / mois": "{:+.2f}"}),
+        hide_index=True,
+        use_container_width=True
+    )
+    st.caption(f"Dernière période : {panel.periods[-1]}")
 
 # --- Fiche Détaillée par Quartier ---
 st.markdown("---")
@@ -195,27 +340,28 @@ if selected_quartier:
             q_data["Sécurité (0-10)"]
         ]
         
-        fig_radar = go.Figure()
-        fig_radar.add_trace(go.Scatterpolar(
-            r=values,
-            theta=categories,
-            fill='toself',
-            name=selected_quartier,
-            line_color='#3498db',
-            fillcolor='rgba(52, 152, 219, 0.3)'
-        ))
+        with timed("figure:radar"):
+            fig_radar = go.Figure()
+            fig_radar.add_trace(go.Scatterpolar(
+                r=values,
+                theta=categories,
+                fill='toself',
+                name=selected_quartier,
+                line_color='#3498db',
+                fillcolor='rgba(52, 152, 219, 0.3)'
+            ))
         
-        fig_radar.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 10]
-                )
-            ),
-            showlegend=False,
-            height=350
-        )
-        st.plotly_chart(fig_radar, use_container_width=True)
+            fig_radar.update_layout(
+                polar=dict(
+                    radialaxis=dict(
+                        visible=True,
+                        range=[0, 10]
+                    )
+                ),
+                showlegend=False,
+                height=350
+            )
+            st.plotly_chart(fig_radar, use_container_width=True)
         
         # Légende du radar
         st.caption("ℹ️ **Transport** : Proximité et qualité des transports en commun")
@@ -224,27 +370,71 @@ if selected_quartier:
         st.caption("ℹ️ **Sécurité** : Niveau de sécurité du quartier")
 
 # --- Export de Données ---
+@st.fragment
+def export_section():
+    """Export préparé en arrière-plan et écrit par blocs : la page reste utilisable pendant la préparation."""
+    col_exp1, col_exp2 = st.columns(2)
+    
+    with col_exp1:
+        st.markdown("##### Télécharger les données complètes")
+        fmt = st.selectbox(
+            "Format",
+            list(EXPORT_FORMATS),
+            format_func=lambda f: EXPORT_FORMATS[f][0],
+            key="export_format"
+        )
+        columns = st.multiselect(
+            "Colonnes (toutes si vide)",
+            [c for c in df_scored.columns if c != "Score Vulnérabilité"],
+            key="export_columns"
+        )
+        # Seuls les profils courants sont préparés d'avance (precompute_exports) ;
+        # les autres exports ne sont lancés qu'à la demande, sans bloquer la page
+        manager = get_export_manager()
+        key = export_key(weights, fmt, columns)
+        status = manager.status(key)
+        export_file = None
+        if status == "ready":
+            try:
+                export_file = open(manager.path(key), "rb")
+            except (KeyError, FileNotFoundError):
+                # Export supprimé entre-temps par une autre session
+                status = None
+        
+        if export_file is not None:
+            with export_file as f:
+                st.download_button(
+                    label=f"📊 Télécharger ({EXPORT_FORMATS[fmt][0]})",
+                    data=f,
+                    file_name=f"urbanlife_rabat_{pd.Timestamp.now().strftime('%Y%m%d')}.{fmt}",
+                    mime=EXPORT_FORMATS[fmt][1],
+                )
+        elif status == "pending":
+            st.info("⏳ Export en préparation en arrière-plan...")
+            st.button("🔄 Actualiser", key="export_refresh")
+        else:
+            if status == "error":
+                st.error(f"Échec de l'export : {manager.error(key)}")
+            if st.button("Préparer l'export", key="export_prepare"):
+                request_export(weights, fmt, columns)
+                st.rerun(scope="fragment")
+    
+    with col_exp2:
+        st.markdown("##### Informations sur l'export")
+        st.write(f"**Nombre de quartiers :** {len(df_scored):,}")
+        st.write(f"**Colonnes incluses :** {len(columns) + 1 if columns else len(df_scored.columns)}")
+        if fmt == "geojson":
+            st.caption("Une entité par commune : géométrie du découpage administratif et moyennes pondérées par la population.")
+        else:
+            st.caption("Le fichier contient les données du tableau de bord avec le score de vulnérabilité, écrites par blocs et compressées.")
+
 st.markdown("---")
 st.subheader("📥 Export des Données")
-col_exp1, col_exp2 = st.columns(2)
-
-with col_exp1:
-    st.markdown("##### Télécharger les données complètes")
-    csv = df_scored.to_csv(index=False).encode('utf-8')
-    st.download_button(
-        label="📊 Télécharger CSV",
-        data=csv,
-        file_name=f"urbanlife_rabat_{pd.Timestamp.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv",
-    )
-
-with col_exp2:
-    st.markdown("##### Informations sur l'export")
-    st.write(f"**Nombre de quartiers :** {len(df_scored)}")
-    st.write(f"**Colonnes incluses :** {len(df_scored.columns)}")
-    st.caption("Le fichier CSV contient toutes les données affichées dans le tableau de bord.")
+precompute_exports()
+export_section()
 
 # --- Footer ---
 st.markdown("---")
 st.markdown("© 2025 Center of Urban Systems (CUS) - UM6P | Developed for UrbanLifeAI")
 
+end_page()
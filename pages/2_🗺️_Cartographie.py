@@ -1,7 +1,10 @@
 import streamlit as st
-import folium
-from streamlit_folium import st_folium
-from utils import generate_rabat_data, calculate_vulnerability_score, load_geojson, get_color_for_score
+from utils import (
+    load_dataset, get_scoring_model, score_for_session, ranking_for_session, load_geojson_for_zoom,
+    geometry_level_for_zoom, get_session_base_map, get_color_for_indicator, commune_aggregates, warm_start,
+    begin_page, end_page
+)
+from instrumentation import timed
 
 # --- Configuration de la Page ---
 st.set_page_config(
@@ -10,6 +13,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Démarrage à chaud : instantané des données et imports lourds en arrière-plan
+warm_start()
+begin_page("Cartographie")
+
 # --- Sidebar : Logos et Paramètres ---
 col_logo1, col_logo2 = st.sidebar.columns(2)
 with col_logo1:
@@ -31,12 +38,20 @@ st.sidebar.markdown("""
 - 🔴 **Rouge** : Priorité Haute (Score > 60)
 - 🟠 **Orange** : Priorité Moyenne (Score 40-60)
 - 🟢 **Vert** : Priorité Basse (Score < 40)
+- ⚪ **Gris** : Commune sans données
 """)
 
 # --- Chargement des Données ---
-df = generate_rabat_data()
-df_scored = calculate_vulnerability_score(df, w_social, w_infra, w_env, w_sante, w_educ, w_secu)
-geojson_data = load_geojson()
+model = get_scoring_model()
+weights = (w_social, w_infra, w_env, w_sante, w_educ, w_secu)
+scores = score_for_session(model, weights)
+ranking = ranking_for_session(model, weights)
+
+# Vue courante de la carte (renvoyée par st_folium au rerun précédent)
+map_state = st.session_state.get("carte_rabat") or {}
+map_zoom = map_state.get("zoom") or 12
+map_center = map_state.get("center") or {"lat": 34.00, "lng": -6.85}
+geojson_data = load_geojson_for_zoom(map_zoom)
 
 # --- En-tête ---
 st.title("🗺️ Cartographie des Vulnérabilités")
@@ -57,107 +72,45 @@ with col_sel1:
 with col_sel2:
     st.info(f"**Indicateur actuel** : {indicator}")
 
+# Seules les colonnes affichées par la carte sont chargées
+map_columns = ["Nom du quartier", "Population", "lat", "lon"]
+if indicator != "Score Vulnérabilité":
+    map_columns.append(indicator)
+df_scored = model.attach_scores(load_dataset(map_columns), scores)
+
 # --- Création de la Carte ---
 if geojson_data:
-    # Créer un dictionnaire de mapping
-    score_dict = df_scored.set_index('Nom du quartier')[indicator].to_dict()
+    # Folium n'est importé qu'ici (import lent) : l'en-tête et les sélecteurs s'affichent avant
+    from streamlit_folium import st_folium
+    from maps import build_data_layer
     
-    # Créer la carte centrée sur Rabat
-    m = folium.Map(location=[34.00, -6.85], zoom_start=12, tiles="CartoDB positron")
+    # Agrégats par commune (moyennes pondérées par la population des points joints spatialement)
+    df_communes = commune_aggregates(weights, indicator)
+    commune_values = df_communes[indicator].dropna() if df_communes is not None else {}
     
-    # Fonction de style pour coloration
-    def style_function(feature):
-        commune = feature['properties']['commune']
-        # Mapping des noms de communes du GeoJSON aux noms de quartiers
-        commune_mapping = {
-            "Agdal Riad": "Agdal",
-            "Hassan": "Hassan",
-            "El Youssoufia": "Médina",
-            "Témara": "L'Océan",
-            "Harhoura": "Souissi",
-            "Sidi Yahya Zaer": "Hay Riad",
-            "Ain El Aouda": "Yacoub El Mansour"
-        }
-        
-        quartier = commune_mapping.get(commune, commune)
-        score = score_dict.get(quartier, 0)
-        
-        # Coloration basée sur le score
-        if indicator == "Score Vulnérabilité":
-            color = get_color_for_score(score)
-        else:
-            # Pour les autres indicateurs, adapter la logique
-            if "Accessibilité" in indicator or "Sécurité" in indicator:
-                # Plus c'est élevé, mieux c'est (vert)
-                if score > 7: color = "#27ae60"
-                elif score > 4: color = "#f39c12"
-                else: color = "#e74c3c"
-            else:
-                # Plus c'est élevé, pire c'est (rouge)
-                if score > 15 or score > 7: color = "#e74c3c"
-                elif score > 10 or score > 4: color = "#f39c12"
-                else: color = "#27ae60"
-        
-        return {
-            'fillColor': color,
-            'color': 'black',
-            'weight': 2,
-            'fillOpacity': 0.6
-        }
+    # Table compacte des couleurs par commune, seule partie de la géométrie renvoyée à chaque rerun.
+    # Les communes sans données gardent la couleur neutre de la carte de base.
+    commune_colors = {
+        commune: get_color_for_indicator(indicator, value)
+        for commune, value in commune_values.items()
+    }
     
-    # Fonction de highlight au survol
-    def highlight_function(feature):
-        return {
-            'fillColor': '#ffff00',
-            'color': 'black',
-            'weight': 3,
-            'fillOpacity': 0.8
-        }
+    # Carte de base (fond + géométrie) réutilisée tant que le niveau de géométrie ne change pas
+    base_map = get_session_base_map(geojson_data, geometry_level_for_zoom(map_zoom), map_center, map_zoom)
+    with timed("build_data_layer"):
+        data_layer = build_data_layer(commune_colors, df_scored, indicator)
     
-    # Ajouter le GeoJSON à la carte
-    folium.GeoJson(
-        geojson_data,
-        style_function=style_function,
-        highlight_function=highlight_function,
-        tooltip=folium.GeoJsonTooltip(
-            fields=['commune', 'province_1'],
-            aliases=['Commune:', 'Province:'],
-            style="background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;"
-        ),
-        popup=folium.GeoJsonPopup(
-            fields=['commune', 'province_1', 'region'],
-            aliases=['Commune:', 'Province:', 'Région:'],
-            style="background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;"
+    # Afficher la carte (sérialisation Folium et envoi au navigateur)
+    with timed("st_folium"):
+        st_folium(
+            base_map,
+            feature_group_to_add=data_layer,
+            center=[map_center["lat"], map_center["lng"]],
+            zoom=map_zoom,
+            width="100%",
+            height=600,
+            key="carte_rabat"
         )
-    ).add_to(m)
-    
-    # Ajouter des marqueurs pour les quartiers avec données
-    for _, row in df_scored.iterrows():
-        score = row[indicator]
-        color = get_color_for_score(row["Score Vulnérabilité"])
-        
-        popup_html = f"""
-        <div style="font-family: Arial; width: 200px;">
-            <h4 style="margin-bottom: 10px;">{row['Nom du quartier']}</h4>
-            <p><b>{indicator}:</b> {score}</p>
-            <p><b>Population:</b> {row['Population']:,}</p>
-            <p><b>Score Vulnérabilité:</b> {row['Score Vulnérabilité']:.1f}/100</p>
-        </div>
-        """
-        
-        folium.CircleMarker(
-            location=[row["lat"], row["lon"]],
-            radius=8,
-            popup=folium.Popup(popup_html, max_width=250),
-            color=color,
-            fill=True,
-            fillColor=color,
-            fillOpacity=0.7,
-            weight=2
-        ).add_to(m)
-    
-    # Afficher la carte
-    st_folium(m, width="100%", height=600)
     
     # --- Statistiques de la Carte ---
     st.markdown("---")
@@ -175,9 +128,29 @@ if geojson_data:
         st.metric("Valeur Maximale", f"{df_scored[indicator].max():.1f}")
     
     with col_stat4:
-        quartier_max = df_scored.loc[df_scored[indicator].idxmax(), "Nom du quartier"]
+        if indicator == "Score Vulnérabilité":
+            quartier_max = df_scored["Nom du quartier"].iloc[ranking.best()]
+        else:
+            quartier_max = df_scored.loc[df_scored[indicator].idxmax(), "Nom du quartier"]
         st.metric("Quartier Max", quartier_max)
     
+    if indicator == "Score Vulnérabilité":
+        bands = ranking.band_counts()
+        st.caption(
+            f"Priorité haute : **{bands['Haute']:,}** quartiers · "
+            f"moyenne : **{bands['Moyenne']:,}** · basse : **{bands['Basse']:,}**"
+        )
+    
+    # --- Agrégats par Commune ---
+    if df_communes is not None:
+        st.markdown("---")
+        st.subheader(" Agrégats par Commune")
+        st.caption("Moyennes pondérées par la population des quartiers situés dans chaque commune.")
+        st.dataframe(
+            df_communes[df_communes["Nombre d'unités"] > 0].sort_values(indicator, ascending=False),
+            use_container_width=True
+        )
+    
     # --- Tableau Récapitulatif ---
     st.markdown("---")
     st.subheader(" Tableau Récapitulatif par Quartier")
@@ -187,7 +160,10 @@ if geojson_data:
         display_cols = ["Nom du quartier", indicator, "Population"]
     else:
         display_cols = ["Nom du quartier", indicator, "Population", "Score Vulnérabilité"]
-    df_display = df_scored[display_cols].sort_values(indicator, ascending=False)
+    if indicator == "Score Vulnérabilité":
+        df_display = df_scored[display_cols].iloc[ranking.order]
+    else:
+        df_display = df_scored[display_cols].sort_values(indicator, ascending=False)
     
     st.dataframe(df_display, use_container_width=True)
 
@@ -198,3 +174,4 @@ else:
 st.markdown("---")
 st.markdown("© 2025 Center of Urban Systems (CUS) - UM6P | Developed for UrbanLifeAI")
 
+end_page()
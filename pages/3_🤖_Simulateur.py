@@ -1,7 +1,16 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from utils import generate_rabat_data, calculate_vulnerability_score, DEFAULT_ACTIONS
+from simulation import action_cost
+from optimizer import optimize_portfolio
+from uncertainty import MAX_RANKED_UNITS
+from instrumentation import timed
+from utils import (
+    load_dataset, get_scoring_model, score_for_session, simulate_for_session, monte_carlo_for_session,
+    warm_start, begin_page, end_page,
+    weights_key, action_set_key, DEFAULT_ACTIONS
+)
 
 # --- Configuration de la Page ---
 st.set_page_config(
@@ -10,6 +19,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Démarrage à chaud : instantané des données et imports lourds en arrière-plan
+warm_start()
+begin_page("Simulateur")
+
 # --- Sidebar : Logos et Paramètres ---
 col_logo1, col_logo2 = st.sidebar.columns(2)
 with col_logo1:
@@ -26,8 +39,10 @@ w_educ = st.sidebar.slider("Poids Éducation", 0.0, 5.0, 2.0)
 w_secu = st.sidebar.slider("Poids Sécurité", 0.0, 5.0, 1.5)
 
 # --- Chargement des Données ---
-df = generate_rabat_data()
-df_scored = calculate_vulnerability_score(df, w_social, w_infra, w_env, w_sante, w_educ, w_secu)
+df = load_dataset()
+model = get_scoring_model()
+weights = (w_social, w_infra, w_env, w_sante, w_educ, w_secu)
+df_scored = model.attach_scores(df, score_for_session(model, weights))
 
 # --- En-tête ---
 st.title("🤖 Simulateur d'Impact (IA Prédictive)")
@@ -69,108 +84,64 @@ with st.form("add_action_form"):
         st.session_state.actions.append(new_action)
         st.success(f"✅ Intervention '{new_name}' ajoutée avec succès!")
 
-# --- Sélection de l'Action ---
+# --- Sélection des Actions ---
 st.markdown("---")
-st.subheader(" Sélection de l'Intervention à Simuler")
+st.subheader(" Sélection des Interventions à Simuler")
+st.caption("Combinez plusieurs interventions pour évaluer un programme complet.")
 
-action_names = [a["name"] for a in st.session_state.actions]
-selected_action_name = st.selectbox("Choisir une action à simuler :", action_names)
+action_names = [a["name"] for a in st.session_state.actions if a["name"] != "Aucune action"]
+selected_names = st.multiselect("Choisir les actions à simuler :", action_names)
+selected_actions = [a for a in st.session_state.actions if a["name"] in selected_names]
 
 # --- Simulation ---
-selected_action = next((a for a in st.session_state.actions if a["name"] == selected_action_name), None)
+# Libellés des changements détaillés par indicateur
+CHANGE_LABELS = {
+    "Taux de chômage (%)": "Chômage",
+    "Indice de Vétusté (0-10)": "Vétusté",
+    "Accessibilité Transports (0-10)": "Transport",
+    "Surface Espaces Verts (m²)": "Espaces Verts",
+    "Accessibilité Santé (0-10)": "Santé",
+    "Accessibilité Education (0-10)": "Éducation",
+    "Sécurité (0-10)": "Sécurité",
+}
 
-if selected_action and selected_action["name"] != "Aucune action":
-    targets = selected_action["target"]
-    if not isinstance(targets, list):
-        targets = [targets]
+if selected_actions:
+    # Toutes les actions sélectionnées sont appliquées ensemble, en un seul passage vectorisé
+    result = simulate_for_session(model, st.session_state.actions, selected_names, weights)
     
     st.markdown("---")
     st.subheader(" Résultats de la Simulation")
     
-    for target in targets:
-        st.markdown(f"#### 🎯 Impact sur : {target}")
-        
-        q_data = df_scored[df_scored["Nom du quartier"] == target].iloc[0]
-        old_score = q_data["Score Vulnérabilité"]
-        
-        # Clone values to modify
-        vals = {
-            "vetuste": q_data["Indice de Vétusté (0-10)"],
-            "transport": q_data["Accessibilité Transports (0-10)"],
-            "verts": q_data["Surface Espaces Verts (m²)"],
-            "sante": q_data["Accessibilité Santé (0-10)"],
-            "educ": q_data["Accessibilité Education (0-10)"],
-            "secu": q_data["Sécurité (0-10)"],
-            "chomage": q_data["Taux de chômage (%)"]
-        }
-        
-        # Apply impact
-        act_type = selected_action["type"]
-        act_val = selected_action["val"]
-        
-        if act_type == "transport":
-            if isinstance(act_val, dict):
-                vals["transport"] = min(10, vals["transport"] + act_val.get(target, 0))
-            else:
-                vals["transport"] = min(10, vals["transport"] + act_val)
-        elif act_type == "vetuste":
-            vals["vetuste"] = max(0, vals["vetuste"] + act_val)
-        elif act_type == "verts":
-            vals["verts"] += act_val
-        elif act_type == "chomage":
-            vals["chomage"] = max(0, vals["chomage"] + act_val)
-        elif act_type in ["sante", "educ", "secu"]:
-            vals[act_type] = min(10, vals[act_type] + act_val)
-        
-        # Recalculate Score
-        norm_chomage = vals["chomage"] / 25.0
-        norm_vetuste = vals["vetuste"] / 10.0
-        norm_transport = 1 - (vals["transport"] / 10.0)
-        norm_verts = 1 - (vals["verts"] / 80000.0)
-        norm_sante = 1 - (vals["sante"] / 10.0)
-        norm_educ = 1 - (vals["educ"] / 10.0)
-        norm_secu = 1 - (vals["secu"] / 10.0)
-        
-        total_weight = w_social + w_infra + w_env + w_sante + w_educ + w_secu
-        if total_weight == 0: total_weight = 1
-        
-        new_score_brut = (
-            w_social * norm_chomage +
-            w_infra * (norm_vetuste + norm_transport) / 2 +
-            w_env * norm_verts +
-            w_sante * norm_sante +
-            w_educ * norm_educ +
-            w_secu * norm_secu
-        )
-        
-        new_score = (new_score_brut / total_weight) * 100
+    if result["unknown_targets"]:
+        st.warning(f"Quartiers cibles introuvables : {', '.join(sorted(set(result['unknown_targets'])))}")
+    
+    for u, unit in enumerate(result["units"]):
+        target = model.names[unit]
+        old_score = result["score_before"][u]
+        new_score = result["score_after"][u]
         delta = new_score - old_score
         
-        # Visualisation Avant/Après
+        st.markdown(f"#### 🎯 Impact sur : {target}")
+        
         col_res1, col_res2 = st.columns([1, 2])
         
         with col_res1:
             st.metric("Score Avant", f"{old_score:.1f}/100")
             st.metric("Score Après", f"{new_score:.1f}/100", f"{delta:.1f}", delta_color="inverse")
-            st.write(f"**Type d'intervention :** {act_type.capitalize()}")
-            st.write(f"**Valeur de l'impact :** {act_val}")
             
             # Afficher les changements détaillés
             st.markdown("##### Changements Détaillés")
-            if act_type == "chomage":
-                st.write(f"Chômage : {q_data['Taux de chômage (%)']}% → {vals['chomage']:.1f}%")
-            elif act_type == "vetuste":
-                st.write(f"Vétusté : {q_data['Indice de Vétusté (0-10)']} → {vals['vetuste']}")
-            elif act_type == "transport":
-                st.write(f"Transport : {q_data['Accessibilité Transports (0-10)']} → {vals['transport']}")
-            elif act_type == "verts":
-                st.write(f"Espaces Verts : {q_data['Surface Espaces Verts (m²)']:,} m² → {vals['verts']:,} m²")
-            elif act_type == "sante":
-                st.write(f"Santé : {q_data['Accessibilité Santé (0-10)']} → {vals['sante']}")
-            elif act_type == "educ":
-                st.write(f"Éducation : {q_data['Accessibilité Education (0-10)']} → {vals['educ']}")
-            elif act_type == "secu":
-                st.write(f"Sécurité : {q_data['Sécurité (0-10)']} → {vals['secu']}")
+            for j, column in enumerate(model.columns):
+                before, after = result["before"][u, j], result["after"][u, j]
+                if before == after:
+                    continue
+                label = CHANGE_LABELS[column]
+                if column == "Taux de chômage (%)":
+                    st.write(f"{label} : {before:.1f}% → {after:.1f}%")
+                elif column == "Surface Espaces Verts (m²)":
+                    st.write(f"{label} : {before:,.0f} m² → {after:,.0f} m²")
+                else:
+                    st.write(f"{label} : {before:g} → {after:g}")
             
         with col_res2:
             # Graphique de comparaison avant/après
@@ -179,24 +150,66 @@ if selected_action and selected_action["name"] != "Aucune action":
                 'Score de Vulnérabilité': [old_score, new_score]
             })
             
-            fig_comparison = px.bar(
-                comparison_df,
-                x='État',
-                y='Score de Vulnérabilité',
-                color='Score de Vulnérabilité',
-                color_continuous_scale='RdYlGn_r',
-                text='Score de Vulnérabilité',
-                height=300,
-                title=f"Impact de l'intervention sur {target}"
-            )
-            fig_comparison.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-            fig_comparison.update_layout(showlegend=False)
-            st.plotly_chart(fig_comparison, use_container_width=True)
+            with timed("figure:comparison"):
+                fig_comparison = px.bar(
+                    comparison_df,
+                    x='État',
+                    y='Score de Vulnérabilité',
+                    color='Score de Vulnérabilité',
+                    color_continuous_scale='RdYlGn_r',
+                    text='Score de Vulnérabilité',
+                    height=300,
+                    title=f"Impact du programme sur {target}"
+                )
+                fig_comparison.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+                fig_comparison.update_layout(showlegend=False)
+                st.plotly_chart(fig_comparison, use_container_width=True)
         
         st.markdown("---")
 
-elif selected_action and selected_action["name"] == "Aucune action":
-    st.info("⏳ En attente de simulation... Sélectionnez une action pour voir les résultats.")
+    # --- Analyse d'Incertitude (Monte Carlo) ---
+    st.subheader(" Analyse d'Incertitude (Monte Carlo)")
+    st.caption("Les effets des actions et les mesures des indicateurs sont incertains : chaque tirage les perturbe aléatoirement pour obtenir des intervalles de confiance et des probabilités de rang.")
+
+    if st.checkbox("Activer le mode Monte Carlo"):
+        col_mc1, col_mc2 = st.columns(2)
+        with col_mc1:
+            n_draws = st.select_slider("Nombre de tirages", options=[10000, 25000, 50000, 100000], value=10000)
+        with col_mc2:
+            impact_sd = st.slider("Incertitude sur l'effet des actions (%)", 0, 100, 30) / 100
+
+        mc = monte_carlo_for_session(
+            model, st.session_state.actions, selected_names, weights, n_draws, impact_sd
+        )
+        # Au-delà de MAX_RANKED_UNITS, seuls les quartiers touchés sont classés entre eux
+        rank_label = "P(le plus vulnérable)" if mc["all_units"] else "P(le plus vulnérable parmi les touchés)"
+        mc_df = pd.DataFrame({
+            "Quartier": model.names[mc["units"]],
+            "Score Avant (moyen)": mc["score_before"],
+            "Score Après (moyen)": mc["score_after"],
+            "IC 90% Bas": mc["after_low"],
+            "IC 90% Haut": mc["after_high"],
+            "Variation Moyenne": mc["delta_mean"],
+            "P(amélioration)": mc["prob_improved"],
+            rank_label: mc["rank_probabilities"][:, 0],
+        })
+        st.dataframe(
+            mc_df.style.format({
+                "Score Avant (moyen)": "{:.1f}", "Score Après (moyen)": "{:.1f}",
+                "IC 90% Bas": "{:.1f}", "IC 90% Haut": "{:.1f}", "Variation Moyenne": "{:+.2f}",
+                "P(amélioration)": "{:.0%}", rank_label: "{:.0%}",
+            }),
+            use_container_width=True
+        )
+        st.caption(f"{mc['draws']:,} tirages en {mc['seconds'] * 1000:.0f} ms")
+        if not mc["all_units"]:
+            st.caption(
+                f"Plus de {MAX_RANKED_UNITS} quartiers : les probabilités de rang ne portent que "
+                "sur les quartiers touchés par les actions sélectionnées, classés entre eux."
+            )
+
+else:
+    st.info("⏳ En attente de simulation... Sélectionnez une ou plusieurs actions pour voir les résultats.")
 
 # --- Tableau Récapitulatif des Actions ---
 st.markdown("---")
@@ -218,19 +231,12 @@ st.dataframe(actions_df, use_container_width=True)
 st.markdown("---")
 st.subheader(" Estimation de Coût et ROI Social")
 
-if selected_action and selected_action["name"] != "Aucune action":
-    # Coûts fictifs basés sur le type d'intervention
-    cost_estimates = {
-        "vetuste": 5000000,  # 5M MAD
-        "transport": 10000000,  # 10M MAD
-        "verts": 2000000,  # 2M MAD
-        "sante": 15000000,  # 15M MAD
-        "educ": 8000000,  # 8M MAD
-        "secu": 3000000,  # 3M MAD
-        "chomage": 4000000  # 4M MAD (formation)
-    }
+if selected_actions and len(result["units"]):
+    estimated_cost = sum(action_cost(a) for a in selected_actions)
     
-    estimated_cost = cost_estimates.get(selected_action["type"], 0)
+    # Population des quartiers touchés et variation de score pondérée par la population
+    populations = model.population[result["units"]]
+    delta = np.average(result["score_after"] - result["score_before"], weights=populations)
     
     col_cost1, col_cost2, col_cost3 = st.columns(3)
     
@@ -247,13 +253,58 @@ if selected_action and selected_action["name"] != "Aucune action":
     
     with col_cost3:
         # Population impactée
-        if isinstance(targets, list):
-            pop_impactee = sum([df_scored[df_scored["Nom du quartier"] == t]["Population"].values[0] for t in targets])
-        else:
-            pop_impactee = df_scored[df_scored["Nom du quartier"] == targets]["Population"].values[0]
+        pop_impactee = int(populations.sum())
         st.metric("Population Impactée", f"{pop_impactee:,}")
 
+# --- Optimisation sous Budget ---
+st.markdown("---")
+st.subheader(" Optimisation du Portefeuille sous Budget")
+st.caption("Choisit automatiquement la combinaison d'interventions qui réduit le plus la vulnérabilité moyenne (pondérée par la population) sans dépasser le budget.")
+
+col_budget1, col_budget2 = st.columns([2, 1])
+with col_budget1:
+    budget = st.number_input("Budget disponible (MAD)", min_value=0, value=20000000, step=1000000)
+with col_budget2:
+    st.write("")
+    optimize_clicked = st.button("Optimiser le portefeuille")
+
+# Paramètres pour lesquels le portefeuille optimisé a été calculé
+optimization_context = (model.version, weights_key(weights), budget, action_set_key(st.session_state.actions))
+
+if optimize_clicked:
+    with timed("optimize_portfolio"):
+        best = optimize_portfolio(model, st.session_state.actions, budget, weights)
+    st.session_state.optimized_portfolio = best
+    st.session_state.optimized_context = optimization_context
+
+if "optimized_portfolio" in st.session_state and st.session_state.get("optimized_context") != optimization_context:
+    # Poids, budget ou actions modifiés : la recommandation n'est plus valable
+    del st.session_state.optimized_portfolio
+    st.info("Les paramètres ont changé depuis la dernière optimisation : relancez-la pour une recommandation à jour.")
+
+if "optimized_portfolio" in st.session_state:
+    best = st.session_state.optimized_portfolio
+    col_opt1, col_opt2, col_opt3 = st.columns(3)
+    with col_opt1:
+        st.metric("Coût du Portefeuille", f"{best['cost']:,.0f} MAD")
+    with col_opt2:
+        st.metric(
+            "Vulnérabilité Moyenne",
+            f"{best['mean_after']:.2f}/100",
+            f"{best['mean_after'] - best['mean_before']:.2f}",
+            delta_color="inverse"
+        )
+    with col_opt3:
+        st.metric("Portefeuilles Évalués", f"{best['evaluated']:,}")
+
+    if best["actions"]:
+        st.success("Interventions recommandées : " + ", ".join(best["actions"]))
+    else:
+        st.warning("Aucune intervention ne tient dans ce budget.")
+    st.caption(f"Méthode {best['method']} — {best['seconds'] * 1000:.0f} ms")
+
 # --- Footer ---
 st.markdown("---")
 st.markdown("© 2025 Center of Urban Systems (CUS) - UM6P | Developed for UrbanLifeAI")
 
+end_page()
@@ -0,0 +1,136 @@
+"""
+Index de classement des scores de vulnérabilité.
+
+Les scores sont classés une seule fois par jeu de poids ; toutes les vues des
+pages (top-k, rang d'un quartier, percentile, niveaux de priorité) lisent le même
+index au lieu de trier le DataFrame à chaque widget. Tant que le classement
+complet n'a pas été demandé, le top-k se contente d'un argpartition en O(n).
+"""
+import numpy as np
+
+# Seuils des niveaux de priorité (score strictement supérieur)
+HIGH_PRIORITY = 60
+MEDIUM_PRIORITY = 40
+
+PRIORITY_BANDS = ("Haute", "Moyenne", "Basse")
+
+
+def top_k(scores, k):
+    """
+    Indices des `k` meilleurs scores, du plus élevé au plus faible (à score égal,
+    ordre des unités), sans trier l'ensemble des scores.
+    """
+    scores = np.asarray(scores)
+    k = min(int(k), len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        # Toutes les unités à égalité avec le k-ième score restent candidates,
+        # pour que le départage par ordre des unités ne dépende pas d'argpartition
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        top = np.flatnonzero(scores >= kth)
+    else:
+        top = np.arange(len(scores))
+    return top[np.lexsort((top, -scores[top]))][:k]
+
+
+def priority_band(scores):
+    """Niveau de priorité de chaque score : 0 (Haute, > 60), 1 (Moyenne, > 40), 2 (Basse)."""
+    scores = np.asarray(scores)
+    return np.where(scores > HIGH_PRIORITY, 0, np.where(scores > MEDIUM_PRIORITY, 1, 2)).astype(np.int8)
+
+
+class RankingIndex:
+    """
+    Classement des unités par score décroissant (à score égal, ordre des unités).
+    `index` ({nom: unité}, par exemple ScoringModel.index) permet d'interroger le
+    rang et le percentile par nom de quartier.
+    """
+
+    def __init__(self, scores, index=None):
+        self.scores = np.asarray(scores)
+        self.index = index
+        self._order = None
+        self._ranks = None
+        self._ascending = None
+
+    def __len__(self):
+        return len(self.scores)
+
+    @property
+    def nbytes(self):
+        built = sum(a.nbytes for a in (self._order, self._ranks, self._ascending) if a is not None)
+        return self.scores.nbytes + built
+
+    @property
+    def order(self):
+        """Unités (n,) classées par score décroissant, triées une seule fois."""
+        if self._order is None:
+            order = np.lexsort((np.arange(len(self.scores)), -self.scores))
+            order.flags.writeable = False
+            self._order = order
+        return self._order
+
+    @property
+    def ranks(self):
+        """Rang (n,) de chaque unité, 1 pour le score le plus élevé."""
+        if self._ranks is None:
+            ranks = np.empty(len(self.scores), dtype=np.int64)
+            ranks[self.order] = np.arange(1, len(self.scores) + 1)
+            ranks.flags.writeable = False
+            self._ranks = ranks
+        return self._ranks
+
+    @property
+    def ascending(self):
+        """Scores (n,) triés par ordre croissant."""
+        if self._ascending is None:
+            ascending = self.scores[self.order[::-1]]
+            ascending.flags.writeable = False
+            self._ascending = ascending
+        return self._ascending
+
+    def _unit(self, unit):
+        if isinstance(unit, str):
+            if self.index is None or unit not in self.index:
+                raise ValueError(f"Quartier inconnu : {unit}")
+            return self.index[unit]
+        return int(unit)
+
+    # --- Requêtes ---
+    def top(self, k):
+        """Les `k` unités de score le plus élevé, dans l'ordre du classement."""
+        if self._order is not None:
+            return self._order[:k]
+        return top_k(self.scores, k)
+
+    def best(self):
+        """Unité de score le plus élevé."""
+        return int(self.top(1)[0])
+
+    def rank_of(self, unit):
+        """Rang (1 = plus vulnérable) d'une unité, par indice ou par nom."""
+        return int(self.ranks[self._unit(unit)])
+
+    def percentile(self, unit):
+        """Part (%) des unités dont le score est inférieur ou égal à celui de l'unité."""
+        score = self.scores[self._unit(unit)]
+        return 100.0 * np.searchsorted(self.ascending, score, side="right") / len(self.scores)
+
+    def band_counts(self):
+        """Nombre d'unités par niveau de priorité {Haute, Moyenne, Basse}."""
+        n = len(self.scores)
+        above_medium = n - np.searchsorted(self.ascending, MEDIUM_PRIORITY, side="right")
+        high = n - np.searchsorted(self.ascending, HIGH_PRIORITY, side="right")
+        return dict(zip(PRIORITY_BANDS, (int(high), int(above_medium - high), int(n - above_medium))))
+
+    def band_units(self, band):
+        """Unités d'un niveau de priorité ("Haute", "Moyenne" ou "Basse"), par score décroissant."""
+        if band not in PRIORITY_BANDS:
+            raise ValueError(f"Niveau de priorité inconnu : {band} (attendu : {', '.join(PRIORITY_BANDS)})")
+        counts = self.band_counts()
+        start = 0
+        for name in PRIORITY_BANDS:
+            if name == band:
+                return self.order[start:start + counts[name]]
+            start += counts[name]
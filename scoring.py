@@ -0,0 +1,278 @@
+from enum import IntEnum
+
+import numpy as np
+
+# --- Définition des Indicateurs ---
+# (colonne, valeur de référence, inversé) : un indicateur "inversé" est une
+# accessibilité/qualité, donc plus la valeur est haute, moins le quartier est vulnérable.
+INDICATORS = (
+    ("Taux de chômage (%)", 25.0, False),
+    ("Indice de Vétusté (0-10)", 10.0, False),
+    ("Accessibilité Transports (0-10)", 10.0, True),
+    ("Surface Espaces Verts (m²)", 80000.0, True),
+    ("Accessibilité Santé (0-10)", 10.0, True),
+    ("Accessibilité Education (0-10)", 10.0, True),
+    ("Sécurité (0-10)", 10.0, True),
+)
+INDICATOR_COLUMNS = [col for col, _, _ in INDICATORS]
+
+
+class Indicator(IntEnum):
+    """Indicateurs, de valeur égale à leur colonne dans les matrices (n x 7) des modèles."""
+    CHOMAGE = 0
+    VETUSTE = 1
+    TRANSPORT = 2
+    ESPACES_VERTS = 3
+    SANTE = 4
+    EDUCATION = 5
+    SECURITE = 6
+
+    @property
+    def column(self):
+        """Nom de la colonne du DataFrame."""
+        return INDICATOR_COLUMNS[self]
+
+    @property
+    def bounded(self):
+        """Indicateur noté sur une échelle de 0 à 10."""
+        return INDICATORS[self][1] == 10.0
+
+
+# {colonne: Indicator}
+INDICATOR_INDEX = {indicator.column: indicator for indicator in Indicator}
+SCORE_COLUMN = "Score Vulnérabilité"
+
+# Ordre des poids, identique à la signature de calculate_vulnerability_score
+WEIGHT_NAMES = ["w_social", "w_infra", "w_env", "w_sante", "w_educ", "w_secu"]
+# Valeurs par défaut des curseurs de la sidebar
+DEFAULT_WEIGHTS = (3.0, 2.5, 1.5, 2.0, 2.0, 1.5)
+
+# Répartition de chaque poids sur les indicateurs normalisés (6 poids x 7 indicateurs).
+# Le poids infrastructure est partagé à parts égales entre vétusté et transport.
+WEIGHT_TO_INDICATOR = np.array([
+    # chômage, vétusté, transport, verts, santé, éducation, sécurité
+    [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],  # w_social
+    [0.0, 0.5, 0.5, 0.0, 0.0, 0.0, 0.0],  # w_infra
+    [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0],  # w_env
+    [0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0],  # w_sante
+    [0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0],  # w_educ
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],  # w_secu
+])
+
+_SCALES = np.array([scale for _, scale, _ in INDICATORS])
+_INVERTED = np.array([inverted for _, _, inverted in INDICATORS])
+
+
+def compact_indicators(df):
+    """
+    Retourne `df` avec les indicateurs notés de 0 à 10 stockés en int8 lorsque
+    toutes leurs valeurs sont entières (conversion sans perte). Les autres colonnes
+    ne sont pas copiées.
+    """
+    compact = {}
+    for indicator in Indicator:
+        column = indicator.column
+        if not indicator.bounded or column not in df.columns or df[column].dtype == np.int8:
+            continue
+        values = df[column].to_numpy()
+        if values.dtype.kind not in "iuf" or not len(values):
+            continue
+        if np.all((values == np.round(values)) & (values >= 0) & (values <= 10)):
+            compact[column] = values.astype(np.int8)
+    return df.assign(**compact) if compact else df
+
+
+# --- Normalisation ---
+def normalize_indicators(values):
+    """
+    Normalise les indicateurs bruts (DataFrame ou tableau n x 7, dans l'ordre
+    de INDICATOR_COLUMNS) et retourne une matrice (n x 7) en float64.
+    Un tableau (... x 7) de dimension quelconque est normalisé sur son dernier axe.
+    """
+    if hasattr(values, "columns"):
+        values = values[INDICATOR_COLUMNS].to_numpy(dtype=np.float64)
+    norm = np.asarray(values, dtype=np.float64) / _SCALES
+    norm[..., _INVERTED] = 1 - norm[..., _INVERTED]
+    return norm
+
+
+def as_weight_matrix(weights):
+    """Convertit un vecteur de 6 poids ou une matrice (N x 6) en matrice (N x 6) float64."""
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    if weights.ndim != 2 or weights.shape[1] != len(WEIGHT_NAMES):
+        raise ValueError(
+            f"Les poids doivent avoir la forme (N, {len(WEIGHT_NAMES)}), reçu {weights.shape}"
+        )
+    return weights
+
+
+# --- Scoring par lots ---
+def batch_vulnerability_scores(normalized, weights, decimals=None):
+    """
+    Calcule les scores de vulnérabilité (0-100) pour N jeux de poids en un seul
+    produit matriciel. `normalized` est la matrice (n x 7) de normalize_indicators,
+    `weights` une matrice (N x 6). Retourne une matrice (N x n).
+    """
+    weights = as_weight_matrix(weights)
+    coefficients = weights @ WEIGHT_TO_INDICATOR
+    score_brut = coefficients @ np.asarray(normalized).T
+    return _finalize_scores(score_brut, weights, decimals)
+
+
+def _finalize_scores(score_brut, weights, decimals=None):
+    """Ramène les scores bruts pondérés (N x n) sur 100."""
+    # Même convention que calculate_vulnerability_score : un poids total nul vaut 1
+    total_weight = weights.sum(axis=1)
+    total_weight[total_weight == 0] = 1
+
+    scores = score_brut / total_weight[:, None] * 100
+    if decimals is not None:
+        scores = scores.round(decimals)
+    return scores
+
+
+def score_loadings(weights):
+    """
+    Coefficients (7,) du score par rapport aux indicateurs bruts : le score est
+    affine, score = valeurs brutes @ score_loadings(weights) + constante.
+    """
+    weights = as_weight_matrix(weights)[:1]
+    signs = np.where(_INVERTED, -1.0, 1.0)
+    return _finalize_scores((weights @ WEIGHT_TO_INDICATOR) / _SCALES * signs, weights)[0]
+
+
+# --- Modèle de Scoring Précalculé ---
+def _read_only(array, dtype, order="C"):
+    array = np.asarray(array, dtype=dtype, order=order)
+    array.flags.writeable = False
+    return array
+
+
+class ScoringModel:
+    """
+    Indicateurs normalisés précalculés pour une version donnée du jeu de données.
+    Construit une seule fois puis partagé (lecture seule) entre les sessions :
+    scorer revient à un produit scalaire, sans copie ni renormalisation du DataFrame.
+    """
+
+    def __init__(self, names, values, population=None, version=None):
+        self.version = version
+        self.names = np.asarray(names, dtype=object)
+        self._index = None
+        self.columns = list(INDICATOR_COLUMNS)
+        self.column_index = INDICATOR_INDEX
+
+        self.raw = _read_only(values, np.float32)
+        self.normalized = _read_only(normalize_indicators(values), np.float32)
+        # Contribution normalisée de chaque poids (n x 6) : score brut = components @ w.
+        # Stockée par colonnes pour que la mise à jour d'un seul poids soit contiguë.
+        self.components = _read_only(self.normalized @ WEIGHT_TO_INDICATOR.T, np.float32, order="F")
+        self.population = None if population is None else _read_only(population, np.float64)
+
+    @classmethod
+    def from_arrays(cls, names, raw, normalized, components, population=None, version=None):
+        """
+        Reconstruit le modèle à partir de matrices déjà calculées (par exemple
+        ouvertes en memory-map depuis un instantané), sans les recopier.
+        """
+        model = cls.__new__(cls)
+        model.version = version
+        model.names = np.asarray(names, dtype=object)
+        model._index = None
+        model.columns = list(INDICATOR_COLUMNS)
+        model.column_index = INDICATOR_INDEX
+        model.raw = _read_only(raw, np.float32)
+        model.normalized = _read_only(normalized, np.float32)
+        model.components = _read_only(components, np.float32, order="F")
+        model.population = None if population is None else _read_only(population, np.float64)
+        return model
+
+    @property
+    def index(self):
+        """{nom: unité}, construit au premier accès."""
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.names)}
+        return self._index
+
+    def lookup(self, names):
+        """Indices (int64) des unités `names`, -1 pour un nom inconnu."""
+        index = self.index
+        return np.fromiter((index.get(name, -1) for name in names), dtype=np.int64, count=len(names))
+
+    @classmethod
+    def from_dataframe(cls, df, version=None, name_column="Nom du quartier"):
+        """Construit le modèle à partir d'un DataFrame au format de generate_rabat_data."""
+        population = df["Population"].to_numpy() if "Population" in df.columns else None
+        return cls(
+            df[name_column].to_numpy(),
+            df[INDICATOR_COLUMNS].to_numpy(dtype=np.float64),
+            population=population,
+            version=version,
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def score_batch(self, weights, decimals=None):
+        """Scores (N x n) pour une matrice de poids (N x 6)."""
+        weights = as_weight_matrix(weights)
+        return _finalize_scores(weights @ self.components.T, weights, decimals)
+
+    def score(self, weights, decimals=1):
+        """Scores (n,) pour un seul jeu de 6 poids, arrondis comme calculate_vulnerability_score."""
+        return self.score_batch(weights, decimals)[0]
+
+    def attach_scores(self, df, scores):
+        """
+        Retourne `df` avec la colonne "Score Vulnérabilité" ajoutée.
+        La copie est superficielle : les colonnes existantes ne sont pas dupliquées.
+        """
+        df_scored = df.copy(deep=False)
+        df_scored[SCORE_COLUMN] = scores
+        return df_scored
+
+    def scored_frame(self, df, weights):
+        """Retourne `df` scoré avec un seul jeu de 6 poids."""
+        return self.attach_scores(df, self.score(weights))
+
+
+# --- Rescoring Incrémental ---
+class IncrementalScorer:
+    """
+    Conserve le score brut pondéré et le poids total d'une session. Lorsqu'un
+    seul curseur bouge, seule la contribution de ce poids est ajoutée (une mise
+    à jour de colonne) au lieu de recalculer la somme pondérée complète.
+    """
+
+    def __init__(self, model, weights, refresh_every=64):
+        self.model = model
+        # Recalcul complet périodique pour éviter la dérive des erreurs d'arrondi
+        self.refresh_every = refresh_every
+        self.weights = as_weight_matrix(weights)[0].copy()
+        self._recompute()
+
+    def _recompute(self):
+        self.score_brut = self.model.components @ self.weights
+        self.total_weight = self.weights.sum()
+        self.updates_since_refresh = 0
+
+    def update(self, weights):
+        """Applique un nouveau jeu de poids et retourne les scores mis à jour."""
+        weights = as_weight_matrix(weights)[0]
+        changed = np.flatnonzero(weights != self.weights)
+
+        if len(changed) > len(WEIGHT_NAMES) // 2 or self.updates_since_refresh >= self.refresh_every:
+            self.weights = weights.copy()
+            self._recompute()
+        elif len(changed):
+            for j in changed:
+                self.score_brut += (weights[j] - self.weights[j]) * self.model.components[:, j]
+            self.weights[changed] = weights[changed]
+            self.total_weight = self.weights.sum()
+            self.updates_since_refresh += 1
+
+        return self.scores()
+
+    def scores(self, decimals=1):
+        """Scores (n,) correspondant aux poids courants."""
+        return _finalize_scores(self.score_brut[None, :], self.weights[None, :], decimals)[0]
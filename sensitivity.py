@@ -0,0 +1,180 @@
+"""
+Analyse de sensibilité aux poids et stabilité du classement.
+
+Le score ne dépend que des proportions entre les 6 poids : il suffit donc de
+balayer le simplexe des poids normalisés (somme = 1), sur une grille régulière ou
+une suite quasi-aléatoire de Halton. Les jeux de poids sont scorés par lots
+(un produit matriciel par lot) et toutes les statistiques sont accumulées au fil
+des lots : distribution des rangs par quartier, régions du simplexe où chaque
+quartier est le plus vulnérable et indices de sensibilité du premier ordre.
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from scoring import WEIGHT_NAMES
+
+N_WEIGHTS = len(WEIGHT_NAMES)
+
+# Au-delà, seuls le quartier en tête et le score moyen sont suivis (matrice des rangs n x n)
+MAX_RANKED_UNITS = 200
+
+# Nombre de scores (jeux de poids x quartiers) par lot
+BATCH_ELEMENTS = 4_000_000
+
+_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19)
+
+
+# --- Échantillonnage du Simplexe ---
+def simplex_grid(resolution, dims=N_WEIGHTS):
+    """Tous les jeux de poids multiples de 1/`resolution` et de somme 1 (K x dims)."""
+    slots = resolution + dims - 1
+    points = [
+        np.diff((-1, *bars, slots)) - 1
+        for bars in combinations(range(slots), dims - 1)
+    ]
+    return np.array(points, dtype=np.float64) / resolution
+
+
+def halton(n, dims, skip=1):
+    """Suite de Halton (n x dims) dans ]0, 1[ : bases premières, une par dimension."""
+    index = np.arange(skip, skip + n)
+    points = np.zeros((n, dims))
+    for d in range(dims):
+        base, factor, i = _PRIMES[d], 1.0, index.copy()
+        while np.any(i > 0):
+            factor /= base
+            points[:, d] += factor * (i % base)
+            i //= base
+    return points
+
+
+def simplex_halton(n, dims=N_WEIGHTS):
+    """
+    `n` jeux de poids quasi-aléatoires uniformes sur le simplexe : transformation
+    exponentielle d'une suite de Halton (loi de Dirichlet(1, ..., 1)).
+    """
+    exponential = -np.log(halton(n, dims))
+    return exponential / exponential.sum(axis=1, keepdims=True)
+
+
+def sample_weights(method="grid", size=10):
+    """Jeux de poids (K x 6) : `method` "grid" (résolution `size`) ou "halton" (`size` points)."""
+    if method == "grid":
+        return simplex_grid(size)
+    if method == "halton":
+        return simplex_halton(size)
+    raise ValueError(f"Méthode d'échantillonnage inconnue : {method}")
+
+
+# --- Balayage ---
+def weight_sensitivity(model, samples, n_bins=10):
+    """
+    Score tous les jeux de poids `samples` (K x 6) et retourne un dictionnaire :
+
+    - "top" (K,) : quartier le plus vulnérable pour chaque jeu de poids ;
+    - "top_share" (n,) : part du simplexe où chaque quartier est en tête ;
+    - "rank_probabilities" (n x n, rang 0 = le plus vulnérable) et "mean_rank" (n,),
+      si le modèle compte au plus MAX_RANKED_UNITS quartiers (sinon None) ;
+    - "first_order" (n x 6) : indices de sensibilité du premier ordre du score de
+      chaque quartier à chaque poids (None au-delà de MAX_RANKED_UNITS) ;
+    - "first_order_mean" (6,) : idem pour le score moyen pondéré par la population.
+
+    Les indices sont estimés par classes d'effectifs égaux de chaque poids :
+    S_i = Var(E[score | w_i]) / Var(score).
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    n_samples, n = len(samples), len(model)
+    ranked = n <= MAX_RANKED_UNITS
+    population = model.population if model.population is not None else np.ones(n)
+    population_share = population / population.sum()
+
+    # Classe de chaque jeu de poids pour chaque poids, selon son rang (classes d'effectifs égaux)
+    bins = np.argsort(np.argsort(samples, axis=0, kind="stable"), axis=0, kind="stable") * n_bins // n_samples
+
+    top = np.empty(n_samples, dtype=np.int64)
+    rank_counts = np.zeros((n, n), dtype=np.int64) if ranked else None
+    tracked = n if ranked else 0
+    # Sommes par (poids, classe) des scores suivis (quartiers classés + score moyen)
+    bin_sums = np.zeros((N_WEIGHTS, n_bins, tracked + 1))
+    total = np.zeros(tracked + 1)
+    total_squares = np.zeros(tracked + 1)
+
+    batch = max(1, BATCH_ELEMENTS // n)
+    for start in range(0, n_samples, batch):
+        stop = min(start + batch, n_samples)
+        scores = model.score_batch(samples[start:stop])
+        top[start:stop] = np.argmax(scores, axis=1)
+
+        tracked_scores = scores @ population_share
+        if ranked:
+            ranks = np.argsort(np.argsort(-scores, axis=1, kind="stable"), axis=1, kind="stable")
+            rank_counts += np.bincount((np.arange(n) * n + ranks).ravel(), minlength=n * n).reshape(n, n)
+            tracked_scores = np.column_stack([scores, tracked_scores])
+        else:
+            tracked_scores = tracked_scores[:, None]
+
+        total += tracked_scores.sum(axis=0)
+        total_squares += (tracked_scores ** 2).sum(axis=0)
+        for i in range(N_WEIGHTS):
+            np.add.at(bin_sums[i], bins[start:stop, i], tracked_scores)
+
+    # Indices du premier ordre à partir des moyennes conditionnelles par classe
+    bin_counts = np.stack([np.bincount(bins[:, i], minlength=n_bins) for i in range(N_WEIGHTS)])
+    mean = total / n_samples
+    variance = total_squares / n_samples - mean ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        conditional = bin_sums / np.maximum(bin_counts, 1)[:, :, None]
+        between = (bin_counts[:, :, None] * (conditional - mean) ** 2).sum(axis=1) / n_samples
+        first_order = np.where(variance > 1e-12, between / variance, 0.0).T
+
+    rank_probabilities = rank_counts / n_samples if ranked else None
+    return {
+        "samples": samples,
+        "top": top,
+        "top_share": np.bincount(top, minlength=n) / n_samples,
+        "rank_probabilities": rank_probabilities,
+        "mean_rank": rank_probabilities @ np.arange(n) if ranked else None,
+        "first_order": first_order[:n] if ranked else None,
+        "first_order_mean": first_order[-1],
+    }
+
+
+def top_regions(result, names):
+    """
+    Régions du simplexe par quartier en tête : part des jeux de poids, poids moyens
+    (centroïde de la région, en %) et étendue de chaque poids dans la région.
+    """
+    samples, top = result["samples"], result["top"]
+    rows = []
+    for unit in np.flatnonzero(result["top_share"]):
+        region = samples[top == unit]
+        row = {"Quartier": names[unit], "Part du simplexe": result["top_share"][unit]}
+        for i, name in enumerate(WEIGHT_NAMES):
+            row[f"{name} moyen"] = region[:, i].mean() * 100
+            row[f"{name} min-max"] = f"{region[:, i].min() * 100:.0f}-{region[:, i].max() * 100:.0f} %"
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values("Part du simplexe", ascending=False, ignore_index=True)
+
+
+def stability_margin(result, model, weights):
+    """
+    Distance entre les poids courants (normalisés) et le jeu de poids échantillonné
+    le plus proche où un autre quartier passe en tête. La distance est la part du
+    poids total à déplacer (moitié de la distance L1). Retourne (quartier en tête,
+    marge, quartier qui le remplace) ; la marge vaut None si la tête ne change jamais.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.sum() == 0:
+        weights = np.ones(N_WEIGHTS)
+    weights = weights / weights.sum()
+
+    samples, top = result["samples"], result["top"]
+    current = int(np.argmax(model.score_batch(weights)[0]))
+    distance = np.abs(samples - weights).sum(axis=1) / 2
+    other = np.flatnonzero(top != current)
+    if len(other) == 0:
+        return current, None, None
+    nearest = other[np.argmin(distance[other])]
+    return current, float(distance[nearest]), int(top[nearest])
@@ -0,0 +1,198 @@
+"""
+Moteur de simulation vectorisé des interventions urbaines.
+
+Un ensemble d'actions (DEFAULT_ACTIONS et actions personnalisées) est normalisé
+en enregistrements Action (indicateur, cibles et valeur par cible), puis compilé
+une fois en une matrice creuse de deltas (action x quartier touché x indicateur).
+Un portefeuille d'actions, ou un lot de portefeuilles, est ensuite évalué en un
+seul passage : somme des deltas, application des bornes, renormalisation et
+rescoring des seuls quartiers touchés.
+"""
+import numpy as np
+
+from scoring import INDICATOR_COLUMNS, Indicator, as_weight_matrix, batch_vulnerability_scores, normalize_indicators
+
+# Type d'action -> (indicateur modifié, borne basse, borne haute) ; None : pas de borne
+ACTION_TYPES = {
+    "vetuste": (Indicator.VETUSTE, 0, None),
+    "transport": (Indicator.TRANSPORT, None, 10),
+    "verts": (Indicator.ESPACES_VERTS, None, None),
+    "sante": (Indicator.SANTE, None, 10),
+    "educ": (Indicator.EDUCATION, None, 10),
+    "secu": (Indicator.SECURITE, None, 10),
+    "chomage": (Indicator.CHOMAGE, 0, None),
+}
+
+# Coûts fictifs basés sur le type d'intervention (MAD)
+ACTION_COSTS = {
+    "vetuste": 5000000,  # 5M MAD
+    "transport": 10000000,  # 10M MAD
+    "verts": 2000000,  # 2M MAD
+    "sante": 15000000,  # 15M MAD
+    "educ": 8000000,  # 8M MAD
+    "secu": 3000000,  # 3M MAD
+    "chomage": 4000000  # 4M MAD (formation)
+}
+
+# Bornes par indicateur, dans l'ordre de INDICATOR_COLUMNS
+_LOWER = np.full(len(INDICATOR_COLUMNS), -np.inf)
+_UPPER = np.full(len(INDICATOR_COLUMNS), np.inf)
+for _indicator, _low, _high in ACTION_TYPES.values():
+    _LOWER[_indicator] = -np.inf if _low is None else _low
+    _UPPER[_indicator] = np.inf if _high is None else _high
+
+# Effet élémentaire compilé d'une action : (action, quartier, indicateur, valeur)
+ACTION_ENTRY = np.dtype([("action", np.int32), ("unit", np.int64), ("indicator", np.int8), ("value", np.float64)])
+
+
+# --- Actions ---
+class Action:
+    """
+    Action normalisée : indicateur modifié, quartiers cibles (tuple) et valeur
+    d'impact de chaque cible (float64, alignée sur les cibles). Une action sans
+    type ni cible ("Aucune action") n'a aucune cible.
+    """
+
+    __slots__ = ("name", "type", "indicator", "targets", "values", "cost")
+
+    def __init__(self, name, action_type=None, targets=(), values=0.0, cost=None):
+        if action_type is not None and action_type not in ACTION_TYPES:
+            raise ValueError(f"Type d'action inconnu : {action_type} (attendu : {', '.join(ACTION_TYPES)})")
+        self.name = name
+        self.type = action_type
+        self.indicator = None if action_type is None else ACTION_TYPES[action_type][0]
+        self.targets = () if action_type is None else tuple(targets)
+        self.values = np.broadcast_to(np.asarray(values, dtype=np.float64), (len(self.targets),)).copy()
+        self.values.flags.writeable = False
+        self.cost = ACTION_COSTS.get(action_type, 0) if cost is None else cost
+
+    @classmethod
+    def from_dict(cls, action):
+        """Action au format DEFAULT_ACTIONS : cible unique ou liste, valeur unique ou par cible."""
+        targets = action.get("target")
+        targets = [] if targets is None else [targets] if isinstance(targets, str) else list(targets)
+        val = action.get("val", 0)
+        values = [val.get(t, 0) for t in targets] if isinstance(val, dict) else val
+        return cls(action["name"], action.get("type"), targets, values, action.get("cost"))
+
+    def to_dict(self):
+        """Format DEFAULT_ACTIONS, cibles toujours en liste et valeurs par cible."""
+        return {
+            "name": self.name,
+            "target": list(self.targets) if self.type is not None else None,
+            "type": self.type,
+            "val": dict(zip(self.targets, self.values.tolist())),
+            "cost": self.cost,
+        }
+
+    def __repr__(self):
+        return f"Action({self.name!r}, {self.type!r}, {len(self.targets)} cible(s))"
+
+
+def as_action(action):
+    """Action, à partir d'un dictionnaire au format DEFAULT_ACTIONS ou d'une Action."""
+    if isinstance(action, Action):
+        return action
+    if not isinstance(action, dict):
+        raise TypeError(f"Action attendue (dict ou Action), reçu {type(action).__name__}")
+    return Action.from_dict(action)
+
+
+def as_actions(actions):
+    return [as_action(action) for action in actions]
+
+
+def action_targets(action):
+    """Liste des (quartier cible, valeur d'impact) d'une action."""
+    action = as_action(action)
+    return list(zip(action.targets, action.values.tolist()))
+
+
+def action_cost(action):
+    """Coût d'une action : champ "cost" s'il est renseigné, sinon coût fictif de son type."""
+    return as_action(action).cost
+
+
+class ActionMatrix:
+    """
+    Actions compilées pour un modèle de scoring : effets élémentaires (`entries`,
+    tableau structuré ACTION_ENTRY) et deltas denses sur l'union U des quartiers
+    touchés seulement, de forme (A actions x U quartiers x 7 indicateurs).
+    """
+
+    def __init__(self, model, actions):
+        self.model = model
+        self.actions = as_actions(actions)
+        self.names = [action.name for action in self.actions]
+
+        counts = [len(action.targets) for action in self.actions]
+        targets = [target for action in self.actions for target in action.targets]
+        entries = np.empty(len(targets), dtype=ACTION_ENTRY)
+        entries["action"] = np.repeat(np.arange(len(self.actions)), counts)
+        entries["unit"] = model.lookup(targets)
+        entries["indicator"] = np.repeat([-1 if a.indicator is None else a.indicator for a in self.actions], counts)
+        entries["value"] = np.concatenate([action.values for action in self.actions]) if targets else []
+
+        known = entries["unit"] >= 0
+        self.unknown_targets = [targets[i] for i in np.flatnonzero(~known)]
+        self.entries = entries[known]
+
+        self.units, positions = np.unique(self.entries["unit"], return_inverse=True)
+        self.deltas = np.zeros((len(self.actions), len(self.units), len(INDICATOR_COLUMNS)))
+        np.add.at(self.deltas, (self.entries["action"], positions, self.entries["indicator"]), self.entries["value"])
+        # Quartiers touchés par chaque action (A x U)
+        self.touches = np.any(self.deltas != 0, axis=2)
+
+    def __len__(self):
+        return len(self.names)
+
+    def selection(self, names):
+        """Vecteur de sélection (A,) à partir de noms d'actions."""
+        names = set(names)
+        return np.array([name in names for name in self.names], dtype=np.float64)
+
+    def apply(self, selections):
+        """
+        Valeurs brutes des quartiers touchés après application de chaque portefeuille.
+        `selections` est une matrice (P x A) de 0/1 ; retourne un tableau (P x U x 7),
+        borné comme dans le simulateur (0-10, chômage et vétusté positifs).
+        """
+        selections = np.atleast_2d(np.asarray(selections, dtype=np.float64))
+        before = self.model.raw[self.units].astype(np.float64)
+        after = before + np.tensordot(selections, self.deltas, axes=1)
+        return np.clip(after, _LOWER, _UPPER)
+
+    def score(self, selections, weights):
+        """
+        Scores avant (U,) et après (P x U) de chaque portefeuille pour un jeu de poids,
+        en un seul passage vectorisé. Les scores ne sont pas arrondis.
+        """
+        weights = as_weight_matrix(weights)[:1]
+        after = self.apply(selections)
+        before_raw = self.model.raw[self.units].astype(np.float64)
+        before = batch_vulnerability_scores(normalize_indicators(before_raw), weights)[0]
+        after_scores = batch_vulnerability_scores(normalize_indicators(after.reshape(-1, after.shape[2])), weights)
+        return before, after_scores[0].reshape(after.shape[:2])
+
+
+def simulate_portfolio(model, actions, selected_names, weights):
+    """
+    Applique un portefeuille d'actions et rescore tous les quartiers touchés.
+    Retourne un dictionnaire : indices des quartiers touchés ("units"), valeurs
+    brutes avant/après ("before", "after", U x 7) et scores avant/après (U,).
+    """
+    matrix = ActionMatrix(model, actions)
+    selection = matrix.selection(selected_names)
+    touched = matrix.touches[selection > 0].any(axis=0)
+
+    before_raw = model.raw[matrix.units].astype(np.float64)
+    after_raw = matrix.apply(selection)[0]
+    before_scores, after_scores = matrix.score(selection, weights)
+    return {
+        "units": matrix.units[touched],
+        "before": before_raw[touched],
+        "after": after_raw[touched],
+        "score_before": before_scores[touched],
+        "score_after": after_scores[0][touched],
+        "unknown_targets": matrix.unknown_targets,
+    }
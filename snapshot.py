@@ -0,0 +1,159 @@
+"""
+Instantané binaire de démarrage à chaud : jeu de données, matrices du modèle de
+scoring, affectation des unités aux communes et géométrie des communes.
+
+Au premier démarrage d'un processus (déploiement, mise à l'échelle), l'application
+doit sinon régénérer ou relire les données, renormaliser les indicateurs, refaire
+la jointure spatiale et relire le GeoJSON. Avec un instantané, les tableaux sont
+ouverts en memory-map (.npy, Arrow IPC non compressé) : le coût de chargement ne
+dépend plus de la taille du jeu et les pages ne sont lues qu'à l'usage.
+
+La géométrie et l'affectation aux communes dépendent du GeoJSON source : son
+empreinte est enregistrée dans le manifeste, et si le fichier a changé depuis,
+ces deux parties de l'instantané sont ignorées et recalculées depuis la source.
+
+    python snapshot.py Data/snapshot
+    URBANLIFE_SNAPSHOT=Data/snapshot streamlit run app.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Version du format : un instantané d'un autre format est ignoré
+SNAPSHOT_FORMAT = 2
+
+MANIFEST = "manifest.json"
+DATASET_FILE = "dataset.arrow"
+GEOMETRY_FILE = "geometry.json"
+ARRAYS = ("raw", "normalized", "components", "population", "commune_index")
+
+
+def source_digest(path):
+    """Empreinte SHA-256 du contenu d'un fichier source, ou None s'il n'existe pas."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(directory, dataset_version, df, model, commune_index, geojson, geometry_source):
+    """
+    Écrit l'instantané de `dataset_version` dans `directory` (remplacé
+    atomiquement). `model` est le ScoringModel construit sur `df` ; `geojson` et
+    `commune_index` sont issus du fichier `geometry_source`.
+    """
+    from datastore import write_dataset
+
+    tmp_dir = f"{directory.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    write_dataset(df, os.path.join(tmp_dir, DATASET_FILE))
+    arrays = {
+        "raw": model.raw,
+        "normalized": model.normalized,
+        "components": model.components,
+        "population": model.population,
+        "commune_index": commune_index,
+    }
+    for name, array in arrays.items():
+        if array is not None:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    if geojson is not None:
+        with open(os.path.join(tmp_dir, GEOMETRY_FILE), "w", encoding="utf-8") as f:
+            json.dump(geojson, f, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": SNAPSHOT_FORMAT,
+            "dataset_version": dataset_version,
+            "geometry_digest": source_digest(geometry_source) if geojson is not None else None,
+            "units": len(model),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+
+def read_manifest(directory):
+    """Manifeste de l'instantané, ou None s'il n'existe pas."""
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_snapshot(directory, dataset_version, geometry_source):
+    """
+    Ouvre l'instantané de `directory` s'il correspond à `dataset_version`, sinon
+    retourne None. Retourne un dict : manifest, les tableaux de ARRAYS en
+    memory-map lecture seule (None si absents) et les chemins du jeu de données
+    et de la géométrie, lus à la demande (read_snapshot_dataset, read_snapshot_geometry).
+
+    Si `geometry_source` a changé depuis l'écriture de l'instantané, la géométrie
+    (geometry_path) et commune_index valent None : l'appelant les recalcule.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None or manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    if manifest.get("dataset_version") != dataset_version:
+        return None
+    snapshot = {"manifest": manifest}
+    for name in ARRAYS:
+        path = os.path.join(directory, f"{name}.npy")
+        snapshot[name] = np.load(path, mmap_mode="r") if os.path.exists(path) else None
+    snapshot["dataset_path"] = os.path.join(directory, DATASET_FILE)
+    snapshot["geometry_path"] = os.path.join(directory, GEOMETRY_FILE)
+    digest = manifest.get("geometry_digest")
+    if digest is None or digest != source_digest(geometry_source):
+        snapshot["geometry_path"] = None
+        snapshot["commune_index"] = None
+    return snapshot
+
+
+def read_snapshot_dataset(snapshot, columns=None):
+    """DataFrame de l'instantané (Arrow IPC en memory-map), limité à `columns`."""
+    from datastore import read_dataset
+    return read_dataset(snapshot["dataset_path"], list(columns) if columns is not None else None)
+
+
+def read_snapshot_geometry(snapshot):
+    """GeoJSON des communes de l'instantané, ou None s'il est périmé."""
+    if snapshot["geometry_path"] is None:
+        return None
+    with open(snapshot["geometry_path"], "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit l'instantané de démarrage à chaud du jeu de données actif.")
+    parser.add_argument("directory", help="Répertoire de l'instantané (remplacé s'il existe)")
+    args = parser.parse_args()
+
+    import utils
+
+    start = time.perf_counter()
+    dataset_version = utils.current_dataset_version()
+    model = utils._build_scoring_model(dataset_version)
+    write_snapshot(
+        args.directory,
+        dataset_version,
+        utils._shared_dataset(dataset_version, None),
+        model,
+        utils._commune_index(dataset_version),
+        utils.load_geojson(),
+        utils.GEOJSON_PATH,
+    )
+    print(f"Instantané de {len(model):,} unités ({dataset_version}) écrit dans {args.directory} "
+          f"en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Jointure spatiale points -> communes.
+
+Un index en grille régulière sur les boîtes englobantes des polygones sélectionne
+les points candidats de chaque commune, puis un test point-dans-polygone vectorisé
+(parité des croisements de rayon) tranche. Les anneaux intérieurs (trous) sont
+gérés par la même règle de parité.
+"""
+import numpy as np
+
+
+def _feature_rings(geometry):
+    """Tous les anneaux (extérieurs et trous) d'un Polygon / MultiPolygon, en tableaux (m x 2)."""
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        raise ValueError(f"Type de géométrie non supporté : {geometry['type']}")
+    return [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+
+
+def points_in_rings(x, y, rings, n_bands=32, block_size=1_000_000):
+    """
+    Test point-dans-polygone vectorisé sur les points (x, y) : un point est à
+    l'intérieur s'il croise un nombre impair d'arêtes, tous anneaux confondus.
+
+    Les arêtes sont réparties en bandes horizontales : un point ne teste que les
+    arêtes qui chevauchent sa bande, par blocs de (points x arêtes) d'au plus
+    `block_size` éléments pour borner la mémoire.
+    """
+    edges = np.vstack([np.hstack([ring[:-1], ring[1:]]) for ring in rings])
+    ax, ay, bx, by = edges.T
+    edge_ymin, edge_ymax = np.minimum(ay, by), np.maximum(ay, by)
+
+    inside = np.zeros(len(x), dtype=bool)
+    if len(x) == 0:
+        return inside
+
+    y0, y1 = edge_ymin.min(), edge_ymax.max()
+    band_height = (y1 - y0) / n_bands or 1.0
+    point_band = np.clip(np.floor((y - y0) / band_height).astype(np.int64), 0, n_bands - 1)
+    order = np.argsort(point_band, kind="stable")
+    bounds = np.searchsorted(point_band[order], np.arange(n_bands + 1))
+
+    for band in range(n_bands):
+        points = order[bounds[band]:bounds[band + 1]]
+        if len(points) == 0:
+            continue
+        bottom = y0 + band * band_height
+        band_edges = np.flatnonzero((edge_ymax >= bottom) & (edge_ymin <= bottom + band_height))
+        if len(band_edges) == 0:
+            continue
+        eax, eay, ebx, eby = ax[band_edges], ay[band_edges], bx[band_edges], by[band_edges]
+
+        step = max(1, block_size // len(band_edges))
+        for start in range(0, len(points), step):
+            block = points[start:start + step]
+            px, py = x[block, None], y[block, None]
+            crosses = (eay > py) != (eby > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = eax + (py - eay) * (ebx - eax) / (eby - eay)
+            inside[block] = np.count_nonzero(crosses & (px < x_cross), axis=1) % 2 == 1
+    return inside
+
+
+class SpatialIndex:
+    """
+    Index en grille des polygones d'un GeoJSON. Les points sont rangés par cellule
+    une seule fois ; chaque polygone ne teste ensuite que les points des cellules
+    couvertes par sa boîte englobante.
+    """
+
+    def __init__(self, geojson, key="commune", grid_size=64):
+        features = geojson["features"]
+        self.names = np.array([f["properties"][key] for f in features], dtype=object)
+        self.rings = [_feature_rings(f["geometry"]) for f in features]
+        # Boîtes englobantes (xmin, ymin, xmax, ymax) par polygone
+        self.bounds = np.array([
+            np.concatenate([np.vstack(rings).min(axis=0), np.vstack(rings).max(axis=0)])
+            for rings in self.rings
+        ])
+        self.extent = np.concatenate([self.bounds[:, :2].min(axis=0), self.bounds[:, 2:].max(axis=0)])
+        self.grid_size = grid_size
+        self.cell_size = (self.extent[2:] - self.extent[:2]) / grid_size
+        # Plage de cellules (ix0, iy0, ix1, iy1) couverte par chaque boîte englobante
+        self.cell_ranges = np.hstack([self._cell(self.bounds[:, :2]), self._cell(self.bounds[:, 2:])])
+        # Toutes les arêtes (ax, ay, bx, by), leur polygone et leur boîte englobante
+        edges = [np.vstack([np.hstack([ring[:-1], ring[1:]]) for ring in rings]) for rings in self.rings]
+        self.edges = np.vstack(edges)
+        self.edge_owner = np.repeat(np.arange(len(edges)), [len(e) for e in edges])
+        self.edge_bounds = np.column_stack([
+            np.minimum(self.edges[:, 0], self.edges[:, 2]), np.minimum(self.edges[:, 1], self.edges[:, 3]),
+            np.maximum(self.edges[:, 0], self.edges[:, 2]), np.maximum(self.edges[:, 1], self.edges[:, 3]),
+        ])
+
+    def _cell(self, xy):
+        cells = np.floor((xy - self.extent[:2]) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.grid_size - 1)
+
+    def join(self, x, y, snap_distance=0.0):
+        """
+        Retourne, pour chaque point (x = longitude, y = latitude), l'indice du
+        polygone qui le contient, ou -1 s'il n'est dans aucun polygone. Avec
+        `snap_distance` (en degrés), un point hors de tout polygone (par ex. sur le
+        littoral) est rattaché au polygone le plus proche s'il en est assez près.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        result = np.full(len(x), -1, dtype=np.int64)
+
+        in_extent = (
+            (x >= self.extent[0]) & (x <= self.extent[2]) & (y >= self.extent[1]) & (y <= self.extent[3])
+        )
+        candidates = np.flatnonzero(in_extent)
+        cells = self._cell(np.column_stack([x[candidates], y[candidates]]))
+        cell_ids = cells[:, 1] * self.grid_size + cells[:, 0]
+        order = np.argsort(cell_ids, kind="stable")
+        sorted_ids = cell_ids[order]
+
+        for i, (ix0, iy0, ix1, iy1) in enumerate(self.cell_ranges):
+            # Chaque ligne de cellules couverte est une plage contiguë d'identifiants
+            rows = np.arange(iy0, iy1 + 1) * self.grid_size
+            starts = np.searchsorted(sorted_ids, rows + ix0, side="left")
+            stops = np.searchsorted(sorted_ids, rows + ix1, side="right")
+            if not np.any(stops > starts):
+                continue
+            idx = candidates[np.concatenate([order[a:b] for a, b in zip(starts, stops)])]
+            idx = idx[result[idx] < 0]
+
+            xmin, ymin, xmax, ymax = self.bounds[i]
+            px, py = x[idx], y[idx]
+            in_box = (px >= xmin) & (px <= xmax) & (py >= ymin) & (py <= ymax)
+            idx = idx[in_box]
+            result[idx[points_in_rings(x[idx], y[idx], self.rings[i])]] = i
+
+        if snap_distance > 0:
+            unmatched = np.flatnonzero(result < 0)
+            if len(unmatched):
+                nearest, distance = self.nearest(x[unmatched], y[unmatched], snap_distance)
+                close = distance <= snap_distance
+                result[unmatched[close]] = nearest[close]
+        return result
+
+    def nearest(self, x, y, max_distance=np.inf, block_size=1_000_000):
+        """
+        Indice du polygone dont le contour est le plus proche de chaque point, et la
+        distance. Les points sont traités par cellule de la grille : seules les arêtes
+        dont la boîte englobante, élargie de `max_distance`, recoupe celle des points
+        de la cellule sont testées. Un point sans arête à moins de `max_distance`
+        garde l'indice -1 (distance infinie).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        best = np.full(len(x), -1, dtype=np.int64)
+        best_distance = np.full(len(x), np.inf)
+
+        near = np.flatnonzero(
+            (x >= self.extent[0] - max_distance) & (x <= self.extent[2] + max_distance)
+            & (y >= self.extent[1] - max_distance) & (y <= self.extent[3] + max_distance)
+        )
+        cells = self._cell(np.column_stack([x[near], y[near]]))
+        cell_ids = cells[:, 1] * self.grid_size + cells[:, 0]
+        order = np.argsort(cell_ids, kind="stable")
+        groups = np.split(near[order], np.flatnonzero(np.diff(cell_ids[order])) + 1)
+
+        xmin, ymin, xmax, ymax = self.edge_bounds.T
+        for points in groups:
+            if len(points) == 0:
+                continue
+            px, py = x[points], y[points]
+            candidates = np.flatnonzero(
+                (xmin <= px.max() + max_distance) & (xmax >= px.min() - max_distance)
+                & (ymin <= py.max() + max_distance) & (ymax >= py.min() - max_distance)
+            )
+            if len(candidates) == 0:
+                continue
+            ax, ay, bx, by = self.edges[candidates].T
+            dx, dy = bx - ax, by - ay
+            length2 = np.where(dx**2 + dy**2 == 0, 1, dx**2 + dy**2)
+            step = max(1, block_size // len(candidates))
+            for start in range(0, len(points), step):
+                block = points[start:start + step]
+                bpx, bpy = x[block, None], y[block, None]
+                # Projection du point sur chaque segment, bornée aux extrémités
+                t = np.clip(((bpx - ax) * dx + (bpy - ay) * dy) / length2, 0, 1)
+                distance = np.hypot(bpx - (ax + t * dx), bpy - (ay + t * dy))
+                closest = distance.argmin(axis=1)
+                best_distance[block] = distance[np.arange(len(block)), closest]
+                best[block] = self.edge_owner[candidates[closest]]
+        far = best_distance > max_distance
+        best[far] = -1
+        best_distance[far] = np.inf
+        return best, best_distance
+
+    def join_names(self, x, y, snap_distance=0.0, missing=None):
+        """Comme join, mais retourne le nom de la commune (ou `missing`)."""
+        return self.names_for(self.join(x, y, snap_distance), missing)
+
+    def names_for(self, index, missing=None):
+        """Noms des polygones pour un tableau d'indices issu de join (-1 -> `missing`)."""
+        return np.where(index >= 0, self.names[np.maximum(index, 0)], missing)
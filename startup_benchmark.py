@@ -0,0 +1,111 @@
+"""
+Mesure du temps de démarrage : imports des modules et démarrage à froid des données.
+
+Chaque mesure est faite dans un processus Python neuf, comme après un déploiement :
+- imports : durée d'import de chaque module, streamlit/pandas/numpy déjà chargés ;
+- démarrage à froid : données, modèle de scoring, géométrie, affectation aux
+  communes et premier score, sans puis avec l'instantané (snapshot.py).
+
+    python startup_benchmark.py
+    URBANLIFE_DATASET=Data/rabat_1M.parquet python startup_benchmark.py --snapshot Data/snapshot
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules mesurés, des plus légers aux plus lourds
+MODULES = ("utils", "plotly.express", "folium", "streamlit_folium", "maps")
+
+BASELINE_IMPORTS = "import numpy, pandas, streamlit"
+
+_IMPORT_SCRIPT = """
+import time
+{baseline}
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+_COLD_START_SCRIPT = """
+import json, time
+timings = {}
+start = time.perf_counter()
+import utils
+timings["import utils"] = time.perf_counter() - start
+
+def step(name, function):
+    t = time.perf_counter()
+    result = function()
+    timings[name] = time.perf_counter() - t
+    return result
+
+version = utils.current_dataset_version()
+step("instantané", lambda: utils._warm_snapshot(version))
+step("jeu de données", lambda: utils._shared_dataset(version, None))
+model = step("modèle de scoring", lambda: utils._build_scoring_model(version))
+step("géométrie", utils.load_geojson)
+step("affectation aux communes", lambda: utils._commune_index(version))
+step("premier score", lambda: model.score(utils.DEFAULT_WEIGHTS))
+timings["total"] = time.perf_counter() - start
+timings["unités"] = len(model)
+print(json.dumps(timings))
+"""
+
+
+def _run(script, env=None):
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, **(env or {})},
+    )
+    return completed.stdout.strip().splitlines()[-1]
+
+
+def import_times(modules=MODULES, repeat=3):
+    """Durée d'import (s, meilleure de `repeat`) de chaque module dans un processus neuf."""
+    return {
+        module: min(
+            float(_run(_IMPORT_SCRIPT.format(baseline=BASELINE_IMPORTS, module=module)))
+            for _ in range(repeat)
+        )
+        for module in modules
+    }
+
+
+def cold_start(snapshot=None, repeat=3):
+    """
+    Durées (s) des étapes de démarrage à froid, meilleures de `repeat` processus,
+    avec l'instantané `snapshot` ou sans instantané.
+    """
+    env = {"URBANLIFE_SNAPSHOT": snapshot or ""}
+    runs = [json.loads(_run(_COLD_START_SCRIPT, env)) for _ in range(repeat)]
+    return {step: min(run[step] for run in runs) for step in runs[0]}
+
+
+def _print_table(title, rows):
+    print(f"\n{title}")
+    width = max(len(name) for name in rows)
+    for name, value in rows.items():
+        shown = f"{value:,}" if isinstance(value, int) else f"{value * 1000:10.1f} ms"
+        print(f"  {name:<{width}}  {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure les temps d'import et de démarrage à froid.")
+    parser.add_argument("--snapshot", help="Instantané à comparer au démarrage sans instantané")
+    parser.add_argument("--repeat", type=int, default=3, help="Processus par mesure (meilleur temps retenu)")
+    parser.add_argument("--skip-imports", action="store_true", help="Ne mesure que le démarrage à froid")
+    args = parser.parse_args()
+
+    if not args.skip_imports:
+        _print_table("Imports (streamlit, pandas et numpy déjà chargés)", import_times(repeat=args.repeat))
+    _print_table("Démarrage à froid sans instantané", cold_start(None, args.repeat))
+    if args.snapshot:
+        _print_table(f"Démarrage à froid avec l'instantané {args.snapshot}", cold_start(args.snapshot, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Statistiques incrémentales des indicateurs : moyennes et covariances tenues à
+jour par fusion de Welford (algorithme de Chan et al.), sans conserver les lignes.
+
+Ajouter des lignes coûte O(lignes x k²) et ne relit jamais les données déjà vues.
+Le score de vulnérabilité étant une combinaison affine des indicateurs bruts
+(scoring.score_loadings), ses covariances et corrélations se déduisent de la
+matrice de covariance des indicateurs et du vecteur de poids en O(k²) : changer
+les poids ne demande aucun passage sur les données.
+"""
+import numpy as np
+import pandas as pd
+
+from scoring import INDICATOR_COLUMNS, SCORE_COLUMN, score_loadings
+
+# Nombre de lignes converties en float64 à la fois lors d'un ajout
+UPDATE_CHUNK = 262_144
+
+
+class RunningCovariance:
+    """Nombre de lignes, moyenne (k,) et somme des produits centrés (k x k) de k colonnes."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.count = 0
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros((k, k))
+
+    def _merge(self, count, mean, m2):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + np.outer(delta, delta) * (self.count * count / total)
+        self.mean += delta * (count / total)
+        self.count = total
+
+    def update(self, rows):
+        """Ajoute des lignes (m x k, ou une ligne de k valeurs)."""
+        rows = np.atleast_2d(np.asarray(rows))
+        if rows.shape[1] != len(self.columns):
+            raise ValueError(f"Les lignes doivent avoir {len(self.columns)} colonnes, reçu {rows.shape[1]}")
+        for start in range(0, len(rows), UPDATE_CHUNK):
+            chunk = rows[start:start + UPDATE_CHUNK].astype(np.float64)
+            mean = chunk.mean(axis=0)
+            centered = chunk - mean
+            self._merge(len(chunk), mean, centered.T @ centered)
+        return self
+
+    def merge(self, other):
+        """Fusionne les statistiques d'un autre RunningCovariance sur les mêmes colonnes."""
+        if other.columns != self.columns:
+            raise ValueError("Les statistiques à fusionner doivent porter sur les mêmes colonnes")
+        self._merge(other.count, other.mean, other.m2)
+        return self
+
+    def covariance(self, ddof=1):
+        """Matrice de covariance (k x k)."""
+        if self.count <= ddof:
+            return np.full_like(self.m2, np.nan)
+        return self.m2 / (self.count - ddof)
+
+    def correlation(self):
+        """Matrice de corrélation (k x k) ; NaN pour une colonne constante."""
+        return _correlation_from_covariance(self.covariance())
+
+
+def _correlation_from_covariance(cov):
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.outer(std, std)
+    np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+    return corr
+
+
+def indicator_statistics(values):
+    """Statistiques incrémentales des indicateurs bruts (n x 7, ordre de INDICATOR_COLUMNS)."""
+    return RunningCovariance(INDICATOR_COLUMNS).update(values)
+
+
+def score_correlation(stats, weights, columns=None):
+    """
+    Matrice de corrélation des indicateurs `columns` (défaut : tous) et du score
+    de vulnérabilité pour un jeu de poids, déduite analytiquement de la covariance
+    des indicateurs de `stats` (indicator_statistics) : aucun passage sur les données.
+    Le score est pris avant arrondi à 0.1.
+    """
+    columns = list(stats.columns) if columns is None else list(columns)
+    loadings = score_loadings(weights)
+    cov = stats.covariance()
+    score_cov = cov @ loadings
+
+    k = len(stats.columns)
+    extended = np.empty((k + 1, k + 1))
+    extended[:k, :k] = cov
+    extended[:k, k] = extended[k, :k] = score_cov
+    extended[k, k] = loadings @ score_cov
+
+    position = {col: j for j, col in enumerate(stats.columns)}
+    selected = [position[col] for col in columns] + [k]
+    corr = _correlation_from_covariance(extended[np.ix_(selected, selected)])
+    labels = columns + [SCORE_COLUMN]
+    return pd.DataFrame(corr, index=labels, columns=labels)
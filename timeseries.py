@@ -0,0 +1,171 @@
+"""
+Panneaux temporels d'indicateurs (période x quartier x indicateur).
+
+Les valeurs brutes et les contributions normalisées de chaque poids sont stockées
+dans des tableaux float32 contigus dont la capacité double au besoin : ajouter
+une période est en O(quartiers), sans recopier l'historique à chaque ajout.
+Les tendances glissantes (pente des moindres carrés sur les `window` dernières
+périodes), moyennes glissantes et variations sont maintenues par sommes
+glissantes mises à jour à chaque ajout. Les scores déjà calculés pour un jeu de
+poids sont conservés : seules les nouvelles périodes sont scorées. Un panneau peut
+être partagé entre sessions : ajouts et scores sont protégés par un verrou.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from scoring import (
+    INDICATOR_COLUMNS, SCORE_COLUMN, WEIGHT_TO_INDICATOR, _finalize_scores, _read_only,
+    as_weight_matrix, normalize_indicators, score_loadings,
+)
+
+N_INDICATORS = len(INDICATOR_COLUMNS)
+
+# Nombre de jeux de poids dont l'historique des scores est conservé
+SCORE_CACHE_SIZE = 32
+
+
+class IndicatorPanel:
+    """
+    Historique des indicateurs d'un ensemble fixe de quartiers. `window` est le
+    nombre de périodes des tendances et moyennes glissantes.
+    """
+
+    def __init__(self, names, window=12, capacity=16):
+        self.names = np.asarray(names, dtype=object)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.window = window
+        self.periods = []
+
+        n = len(self.names)
+        self._values = np.empty((capacity, n, N_INDICATORS), dtype=np.float32)
+        self._components = np.empty((capacity, n, len(WEIGHT_TO_INDICATOR)), dtype=np.float32)
+        # Sommes glissantes sur la fenêtre : sum(y) et sum(t * y), t = indice de période
+        self._sum = np.zeros((n, N_INDICATORS))
+        self._sum_ty = np.zeros((n, N_INDICATORS))
+        # Scores déjà calculés, par jeu de poids
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.periods)
+
+    @property
+    def values(self):
+        """Valeurs brutes (T x n x 7), en lecture seule."""
+        return _read_only(self._values[:len(self)], np.float32)
+
+    def _aligned(self, values):
+        """Valeurs (n x 7) dans l'ordre des quartiers du panneau."""
+        if hasattr(values, "columns"):
+            frame = values.set_index("Nom du quartier") if "Nom du quartier" in values.columns else values
+            missing = set(self.names) - set(frame.index)
+            if missing:
+                raise ValueError(f"Quartiers absents de la période : {', '.join(sorted(missing))}")
+            values = frame.loc[self.names, INDICATOR_COLUMNS].to_numpy(dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != (len(self.names), N_INDICATORS):
+            raise ValueError(
+                f"Les valeurs doivent avoir la forme ({len(self.names)}, {N_INDICATORS}), reçu {values.shape}"
+            )
+        return values
+
+    def append(self, period, values):
+        """
+        Ajoute une période : `values` est un tableau (n x 7) dans l'ordre des quartiers
+        du panneau, ou un DataFrame avec "Nom du quartier" et les colonnes d'indicateurs.
+        """
+        values = self._aligned(values)
+        with self._lock:
+            self._append(period, values)
+
+    def _append(self, period, values):
+        t = len(self)
+        if t == len(self._values):
+            self._values = np.concatenate([self._values, np.empty_like(self._values)])
+            self._components = np.concatenate([self._components, np.empty_like(self._components)])
+
+        self._values[t] = values
+        self._components[t] = normalize_indicators(values) @ WEIGHT_TO_INDICATOR.T
+        self.periods.append(period)
+
+        # Les sommes portent sur les valeurs stockées (float32) : elles s'annulent
+        # exactement quand la période sort de la fenêtre
+        stored = self._values[t].astype(np.float64)
+        self._sum += stored
+        self._sum_ty += t * stored
+        if t >= self.window:
+            # La période t - window sort de la fenêtre glissante
+            leaving = self._values[t - self.window].astype(np.float64)
+            self._sum -= leaving
+            self._sum_ty -= (t - self.window) * leaving
+
+    # --- Scores ---
+    def scores(self, weights, decimals=None):
+        """
+        Scores (T x n) de toutes les périodes pour un jeu de 6 poids. Les périodes
+        déjà scorées pour ces poids ne sont pas recalculées.
+        """
+        weights = as_weight_matrix(weights)[:1]
+        key = tuple(weights[0])
+        with self._lock:
+            done = self._scores.pop(key, np.empty((0, len(self.names))))
+            if len(done) < len(self):
+                new = self._components[len(done):len(self)] @ weights[0]
+                done = np.concatenate([done, _finalize_scores(new, weights)])
+            # Le jeu de poids le moins récemment utilisé est oublié en premier
+            self._scores[key] = done
+            if len(self._scores) > SCORE_CACHE_SIZE:
+                del self._scores[next(iter(self._scores))]
+        return done.round(decimals) if decimals is not None else done.copy()
+
+    # --- Tendances et Variations ---
+    def _window_size(self):
+        return min(len(self), self.window)
+
+    def rolling_mean(self):
+        """Moyenne (n x 7) de chaque indicateur sur les dernières périodes de la fenêtre."""
+        return self._sum / max(self._window_size(), 1)
+
+    def trend(self):
+        """
+        Pente (n x 7) de chaque indicateur par période : droite des moindres carrés
+        sur les dernières périodes de la fenêtre (0 avec moins de deux périodes).
+        """
+        w = self._window_size()
+        if w < 2:
+            return np.zeros_like(self._sum)
+        first = len(self) - w
+        t = np.arange(first, len(self))
+        sum_t, sum_tt = t.sum(), (t ** 2).sum()
+        return (w * self._sum_ty - sum_t * self._sum) / (w * sum_tt - sum_t ** 2)
+
+    def delta(self, lag=1):
+        """Variation (n x 7) de chaque indicateur sur les `lag` dernières périodes."""
+        if len(self) <= lag:
+            return np.zeros_like(self._sum)
+        return self._values[len(self) - 1].astype(np.float64) - self._values[len(self) - 1 - lag]
+
+    def score_trend(self, weights):
+        """
+        Pente (n,) du score de vulnérabilité par période. Le score étant linéaire en
+        les indicateurs, elle se déduit des pentes des indicateurs sans rescorer l'historique.
+        """
+        return self.trend() @ score_loadings(weights)
+
+    def score_delta(self, weights, lag=1):
+        """Variation (n,) du score sur les `lag` dernières périodes."""
+        scores = self.scores(weights)
+        if len(scores) <= lag:
+            return np.zeros(len(self.names))
+        return scores[-1] - scores[-1 - lag]
+
+    def to_frame(self, weights, score_column=SCORE_COLUMN):
+        """Historique des scores au format long (Période, Nom du quartier, score)."""
+        scores = self.scores(weights)
+        return pd.DataFrame({
+            "Période": np.repeat(self.periods, len(self.names)),
+            "Nom du quartier": np.tile(self.names, len(self)),
+            score_column: scores.ravel(),
+        })
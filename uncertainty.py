@@ -0,0 +1,158 @@
+"""
+Moteur Monte Carlo d'incertitude sur les impacts simulés.
+
+Les effets des actions (DEFAULT_ACTIONS) et les indicateurs mesurés sont tirés
+selon des lois normales au lieu d'être pris comme des valeurs exactes. Chaque
+lot de tirages est évalué en un seul passage NumPy (bruit, deltas, bornes,
+normalisation, scoring) ; les lots peuvent être répartis sur un pool de processus.
+Les graines de chaque lot sont dérivées d'une même SeedSequence : les résultats
+ne dépendent pas du nombre de processus.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scoring import INDICATOR_COLUMNS, as_weight_matrix, batch_vulnerability_scores, normalize_indicators
+from simulation import ActionMatrix
+
+# Écart-type relatif de l'effet d'une action (0.3 : ±30 % autour de la valeur annoncée)
+IMPACT_UNCERTAINTY = 0.3
+
+# Erreur de mesure (écart-type absolu) de chaque indicateur
+MEASUREMENT_ERROR = {
+    "Taux de chômage (%)": 1.0,
+    "Indice de Vétusté (0-10)": 0.5,
+    "Accessibilité Transports (0-10)": 0.5,
+    "Surface Espaces Verts (m²)": 2000.0,
+    "Accessibilité Santé (0-10)": 0.5,
+    "Accessibilité Education (0-10)": 0.5,
+    "Sécurité (0-10)": 0.5,
+}
+
+# Bornes de l'échelle de chaque indicateur (None : non bornée), indépendantes
+# des bornes appliquées aux effets des actions
+MEASUREMENT_SCALE = {
+    "Taux de chômage (%)": (0.0, 100.0),
+    "Indice de Vétusté (0-10)": (0.0, 10.0),
+    "Accessibilité Transports (0-10)": (0.0, 10.0),
+    "Surface Espaces Verts (m²)": (0.0, None),
+    "Accessibilité Santé (0-10)": (0.0, 10.0),
+    "Accessibilité Education (0-10)": (0.0, 10.0),
+    "Sécurité (0-10)": (0.0, 10.0),
+}
+
+# Au-delà, le classement ne porte plus que sur les quartiers touchés (mémoire tirages x quartiers)
+MAX_RANKED_UNITS = 100
+
+# Nombre d'éléments (tirages x quartiers x indicateurs) par lot
+CHUNK_ELEMENTS = 2_000_000
+
+# Une valeur tirée reste dans l'échelle de son indicateur
+_MEASURE_LOWER = np.array([MEASUREMENT_SCALE[c][0] for c in INDICATOR_COLUMNS])
+_MEASURE_UPPER = np.array([
+    np.inf if MEASUREMENT_SCALE[c][1] is None else MEASUREMENT_SCALE[c][1] for c in INDICATOR_COLUMNS
+])
+
+
+def _draw_chunk(raw, deltas, positions, weights, draws, seed, impact_sd, measurement_sd):
+    """
+    Un lot de `draws` tirages. `raw` (n x 7) sont les valeurs des quartiers classés,
+    `deltas` (S x U x 7) les effets des actions sélectionnées sur les quartiers
+    touchés, situés aux lignes `positions` de `raw`. Retourne les scores avant et
+    après (draws x n, float32) et les effectifs de rang (n x n).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(raw)
+
+    # Les mêmes erreurs de mesure s'appliquent avant et après : comparaison appariée
+    measured = raw + rng.normal(0.0, 1.0, (draws, n, raw.shape[1])) * measurement_sd
+    before = np.clip(measured, _MEASURE_LOWER, _MEASURE_UPPER)
+    after = measured.copy()
+    if len(deltas):
+        factors = np.maximum(rng.normal(1.0, impact_sd, (draws, len(deltas))), 0)
+        after[:, positions] += np.tensordot(factors, deltas, axes=1)
+    after = np.clip(after, _MEASURE_LOWER, _MEASURE_UPPER)
+
+    values = np.concatenate([before, after]).reshape(-1, raw.shape[1])
+    scores = batch_vulnerability_scores(normalize_indicators(values), weights)
+    scores = scores[0].reshape(2 * draws, n).astype(np.float32)
+    score_before, score_after = scores[:draws], scores[draws:]
+
+    # Rang 0 : le quartier le plus vulnérable du tirage
+    ranks = np.argsort(np.argsort(-score_after, axis=1, kind="stable"), axis=1, kind="stable")
+    rank_counts = np.bincount((np.arange(n) * n + ranks).ravel(), minlength=n * n).reshape(n, n)
+    return score_before, score_after, rank_counts
+
+
+def _draw_chunk_star(args):
+    return _draw_chunk(*args)
+
+
+def monte_carlo_portfolio(model, actions, selected_names, weights, draws=10_000, seed=0,
+                          impact_sd=IMPACT_UNCERTAINTY, measurement_error=None, confidence=0.9,
+                          workers=None, units=None):
+    """
+    Simule `draws` réalisations incertaines d'un portefeuille d'actions.
+
+    Les quartiers classés sont `units` (indices du modèle) ; par défaut tous les
+    quartiers si le modèle en compte au plus MAX_RANKED_UNITS, sinon les quartiers
+    touchés. Avec `workers` > 1, les lots sont répartis sur un pool de processus.
+
+    Retourne un dictionnaire : scores moyens avant/après, intervalles de confiance
+    du score après et de la variation, probabilité d'amélioration, probabilités de
+    rang (n x n, rang 0 = le plus vulnérable) et durée du calcul. Les rangs sont
+    relatifs aux quartiers classés : `all_units` indique s'il s'agit de tous les
+    quartiers du modèle.
+    """
+    start = time.perf_counter()
+    weights = as_weight_matrix(weights)[:1]
+    measurement_error = MEASUREMENT_ERROR if measurement_error is None else measurement_error
+    measurement_sd = np.array([measurement_error.get(c, 0.0) for c in INDICATOR_COLUMNS])
+
+    matrix = ActionMatrix(model, actions)
+    selected = matrix.selection(selected_names) > 0
+    if units is None:
+        units = np.arange(len(model)) if len(model) <= MAX_RANKED_UNITS else matrix.units
+    units = np.asarray(units, dtype=np.int64)
+
+    # Effets des actions sélectionnées, restreints aux quartiers classés
+    keep = np.isin(matrix.units, units)
+    deltas = matrix.deltas[selected][:, keep]
+    unit_position = {unit: i for i, unit in enumerate(units)}
+    positions = np.array([unit_position[unit] for unit in matrix.units[keep]], dtype=np.int64)
+    raw = model.raw[units].astype(np.float64)
+
+    n = len(units)
+    chunk = max(1, CHUNK_ELEMENTS // max(1, n * len(INDICATOR_COLUMNS)))
+    sizes = [min(chunk, draws - s) for s in range(0, draws, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(raw, deltas, positions, weights, size, s, impact_sd, measurement_sd) for size, s in zip(sizes, seeds)]
+
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_draw_chunk_star, tasks))
+    else:
+        results = [_draw_chunk(*task) for task in tasks]
+
+    score_before = np.concatenate([r[0] for r in results])
+    score_after = np.concatenate([r[1] for r in results])
+    rank_counts = sum(r[2] for r in results)
+    delta = score_after - score_before
+
+    tail = (1 - confidence) / 2 * 100
+    return {
+        "units": units,
+        "draws": draws,
+        "score_before": score_before.mean(axis=0, dtype=np.float64),
+        "score_after": score_after.mean(axis=0, dtype=np.float64),
+        "after_low": np.percentile(score_after, tail, axis=0),
+        "after_high": np.percentile(score_after, 100 - tail, axis=0),
+        "delta_mean": delta.mean(axis=0, dtype=np.float64),
+        "delta_low": np.percentile(delta, tail, axis=0),
+        "delta_high": np.percentile(delta, 100 - tail, axis=0),
+        "prob_improved": (delta < 0).mean(axis=0, dtype=np.float64),
+        "rank_probabilities": rank_counts / draws,
+        "all_units": n == len(model),
+        "seconds": time.perf_counter() - start,
+    }
@@ -1,55 +1,123 @@
 import streamlit as st
 import pandas as pd
 import random
+import numpy as np
 import json
+import os
+import tempfile
+import threading
+from aggregation import CommuneAggregator, aggregate_scores, GREEN_SPACE_COLUMN
+from cache import ResultCache
+from charts import ACCESS_COLUMNS, CORRELATION_COLUMNS, prepare_dashboard_charts
+from colors import get_color_for_indicator, get_color_for_score  # réexportés pour les pages
+from export import ExportManager, export_rows, write_commune_geojson
+from geometry import GEOJSON_PATH, TOPOLOGY_PATH, decode_geojson, level_for_zoom
+from instrumentation import METRICS, begin_rerun, end_rerun, start_metrics_server, timed
+from ranking import RankingIndex
+from sensitivity import sample_weights, weight_sensitivity
+from simulation import as_action, as_actions, simulate_portfolio
+from snapshot import load_snapshot, read_snapshot_dataset, read_snapshot_geometry
+from spatial import SpatialIndex
+from streaming_stats import indicator_statistics, score_correlation
+from timeseries import IndicatorPanel
+from uncertainty import monte_carlo_portfolio
+from scoring import (
+    ScoringModel, IncrementalScorer, normalize_indicators, batch_vulnerability_scores,
+    DEFAULT_WEIGHTS, INDICATOR_COLUMNS, SCORE_COLUMN, compact_indicators
+)
+
+# Version du jeu de données synthétique : à incrémenter si generate_rabat_data change,
+# afin d'invalider le modèle de scoring partagé.
+DATASET_VERSION = "rabat-synthetique-v1"
+
+# Fichier Parquet/Arrow optionnel remplaçant les données synthétiques (voir datastore.py)
+DATASET_PATH = os.environ.get("URBANLIFE_DATASET")
+
+# Taille du cache de résultats partagé entre les sessions (Mo)
+RESULT_CACHE_MB = int(os.environ.get("URBANLIFE_CACHE_MB", 512))
+
+# Instantané de démarrage à chaud (snapshot.py), utilisé s'il correspond aux données actives
+SNAPSHOT_PATH = os.environ.get("URBANLIFE_SNAPSHOT")
+
+# Modules lourds des pages, importés en arrière-plan dès l'ouverture de l'application
+HEAVY_MODULES = ("plotly.express", "folium", "streamlit_folium", "maps")
+
+# Instrumentation : détail de chaque exécution en JSON Lines, port de l'exposition
+# Prometheus (/metrics) et panneau d'administration des temps (réservé à l'exploitant :
+# il montre les temps de toutes les sessions du processus)
+METRICS_LOG = os.environ.get("URBANLIFE_METRICS_LOG")
+METRICS_PORT = os.environ.get("URBANLIFE_METRICS_PORT")
+ADMIN_PANEL = os.environ.get("URBANLIFE_ADMIN") == "1"
+# Nombre d'exécutions conservées par session pour le panneau d'administration
+RERUN_HISTORY = 10
+
+# Répertoire des fichiers d'export préparés en arrière-plan
+EXPORT_DIR = os.environ.get("URBANLIFE_EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "urbanlife_exports")
+
+# Historique optionnel des indicateurs (format long avec une colonne "Période")
+HISTORY_PATH = os.environ.get("URBANLIFE_HISTORY")
+PERIOD_COLUMN = "Période"
 
 # --- Génération de Données Synthétiques (Rabat) ---
+QUARTIERS = [
+    "Agdal", "Hay Riad", "Yacoub El Mansour", "L'Océan", 
+    "Médina", "Souissi", "Hassan"
+]
+
+# Coordonnées approximatives (Latitude, Longitude)
+QUARTIER_COORDS = {
+    "Agdal": (34.0043, -6.8506),
+    "Hay Riad": (33.9655, -6.8768),
+    "Yacoub El Mansour": (33.9950, -6.8800),
+    "L'Océan": (34.0250, -6.8550),
+    "Médina": (34.0280, -6.8360),
+    "Souissi": (33.9750, -6.8200),
+    "Hassan": (34.0200, -6.8300)
+}
+
+# Profils semi-réalistes : bornes (min, max) de chaque indicateur par catégorie de quartier
+PROFILE_RANGES = {
+    "aise": {  # Souissi, Hay Riad
+        "pop": (10000, 30000), "densite": (1000, 3000), "chomage": (5, 10),
+        "espaces_verts": (40000, 80000), "vetuste": (0, 3), "transport": (4, 8),
+    },
+    "populaire": {  # Yacoub El Mansour, L'Océan, Médina
+        "pop": (50000, 120000), "densite": (10000, 25000), "chomage": (12, 22),
+        "espaces_verts": (1000, 10000), "vetuste": (6, 9), "transport": (6, 9),
+    },
+    "intermediaire": {  # Agdal, Hassan
+        "pop": (30000, 60000), "densite": (5000, 15000), "chomage": (8, 15),
+        "espaces_verts": (10000, 30000), "vetuste": (3, 6), "transport": (8, 10),
+    },
+}
+QUARTIER_PROFILES = {
+    "Souissi": "aise", "Hay Riad": "aise",
+    "Yacoub El Mansour": "populaire", "L'Océan": "populaire", "Médina": "populaire",
+    "Agdal": "intermediaire", "Hassan": "intermediaire",
+}
+# Bornes communes à tous les profils
+ACCESS_RANGES = {"sante": (2, 9), "educ": (3, 10), "secu": (4, 9)}
+
+@timed("generate_rabat_data")
 @st.cache_data
-def generate_rabat_data():
+def generate_rabat_data(seed=42):
     """
     Génère un DataFrame de données synthétiques pour les quartiers de Rabat.
+    Les jeux de grande taille ne passent pas par ce cache : generate_synthetic_units
+    les produit par blocs, écrits au fil de l'eau sur disque par datastore.write_dataset
+    (python datastore.py Data/rabat_1M.parquet --units 1000000).
     """
-    random.seed(42) # Pour la reproductibilité
-    quartiers = [
-        "Agdal", "Hay Riad", "Yacoub El Mansour", "L'Océan", 
-        "Médina", "Souissi", "Hassan"
-    ]
-    
-    # Coordonnées approximatives (Latitude, Longitude)
-    coords = {
-        "Agdal": (34.0043, -6.8506),
-        "Hay Riad": (33.9655, -6.8768),
-        "Yacoub El Mansour": (33.9950, -6.8800),
-        "L'Océan": (34.0250, -6.8550),
-        "Médina": (34.0280, -6.8360),
-        "Souissi": (33.9750, -6.8200),
-        "Hassan": (34.0200, -6.8300)
-    }
-
+    random.seed(seed) # Pour la reproductibilité
     data = []
-    for q in quartiers:
+    for q in QUARTIERS:
         # Logique de génération semi-réaliste
-        if q in ["Souissi", "Hay Riad"]:
-            pop = random.randint(10000, 30000)
-            densite = random.randint(1000, 3000)
-            chomage = random.uniform(5, 10)
-            espaces_verts = random.randint(40000, 80000)
-            vetuste = random.randint(0, 3)
-            transport = random.randint(4, 8)
-        elif q in ["Yacoub El Mansour", "L'Océan", "Médina"]:
-            pop = random.randint(50000, 120000)
-            densite = random.randint(10000, 25000)
-            chomage = random.uniform(12, 22)
-            espaces_verts = random.randint(1000, 10000)
-            vetuste = random.randint(6, 9)
-            transport = random.randint(6, 9)
-        else: # Agdal, Hassan
-            pop = random.randint(30000, 60000)
-            densite = random.randint(5000, 15000)
-            chomage = random.uniform(8, 15)
-            espaces_verts = random.randint(10000, 30000)
-            vetuste = random.randint(3, 6)
-            transport = random.randint(8, 10)
+        r = PROFILE_RANGES[QUARTIER_PROFILES[q]]
+        pop = random.randint(*r["pop"])
+        densite = random.randint(*r["densite"])
+        chomage = random.uniform(*r["chomage"])
+        espaces_verts = random.randint(*r["espaces_verts"])
+        vetuste = random.randint(*r["vetuste"])
+        transport = random.randint(*r["transport"])
 
         data.append({
             "Nom du quartier": q,
@@ -59,16 +127,111 @@ def generate_rabat_data():
             "Surface Espaces Verts (m²)": espaces_verts,
             "Indice de Vétusté (0-10)": vetuste,
             "Accessibilité Transports (0-10)": transport,
-            "Accessibilité Santé (0-10)": random.randint(2, 9),
-            "Accessibilité Education (0-10)": random.randint(3, 10),
-            "Sécurité (0-10)": random.randint(4, 9),
-            "lat": coords[q][0],
-            "lon": coords[q][1]
+            "Accessibilité Santé (0-10)": random.randint(*ACCESS_RANGES["sante"]),
+            "Accessibilité Education (0-10)": random.randint(*ACCESS_RANGES["educ"]),
+            "Sécurité (0-10)": random.randint(*ACCESS_RANGES["secu"]),
+            "lat": QUARTIER_COORDS[q][0],
+            "lon": QUARTIER_COORDS[q][1]
         })
     
     return pd.DataFrame(data)
 
+def generate_synthetic_units(n_units, chunk_size=100_000, seed=42, with_coords=True, jitter=0.01):
+    """
+    Génère `n_units` unités spatiales synthétiques par blocs de `chunk_size` lignes
+    (générateur de DataFrames), pour garder une mémoire bornée jusqu'à 10M d'unités.
+
+    Chaque unité est rattachée à un quartier de référence tiré au hasard et reprend
+    les distributions de son profil. Les tirages sont vectorisés et reproductibles
+    pour un même couple (seed, chunk_size). Avec `with_coords`, les coordonnées sont
+    celles du quartier de référence bruitées d'un écart-type `jitter` (en degrés).
+    """
+    profiles = list(PROFILE_RANGES)
+    anchor_profile = np.array([profiles.index(QUARTIER_PROFILES[q]) for q in QUARTIERS])
+    bounds = {
+        key: np.array([PROFILE_RANGES[p][key] for p in profiles])
+        for key in PROFILE_RANGES[profiles[0]]
+    }
+    anchor_lat = np.array([QUARTIER_COORDS[q][0] for q in QUARTIERS])
+    anchor_lon = np.array([QUARTIER_COORDS[q][1] for q in QUARTIERS])
+
+    for chunk_index, start in enumerate(range(0, n_units, chunk_size)):
+        size = min(chunk_size, n_units - start)
+        rng = np.random.default_rng([seed, chunk_index])
+
+        anchor = rng.integers(0, len(QUARTIERS), size)
+        profile = anchor_profile[anchor]
+
+        def draw_int(key):
+            low, high = bounds[key][profile, 0], bounds[key][profile, 1]
+            return rng.integers(low, high + 1, dtype=np.int32)
+
+        def draw_access(key):
+            low, high = ACCESS_RANGES[key]
+            return rng.integers(low, high + 1, size, dtype=np.int8)
+
+        chomage = rng.uniform(bounds["chomage"][profile, 0], bounds["chomage"][profile, 1])
+        quartier = pd.Categorical.from_codes(anchor, categories=QUARTIERS)
+        ids = pd.Series(np.arange(start, start + size)).astype(str).str.zfill(8)
+
+        chunk = pd.DataFrame({
+            "Nom du quartier": (pd.Series(quartier).astype(str) + " #" + ids).to_numpy(),
+            "Quartier de référence": quartier,
+            "Population": draw_int("pop"),
+            "Densité (hab/km²)": draw_int("densite"),
+            "Taux de chômage (%)": chomage.round(1),
+            "Surface Espaces Verts (m²)": draw_int("espaces_verts"),
+            "Indice de Vétusté (0-10)": draw_int("vetuste").astype(np.int8),
+            "Accessibilité Transports (0-10)": draw_int("transport").astype(np.int8),
+            "Accessibilité Santé (0-10)": draw_access("sante"),
+            "Accessibilité Education (0-10)": draw_access("educ"),
+            "Sécurité (0-10)": draw_access("secu"),
+        })
+        if with_coords:
+            chunk["lat"] = anchor_lat[anchor] + rng.normal(0, jitter, size)
+            chunk["lon"] = anchor_lon[anchor] + rng.normal(0, jitter, size)
+        yield chunk
+
+# Dérive mensuelle maximale (en valeur absolue) et bruit de chaque indicateur de l'historique synthétique
+HISTORY_DRIFT = {
+    "Taux de chômage (%)": (0.15, 0.3),
+    "Indice de Vétusté (0-10)": (0.05, 0.1),
+    "Accessibilité Transports (0-10)": (0.05, 0.1),
+    "Surface Espaces Verts (m²)": (300.0, 500.0),
+    "Accessibilité Santé (0-10)": (0.05, 0.1),
+    "Accessibilité Education (0-10)": (0.05, 0.1),
+    "Sécurité (0-10)": (0.05, 0.1),
+}
+
+def generate_rabat_history(n_periods=24, start="2024-01", seed=42):
+    """
+    Historique mensuel synthétique des indicateurs (format long, une ligne par
+    période et par quartier) : dérive propre à chaque quartier autour de l'instantané
+    de generate_rabat_data, avec bruit, dont la dernière période est l'instantané.
+    """
+    snapshot = generate_rabat_data()
+    rng = np.random.default_rng(seed)
+    n = len(snapshot)
+    periods = pd.period_range(start, periods=n_periods, freq="M").astype(str)
+    # Nombre de mois avant l'instantané : 0 pour la dernière période
+    months_before = np.arange(n_periods - 1, -1, -1)[:, None]
+
+    history = {}
+    for column, (drift, noise) in HISTORY_DRIFT.items():
+        slope = rng.uniform(-drift, drift, n)
+        values = snapshot[column].to_numpy(dtype=np.float64) - months_before * slope
+        values[:-1] += rng.normal(0, noise, (n_periods - 1, n))
+        upper = 100 if column == "Taux de chômage (%)" else (None if column == GREEN_SPACE_COLUMN else 10)
+        history[column] = np.clip(values, 0, upper).ravel()
+
+    return pd.DataFrame({
+        PERIOD_COLUMN: np.repeat(periods, n),
+        "Nom du quartier": np.tile(snapshot["Nom du quartier"].to_numpy(), n_periods),
+        **history,
+    })
+
 # --- Calcul d'Indicateurs ---
+@timed("calculate_vulnerability_score")
 def calculate_vulnerability_score(df, w_social, w_infra, w_env, w_sante, w_educ, w_secu):
     """
     Calcule un score de vulnérabilité (0-100) basé sur des poids pondérés.
@@ -76,54 +239,515 @@ def calculate_vulnerability_score(df, w_social, w_infra, w_env, w_sante, w_educ,
     """
     df_calc = df.copy()
     
-    # Normalisation des données
-    norm_chomage = df_calc["Taux de chômage (%)"] / 25.0
-    norm_vetuste = df_calc["Indice de Vétusté (0-10)"] / 10.0
-    norm_transport = 1 - (df_calc["Accessibilité Transports (0-10)"] / 10.0)
-    norm_verts = 1 - (df_calc["Surface Espaces Verts (m²)"] / 80000.0)
-    norm_sante = 1 - (df_calc["Accessibilité Santé (0-10)"] / 10.0)
-    norm_educ = 1 - (df_calc["Accessibilité Education (0-10)"] / 10.0)
-    norm_secu = 1 - (df_calc["Sécurité (0-10)"] / 10.0)
-    
-    # Calcul du score brut pondéré
-    score_brut = (
-        w_social * norm_chomage +
-        w_infra * (norm_vetuste + norm_transport) / 2 +
-        w_env * norm_verts +
-        w_sante * norm_sante +
-        w_educ * norm_educ +
-        w_secu * norm_secu
-    )
-    
-    # Normalisation finale sur 100
-    total_weight = w_social + w_infra + w_env + w_sante + w_educ + w_secu
-    if total_weight == 0: total_weight = 1
-    
-    df_calc["Score Vulnérabilité"] = (score_brut / total_weight) * 100
-    df_calc["Score Vulnérabilité"] = df_calc["Score Vulnérabilité"].round(1)
+    weights = [w_social, w_infra, w_env, w_sante, w_educ, w_secu]
+    scores = batch_vulnerability_scores(normalize_indicators(df_calc), weights, decimals=1)
+    df_calc[SCORE_COLUMN] = scores[0]
     
     return df_calc
 
+# --- Cache de Résultats Partagé ---
+@st.cache_resource
+def get_result_cache():
+    """
+    Cache LRU unique du processus (cache.py) pour les scores, agrégats et
+    simulations : partagé par toutes les sessions, valeurs rendues sans copie.
+    """
+    return ResultCache(max_bytes=RESULT_CACHE_MB * 2**20)
+
+def shared_result(key, compute):
+    """Valeur de `key` dans le cache partagé, calculée par `compute()` si absente."""
+    return get_result_cache().get_or_compute(key, compute)
+
+def weights_key(weights):
+    return tuple(float(w) for w in weights)
+
+def action_set_key(actions):
+    """Clé canonique d'un ensemble d'actions (définitions normalisées complètes, indépendante de l'ordre)."""
+    return tuple(sorted(json.dumps(as_action(a).to_dict(), sort_keys=True, ensure_ascii=False) for a in actions))
+
+# --- Chargement des Données ---
+def current_dataset_version():
+    """Version du jeu de données actif : fichier DATASET_PATH s'il est défini, sinon synthétique."""
+    if DATASET_PATH:
+        from datastore import dataset_version
+        return dataset_version(DATASET_PATH)
+    return DATASET_VERSION
+
+@st.cache_resource
+def _warm_snapshot(dataset_version):
+    if not SNAPSHOT_PATH:
+        return None
+    return load_snapshot(SNAPSHOT_PATH, dataset_version, GEOJSON_PATH)
+
+@st.cache_resource
+def warm_start():
+    """
+    Démarrage à chaud, une fois par processus : ouvre l'instantané des données
+    (memory-map) s'il existe et importe en arrière-plan les modules lourds des
+    pages (Plotly, Folium), pour que la première page visitée n'attende pas.
+    """
+    def import_modules():
+        import importlib
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+
+    if METRICS_PORT:
+        _metrics_server(int(METRICS_PORT))
+    _warm_snapshot(current_dataset_version())
+    thread = threading.Thread(target=import_modules, name="warm-start", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource
+def _metrics_server(port):
+    """
+    Serveur Prometheus du processus, démarré une seule fois. Si le port est déjà
+    pris (cache vidé alors que le serveur tourne encore), retourne None.
+    """
+    try:
+        return start_metrics_server(port)
+    except OSError:
+        return None
+
+@st.cache_resource
+def _shared_dataset(dataset_version, columns):
+    snapshot = _warm_snapshot(dataset_version)
+    # Indicateurs 0-10 entiers en int8 : un octet par valeur au lieu de huit
+    if snapshot is not None:
+        return compact_indicators(read_snapshot_dataset(snapshot, columns))
+    if DATASET_PATH:
+        from datastore import read_dataset
+        return compact_indicators(read_dataset(DATASET_PATH, list(columns) if columns is not None else None))
+    df = generate_rabat_data()
+    return df[list(columns)] if columns is not None else df
+
+def _load_dataset(dataset_version, columns):
+    # Le DataFrame partagé n'est jamais recopié : chaque appel reçoit une copie
+    # superficielle, protégée des modifications par le copy-on-write de pandas
+    # (toujours actif à partir de pandas 3.0, version minimale de requirements.txt)
+    return _shared_dataset(dataset_version, columns).copy(deep=False)
+
+def load_dataset(columns=None):
+    """
+    Charge le jeu de données actif. Depuis un fichier Parquet/Arrow, seules les
+    colonnes demandées sont lues (memory-map) ; le cache est invalidé quand le fichier change.
+    """
+    return _load_dataset(current_dataset_version(), tuple(columns) if columns is not None else None)
+
+# --- Modèle de Scoring Partagé ---
+@st.cache_resource
+def _build_scoring_model(dataset_version):
+    snapshot = _warm_snapshot(dataset_version)
+    if snapshot is not None:
+        names = read_snapshot_dataset(snapshot, ["Nom du quartier"])["Nom du quartier"].to_numpy()
+        return ScoringModel.from_arrays(
+            names, snapshot["raw"], snapshot["normalized"], snapshot["components"],
+            snapshot["population"], version=dataset_version,
+        )
+    columns = ["Nom du quartier", "Population", *INDICATOR_COLUMNS]
+    return ScoringModel.from_dataframe(_load_dataset(dataset_version, tuple(columns)), version=dataset_version)
+
+def get_scoring_model():
+    """
+    Construit une seule fois par version du jeu de données le modèle de scoring
+    (indicateurs normalisés en float32), partagé par toutes les pages et sessions.
+    """
+    return _build_scoring_model(current_dataset_version())
+
+@timed("score_for_session")
+def score_for_session(model, weights):
+    """
+    Retourne les scores (lecture seule) pour les poids de la session. Les scores
+    déjà calculés par une session pour ces poids sont servis par le cache partagé ;
+    sinon le score brut conservé dans st.session_state est mis à jour de façon
+    incrémentale.
+    """
+    return shared_result(("scores", model.version, weights_key(weights)), lambda: _session_scores(model, weights))
+
+@timed("ranking_for_session")
+def ranking_for_session(model, weights):
+    """
+    Index de classement (ranking.RankingIndex) des scores de la session, partagé
+    par (version des données, poids) : top-k, rangs, percentiles et niveaux de
+    priorité sans retrier les scores à chaque widget.
+    """
+    return shared_result(
+        ("ranking", model.version, weights_key(weights)),
+        lambda: RankingIndex(score_for_session(model, weights), model.index),
+    )
+
+def _session_scores(model, weights):
+    scorer = st.session_state.get("incremental_scorer")
+    if scorer is None or scorer.model is not model:
+        scorer = IncrementalScorer(model, weights)
+        st.session_state["incremental_scorer"] = scorer
+        return scorer.scores()
+    return scorer.update(weights)
+
 # --- Chargement GeoJSON ---
-@st.cache_data
+@timed("load_geojson")
+@st.cache_resource
 def load_geojson():
-    """Charge le fichier GeoJSON du découpage administratif de Rabat."""
+    """
+    Charge le fichier GeoJSON du découpage administratif de Rabat. Le dict est
+    partagé entre les sessions sans copie : il ne doit pas être modifié.
+    """
+    snapshot = _warm_snapshot(current_dataset_version())
+    if snapshot is not None and snapshot["geometry_path"] is not None:
+        return read_snapshot_geometry(snapshot)
     try:
-        with open('Data/Rabat.geojson', 'r', encoding='utf-8') as f:
+        with open(GEOJSON_PATH, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
         st.error(f"Erreur lors du chargement du GeoJSON : {e}")
         return None
 
-# --- Fonction de coloration ---
-def get_color_for_score(score):
-    """Retourne une couleur en fonction du score de vulnérabilité."""
-    if score > 60:
-        return "#e74c3c"  # Rouge (priorité haute)
-    elif score > 40:
-        return "#f39c12"  # Orange (priorité moyenne)
+@st.cache_resource
+def load_topology():
+    """Charge le cache de géométrie multi-résolution produit par `python geometry.py`."""
+    try:
+        with open(TOPOLOGY_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource
+def _decode_geometry_level(level_name):
+    return decode_geojson(load_topology(), level_name)
+
+def geometry_level_for_zoom(zoom):
+    """Nom du niveau de géométrie adapté au zoom ("source" sans cache de géométrie)."""
+    topology = load_topology()
+    if topology is None:
+        return "source"
+    return level_for_zoom(topology, zoom)["name"]
+
+def load_geojson_for_zoom(zoom):
+    """
+    Retourne le GeoJSON simplifié le plus léger adapté au niveau de zoom de la carte.
+    Sans cache de géométrie (Data/Rabat.topo.json), retourne le GeoJSON complet.
+    Le résultat est partagé entre les sessions : il ne doit pas être modifié.
+    """
+    level_name = geometry_level_for_zoom(zoom)
+    if level_name == "source":
+        return load_geojson()
+    return _decode_geometry_level(level_name)
+
+# --- Jointure Spatiale ---
+# Distance maximale (en degrés, ~500 m) pour rattacher un point du littoral à la commune la plus proche
+SNAP_DISTANCE = 0.005
+
+@st.cache_resource
+def get_spatial_index():
+    """Index spatial des communes, construit une fois sur la géométrie complète."""
+    geojson_data = load_geojson()
+    return SpatialIndex(geojson_data) if geojson_data else None
+
+@st.cache_resource
+def _commune_index(dataset_version):
+    snapshot = _warm_snapshot(dataset_version)
+    if snapshot is not None and snapshot["commune_index"] is not None:
+        return snapshot["commune_index"]
+    spatial_index = get_spatial_index()
+    df = _load_dataset(dataset_version, ("lat", "lon"))
+    if spatial_index is None:
+        index = np.full(len(df), -1, dtype=np.int64)
+    else:
+        index = spatial_index.join(df["lon"].to_numpy(), df["lat"].to_numpy(), SNAP_DISTANCE)
+    # Partagé entre les sessions : lecture seule
+    index.flags.writeable = False
+    return index
+
+def assign_communes():
+    """
+    Commune contenant chaque ligne du jeu de données (test point-dans-polygone
+    sur lat/lon), alignée sur load_dataset. Calculée une fois par version des données.
+    """
+    index = _commune_index(current_dataset_version())
+    spatial_index = get_spatial_index()
+    if spatial_index is None:
+        return np.full(len(index), None, dtype=object)
+    return spatial_index.names_for(index)
+
+# --- Agrégation par Commune ---
+@st.cache_resource
+def _build_commune_aggregator(dataset_version):
+    """Agrégateur par commune, ou None sans GeoJSON des communes."""
+    spatial_index = get_spatial_index()
+    if spatial_index is None:
+        return None
+    model = _build_scoring_model(dataset_version)
+    green_space = model.raw[:, model.column_index[GREEN_SPACE_COLUMN]]
+    return CommuneAggregator(
+        _commune_index(dataset_version), spatial_index.names, model.population, green_space
+    )
+
+def _commune_aggregates(dataset_version, weights, indicator):
+    aggregator = _build_commune_aggregator(dataset_version)
+    if aggregator is None:
+        return None
+    model = _build_scoring_model(dataset_version)
+    scores = model.score(weights)
+    values = model.raw[:, model.column_index[indicator]] if indicator in model.column_index else None
+    return aggregate_scores(aggregator, scores, indicator, values)
+
+@timed("commune_aggregates")
+def commune_aggregates(weights, indicator=SCORE_COLUMN):
+    """
+    Agrégats par commune du GeoJSON : score de vulnérabilité et indicateur moyens
+    pondérés par la population, population totale, espaces verts par habitant.
+    Mis en cache partagé par (version des données, poids, indicateur). None sans
+    GeoJSON des communes.
+    """
+    dataset_version = current_dataset_version()
+    weights = weights_key(weights)
+    return shared_result(
+        ("commune_aggregates", dataset_version, weights, indicator),
+        lambda: _commune_aggregates(dataset_version, weights, indicator),
+    )
+
+# --- Données des Graphiques ---
+def commune_provinces():
+    """Province de chaque commune du GeoJSON, dans l'ordre de get_spatial_index().names."""
+    geojson_data = load_geojson()
+    if not geojson_data:
+        return np.empty(0, dtype=object)
+    province_of = {
+        f["properties"]["commune"]: f["properties"].get("province_1") for f in geojson_data["features"]
+    }
+    spatial_index = get_spatial_index()
+    if spatial_index is None:
+        return np.empty(0, dtype=object)
+    return np.array([province_of[name] for name in spatial_index.names], dtype=object)
+
+def _dashboard_charts(dataset_version, weights):
+    model = _build_scoring_model(dataset_version)
+    ranking = ranking_for_session(model, weights)
+    spatial_index = get_spatial_index()
+    columns = {c: model.raw[:, model.column_index[c]] for c in ACCESS_COLUMNS}
+    return prepare_dashboard_charts(
+        model.names, ranking.scores, ranking.order, model.population, columns,
+        _commune_index(dataset_version),
+        spatial_index.names if spatial_index is not None else np.empty(0, dtype=object),
+        commune_provinces(),
+    )
+
+@timed("dashboard_chart_data")
+def dashboard_chart_data(weights):
+    """
+    Données réduites des graphiques du Dashboard (charts.prepare_dashboard_charts) :
+    par quartier, commune ou province selon la taille du jeu. Mises en cache
+    partagé par (version des données, poids).
+    """
+    dataset_version = current_dataset_version()
+    weights = weights_key(weights)
+    return shared_result(
+        ("dashboard_charts", dataset_version, weights),
+        lambda: _dashboard_charts(dataset_version, weights),
+    )
+
+@st.cache_resource
+def _indicator_statistics(dataset_version):
+    return indicator_statistics(_build_scoring_model(dataset_version).raw)
+
+@timed("indicator_correlation")
+def indicator_correlation(weights):
+    """
+    Matrice de corrélation des indicateurs et du score de vulnérabilité. Les
+    covariances des indicateurs sont calculées une fois par version des données ;
+    la ligne du score s'en déduit analytiquement pour chaque jeu de poids.
+    """
+    stats = _indicator_statistics(current_dataset_version())
+    return score_correlation(stats, weights, CORRELATION_COLUMNS[:-1])
+
+# --- Export ---
+# Profils de poids dont l'export est précalculé à l'ouverture du Dashboard
+EXPORT_PROFILES = {
+    "Poids par défaut": DEFAULT_WEIGHTS,
+    "Poids égaux": (1.0,) * len(DEFAULT_WEIGHTS),
+}
+
+@st.cache_resource
+def get_export_manager():
+    return ExportManager(EXPORT_DIR)
+
+def export_key(weights, fmt, columns=None):
+    """Clé de l'export pour get_export_manager(), sans le lancer."""
+    return ("export", current_dataset_version(), weights_key(weights), fmt, tuple(columns) if columns else None)
+
+def request_export(weights, fmt, columns=None):
+    """
+    Lance (une seule fois) la préparation en arrière-plan de l'export des données
+    scorées au format `fmt` (export.EXPORT_FORMATS), limité aux colonnes `columns`.
+    Retourne la clé de l'export pour get_export_manager().
+    """
+    key = export_key(weights, fmt, columns)
+    _, dataset_version, weights, fmt, columns = key
+    manager = get_export_manager()
+    if manager.status(key) in ("pending", "ready"):
+        return key
+
+    # Les données sont lues ici : le fil de fond n'accède pas au contexte Streamlit
+    model = get_scoring_model()
+    scores = model.score(weights)
+    if fmt == "geojson":
+        geojson_data = load_geojson()
+        aggregator = _build_commune_aggregator(dataset_version)
+        if not geojson_data or aggregator is None:
+            raise ValueError("GeoJSON des communes indisponible")
+        df = _load_dataset(dataset_version, None)
+        # Coordonnées et population n'ont pas de sens en moyenne pondérée par commune
+        numeric = [
+            c for c in (columns or df.columns)
+            if c not in (SCORE_COLUMN, "Population", "lat", "lon") and pd.api.types.is_numeric_dtype(df[c])
+        ]
+        values = {SCORE_COLUMN: scores, **{c: df[c].to_numpy() for c in numeric}}
+        build = lambda path: write_commune_geojson(path, geojson_data, aggregator.aggregate(values))
+    else:
+        df = _load_dataset(dataset_version, None)
+        build = lambda path: export_rows(df, scores, path, fmt, columns)
+    manager.submit(key, fmt, build)
+    return key
+
+def precompute_exports(fmt="csv.gz"):
+    """Prépare en arrière-plan l'export complet des profils de EXPORT_PROFILES."""
+    for weights in EXPORT_PROFILES.values():
+        request_export(weights, fmt)
+
+# --- Simulation ---
+@timed("simulate_for_session")
+def simulate_for_session(model, actions, selected_names, weights):
+    """
+    simulate_portfolio mis en cache partagé par (version des données, poids,
+    ensemble des actions sélectionnées).
+    """
+    selected = [a for a in as_actions(actions) if a.name in set(selected_names)]
+    return shared_result(
+        ("simulation", model.version, weights_key(weights), action_set_key(selected)),
+        lambda: simulate_portfolio(model, selected, selected_names, weights),
+    )
+
+@timed("monte_carlo_portfolio")
+def monte_carlo_for_session(model, actions, selected_names, weights, draws, impact_sd):
+    """
+    monte_carlo_portfolio mis en cache partagé par (version des données, poids,
+    ensemble des actions, actions sélectionnées, tirages, incertitude) : les
+    exécutions déclenchées par d'autres widgets ne relancent pas les tirages.
+    """
+    # Toutes les actions entrent dans la clé : elles déterminent les quartiers classés
+    return shared_result(
+        ("monte_carlo", model.version, weights_key(weights), action_set_key(actions),
+         tuple(sorted(selected_names)), int(draws), float(impact_sd)),
+        lambda: monte_carlo_portfolio(model, actions, selected_names, weights, draws=draws, impact_sd=impact_sd),
+    )
+
+# --- Sensibilité aux Poids ---
+def _weight_sensitivity(dataset_version, method, size):
+    model = _build_scoring_model(dataset_version)
+    return weight_sensitivity(model, sample_weights(method, size))
+
+@timed("get_weight_sensitivity")
+def get_weight_sensitivity(method="grid", size=12):
+    """
+    Balayage du simplexe des poids (sensitivity.py), indépendant des poids de la
+    session : calculé une fois par (version des données, méthode, taille) et partagé.
+    """
+    dataset_version = current_dataset_version()
+    return shared_result(
+        ("sensitivity", dataset_version, method, size),
+        lambda: _weight_sensitivity(dataset_version, method, size),
+    )
+
+# --- Historique des Indicateurs ---
+def current_history_version():
+    """Version de l'historique actif : fichier HISTORY_PATH s'il est défini, sinon synthétique."""
+    if HISTORY_PATH:
+        from datastore import dataset_version
+        return dataset_version(HISTORY_PATH)
+    return DATASET_VERSION
+
+@st.cache_resource
+def _build_indicator_panel(history_version, window):
+    if HISTORY_PATH:
+        from datastore import read_dataset
+        history = read_dataset(HISTORY_PATH, [PERIOD_COLUMN, "Nom du quartier", *INDICATOR_COLUMNS])
     else:
-        return "#27ae60"  # Vert (priorité basse)
+        history = generate_rabat_history()
+    periods = history.groupby(PERIOD_COLUMN, sort=True)
+    panel = IndicatorPanel(history["Nom du quartier"].unique(), window=window, capacity=periods.ngroups)
+    for period, values in periods:
+        panel.append(period, values)
+    return panel
+
+def get_indicator_panel(window=12):
+    """
+    Panneau temporel des indicateurs (timeseries.py), construit une fois par
+    version de l'historique. Les nouvelles périodes s'ajoutent avec panel.append.
+    """
+    return _build_indicator_panel(current_history_version(), window)
+
+# --- Carte de Base ---
+def get_session_base_map(geojson_data, level_name, center, zoom):
+    """
+    Retourne la carte de base (fond + géométrie) de la session, reconstruite
+    uniquement quand le niveau de géométrie change. Chaque session a sa propre
+    instance, car st_folium y rattache la couche dynamique à chaque rendu.
+    """
+    from maps import build_base_map, detach_data_layers
+
+    cached = st.session_state.get("base_map")
+    if cached is None or cached[0] != level_name:
+        with timed("build_base_map"):
+            cached = (level_name, build_base_map(geojson_data, center, zoom))
+        st.session_state["base_map"] = cached
+    base_map = cached[1]
+    detach_data_layers(base_map)
+    return base_map
+
+# --- Instrumentation ---
+def begin_page(page):
+    """Démarre la mesure des étapes de l'exécution de `page` (instrumentation.timed)."""
+    begin_rerun(page)
+
+def end_page():
+    """
+    Termine la mesure de l'exécution : détail ajouté à METRICS_LOG et conservé
+    dans la session, panneau d'administration affiché dans la sidebar si activé.
+    """
+    recorder = end_rerun(METRICS_LOG)
+    if recorder is None:
+        return
+    history = st.session_state.setdefault("rerun_timings", [])
+    history.append(recorder.to_dict())
+    del history[:-RERUN_HISTORY]
+    if ADMIN_PANEL:
+        render_timing_panel(history)
+
+def render_timing_panel(history):
+    """Sidebar : détail des dernières exécutions de la session et histogrammes du processus."""
+    with st.sidebar.expander("⏱️ Temps d'exécution (admin)"):
+        latest = history[-1]
+        st.caption(f"Dernière exécution ({latest['page']}) : {latest['total'] * 1000:.0f} ms")
+        columns = {}
+        for i, run in enumerate(reversed(history)):
+            # Une étape appelée plusieurs fois dans l'exécution est cumulée
+            stages = {}
+            for stage in run["stages"]:
+                stages[stage["stage"]] = stages.get(stage["stage"], 0.0) + stage["seconds"] * 1000
+            columns[f"#{len(history) - i} {run['page']}"] = stages
+        order = list(dict.fromkeys(stage for stages in columns.values() for stage in stages))
+        breakdown = pd.DataFrame(columns).reindex(order)
+        st.dataframe(breakdown.style.format("{:.1f}", na_rep="–"), use_container_width=True)
+        st.caption("Durées en ms par étape, de la plus récente à la plus ancienne exécution.")
+        summary = pd.DataFrame(METRICS.summary()).T
+        if not summary.empty:
+            summary[["mean", "max", "p95"]] *= 1000
+            st.dataframe(
+                summary.rename(columns={"count": "Appels", "mean": "Moyenne (ms)", "max": "Max (ms)", "p95": "p95 (ms)"})
+                .style.format({"Appels": "{:.0f}", "Moyenne (ms)": "{:.1f}", "Max (ms)": "{:.1f}", "p95 (ms)": "{:.1f}"}),
+                use_container_width=True
+            )
+            st.caption("Toutes sessions confondues depuis le démarrage du processus.")
 
 # --- Explications des indicateurs ---
 INDICATOR_EXPLANATIONS = {